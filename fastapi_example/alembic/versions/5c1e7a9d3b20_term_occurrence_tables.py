@@ -0,0 +1,178 @@
+"""replace term occurrence materialized views with incrementally maintained tables
+
+Revision ID: 5c1e7a9d3b20
+Revises: 423ee5dc11d9
+Create Date: 2024-09-10 08:12:41.518204
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7a9d3b20"
+down_revision: Union[str, None] = "423ee5dc11d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("drop materialized view term_occurrence_per_article_mv")
+    op.execute("drop materialized view term_occurrence_per_corpus_mv")
+
+    op.execute(
+        """
+    create table term_occurrence_per_article (
+        article_id uuid not null,
+        word text not null,
+        number_of_occurrences integer not null,
+        primary key (article_id, word)
+    )
+    """
+    )
+    op.execute(
+        """
+    comment on table term_occurrence_per_article is
+        'number of occurrences of each term per article, maintained by a trigger on fastapi_article'
+    """
+    )
+
+    op.execute(
+        """
+    create table term_occurrence_per_corpus (
+        word text not null primary key,
+        number_of_articles integer not null,
+        number_of_occurrences integer not null
+    )
+    """
+    )
+    op.execute(
+        """
+    comment on table term_occurrence_per_corpus is
+        'number of articles and occurrences of each term in the corpus, maintained by a trigger on fastapi_article'
+    """
+    )
+
+    # ts_stat counts one entry per position of the lexeme, unnest exposes the same positions per article
+    op.execute(
+        """
+    insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+    select
+        fastapi_article.article_id,
+        terms.lexeme,
+        coalesce(array_length(terms.positions, 1), 1)
+    from fastapi_article,
+        unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms
+    """
+    )
+
+    op.execute(
+        """
+    insert into term_occurrence_per_corpus (word, number_of_articles, number_of_occurrences)
+    select word, count(*), sum(number_of_occurrences)
+    from term_occurrence_per_article
+    group by word
+    """
+    )
+
+    # the corpus is changed with one upsert of the net deltas of the article, ordered by word,
+    # such that concurrent article writes lock the shared corpus rows in the same order
+    op.execute(
+        """
+    create function sync_term_occurrence() returns trigger
+    language plpgsql
+    as $$
+    declare
+        emptied_words text[];
+    begin
+        if tg_op = 'UPDATE'
+            and old.article_content_simple_with_no_stop_words
+                is not distinct from new.article_content_simple_with_no_stop_words then
+            return null;
+        end if;
+
+        with term_delta as (
+            select word, -1 as number_of_articles, -number_of_occurrences as number_of_occurrences
+            from term_occurrence_per_article
+            where article_id = old.article_id
+            union all
+            select lexeme, 1, coalesce(array_length(positions, 1), 1)
+            from unnest(new.article_content_simple_with_no_stop_words)
+        ),
+        upserted as (
+            insert into term_occurrence_per_corpus as corpus (word, number_of_articles, number_of_occurrences)
+            select word, sum(number_of_articles), sum(number_of_occurrences)
+            from term_delta
+            group by word
+            having sum(number_of_articles) <> 0 or sum(number_of_occurrences) <> 0
+            order by word
+            on conflict (word) do update
+            set number_of_articles = corpus.number_of_articles + excluded.number_of_articles,
+                number_of_occurrences = corpus.number_of_occurrences + excluded.number_of_occurrences
+            returning corpus.word, corpus.number_of_articles
+        )
+        select array_agg(word) into emptied_words from upserted where number_of_articles <= 0;
+
+        if emptied_words is not null then
+            delete from term_occurrence_per_corpus where word = any(emptied_words);
+        end if;
+
+        delete from term_occurrence_per_article where article_id = old.article_id;
+
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+        select new.article_id, lexeme, coalesce(array_length(positions, 1), 1)
+        from unnest(new.article_content_simple_with_no_stop_words);
+
+        return null;
+    end;
+    $$
+    """
+    )
+
+    op.execute(
+        """
+    create trigger fastapi_article_term_occurrence_trg
+    after insert or delete or update of article_content on fastapi_article
+    for each row execute function sync_term_occurrence()
+    """
+    )
+
+
+def downgrade() -> None:
+    op.execute("drop trigger fastapi_article_term_occurrence_trg on fastapi_article")
+    op.execute("drop function sync_term_occurrence()")
+    op.execute("drop table term_occurrence_per_corpus")
+    op.execute("drop table term_occurrence_per_article")
+
+    op.execute(
+        """
+    create materialized view term_occurrence_per_corpus_mv as
+    select word, ndoc as number_of_articles, nentry as number_of_occurrences
+    from ts_stat('select article_content_simple_with_no_stop_words from fastapi_article')
+    """
+    )
+    op.execute(
+        """
+    create unique index term_occurrence_per_corpus_mv_idx on term_occurrence_per_corpus_mv (word)
+    """
+    )
+
+    op.execute(
+        """
+    create materialized view term_occurrence_per_article_mv as
+    select
+        article_id,
+        word,
+        nentry as number_of_occurrences
+    from fastapi_article,
+        ts_stat('select article_content_simple_with_no_stop_words from fastapi_article where article_id = ' || '''' ||
+                      fastapi_article.article_id || '''' || '::uuid')
+    """
+    )
+    op.execute(
+        """
+    create unique index term_occurrence_per_article_mv_idx on term_occurrence_per_article_mv (article_id, word)
+    """
+    )
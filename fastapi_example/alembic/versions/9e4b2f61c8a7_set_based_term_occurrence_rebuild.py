@@ -0,0 +1,49 @@
+"""add set based rebuild of the term occurrence tables
+
+Revision ID: 9e4b2f61c8a7
+Revises: 5c1e7a9d3b20
+Create Date: 2024-09-12 14:03:27.904115
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9e4b2f61c8a7"
+down_revision: Union[str, None] = "5c1e7a9d3b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # one pass over the stored tsvectors instead of one ts_stat query per article,
+    # ts_stat counts one entry per position of the lexeme, which is what unnest exposes
+    op.execute(
+        """
+    create function rebuild_term_occurrence() returns void
+    language sql
+    as $$
+        truncate term_occurrence_per_article, term_occurrence_per_corpus;
+
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+        select
+            fastapi_article.article_id,
+            terms.lexeme,
+            coalesce(array_length(terms.positions, 1), 1)
+        from fastapi_article,
+            unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms;
+
+        insert into term_occurrence_per_corpus (word, number_of_articles, number_of_occurrences)
+        select word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        group by word;
+    $$
+    """
+    )
+
+
+def downgrade() -> None:
+    op.execute("drop function rebuild_term_occurrence()")
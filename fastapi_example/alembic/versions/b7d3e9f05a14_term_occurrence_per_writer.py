@@ -0,0 +1,183 @@
+"""per writer term occurrence table, maintained by a trigger on fastapi_article
+
+Revision ID: b7d3e9f05a14
+Revises: 9e4b2f61c8a7
+Create Date: 2024-09-16 09:41:27.304812
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d3e9f05a14"
+down_revision: Union[str, None] = "9e4b2f61c8a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+    create table term_occurrence_per_writer (
+        writer_id uuid not null,
+        word text not null,
+        number_of_articles integer not null,
+        number_of_occurrences integer not null,
+        primary key (writer_id, word)
+    )
+    """
+    )
+    op.execute(
+        """
+    comment on table term_occurrence_per_writer is
+        'number of articles and occurrences of each term per writer, maintained by a trigger on fastapi_article'
+    """
+    )
+    # the top words of a writer are read from this index, without sorting the words of the writer
+    op.execute(
+        """
+    create index term_occurrence_per_writer_top_idx
+        on term_occurrence_per_writer (writer_id, number_of_occurrences desc)
+    """
+    )
+
+    op.execute(
+        """
+    insert into term_occurrence_per_writer (writer_id, word, number_of_articles, number_of_occurrences)
+    select
+        fastapi_article.writer_id,
+        terms.lexeme,
+        count(*),
+        sum(coalesce(array_length(terms.positions, 1), 1))
+    from fastapi_article,
+        unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms
+    where fastapi_article.writer_id is not null
+    group by fastapi_article.writer_id, terms.lexeme
+    """
+    )
+
+    # same net delta upsert as sync_term_occurrence, computed from the old and new tsvectors,
+    # an update moving an article to another writer is a delete for the old writer and an insert for the new one,
+    # the articles without a writer are not counted
+    op.execute(
+        """
+    create function sync_writer_term_occurrence() returns trigger
+    language plpgsql
+    as $$
+    declare
+        emptied_writer_ids uuid[];
+        emptied_words text[];
+    begin
+        if tg_op = 'UPDATE'
+            and old.writer_id is not distinct from new.writer_id
+            and old.article_content_simple_with_no_stop_words
+                is not distinct from new.article_content_simple_with_no_stop_words then
+            return null;
+        end if;
+
+        with term_delta as (
+            select old.writer_id as writer_id, lexeme as word, -1 as number_of_articles,
+                -coalesce(array_length(positions, 1), 1) as number_of_occurrences
+            from unnest(old.article_content_simple_with_no_stop_words)
+            where old.writer_id is not null
+            union all
+            select new.writer_id, lexeme, 1, coalesce(array_length(positions, 1), 1)
+            from unnest(new.article_content_simple_with_no_stop_words)
+            where new.writer_id is not null
+        ),
+        upserted as (
+            insert into term_occurrence_per_writer as writer_term
+                (writer_id, word, number_of_articles, number_of_occurrences)
+            select writer_id, word, sum(number_of_articles), sum(number_of_occurrences)
+            from term_delta
+            group by writer_id, word
+            having sum(number_of_articles) <> 0 or sum(number_of_occurrences) <> 0
+            order by writer_id, word
+            on conflict (writer_id, word) do update
+            set number_of_articles = writer_term.number_of_articles + excluded.number_of_articles,
+                number_of_occurrences = writer_term.number_of_occurrences + excluded.number_of_occurrences
+            returning writer_term.writer_id, writer_term.word, writer_term.number_of_articles
+        )
+        select array_agg(writer_id), array_agg(word) into emptied_writer_ids, emptied_words
+        from upserted
+        where number_of_articles <= 0;
+
+        if emptied_words is not null then
+            delete from term_occurrence_per_writer
+            where (writer_id, word) in (select * from unnest(emptied_writer_ids, emptied_words));
+        end if;
+
+        return null;
+    end;
+    $$
+    """
+    )
+
+    op.execute(
+        """
+    create trigger fastapi_article_writer_term_occurrence_trg
+    after insert or delete or update of article_content, writer_id on fastapi_article
+    for each row execute function sync_writer_term_occurrence()
+    """
+    )
+
+    op.execute(
+        """
+    create or replace function rebuild_term_occurrence() returns void
+    language sql
+    as $$
+        truncate term_occurrence_per_article, term_occurrence_per_corpus, term_occurrence_per_writer;
+
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+        select
+            fastapi_article.article_id,
+            terms.lexeme,
+            coalesce(array_length(terms.positions, 1), 1)
+        from fastapi_article,
+            unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms;
+
+        insert into term_occurrence_per_corpus (word, number_of_articles, number_of_occurrences)
+        select word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        group by word;
+
+        insert into term_occurrence_per_writer (writer_id, word, number_of_articles, number_of_occurrences)
+        select fastapi_article.writer_id, word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        join fastapi_article on term_occurrence_per_article.article_id = fastapi_article.article_id
+        where fastapi_article.writer_id is not null
+        group by fastapi_article.writer_id, word;
+    $$
+    """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+    create or replace function rebuild_term_occurrence() returns void
+    language sql
+    as $$
+        truncate term_occurrence_per_article, term_occurrence_per_corpus;
+
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+        select
+            fastapi_article.article_id,
+            terms.lexeme,
+            coalesce(array_length(terms.positions, 1), 1)
+        from fastapi_article,
+            unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms;
+
+        insert into term_occurrence_per_corpus (word, number_of_articles, number_of_occurrences)
+        select word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        group by word;
+    $$
+    """
+    )
+    op.execute("drop trigger fastapi_article_writer_term_occurrence_trg on fastapi_article")
+    op.execute("drop function sync_writer_term_occurrence()")
+    op.execute("drop table term_occurrence_per_writer")
@@ -0,0 +1,60 @@
+"""add article content statistics
+
+Revision ID: c4a8e2d71f36
+Revises: b7d3e9f05a14
+Create Date: 2024-09-18 14:05:52.871340
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a8e2d71f36"
+down_revision: Union[str, None] = "b7d3e9f05a14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# the words are the runs of non whitespace characters, each word replaced by one character adds one to the length
+WORD_COUNT_EXPRESSION = (
+    r"char_length(regexp_replace(coalesce(article_content, ''), '\S+', 'x', 'g'))"
+    r" - char_length(regexp_replace(coalesce(article_content, ''), '\S+', '', 'g'))"
+)
+
+
+def upgrade() -> None:
+    # each stored generated column rewrites the table, the three are added by one statement to rewrite it once
+    op.execute(
+        f"""
+    alter table fastapi_article
+        add column word_count integer generated always as ({WORD_COUNT_EXPRESSION}) stored not null,
+        add column character_count integer
+            generated always as (coalesce(char_length(article_content), 0)) stored not null,
+        add column reading_time_minutes integer
+            generated always as (ceil(({WORD_COUNT_EXPRESSION}) / 238.0)::integer) stored not null
+    """
+    )
+    for column_name, comment in (
+        ("word_count", "the number of words of the content"),
+        ("character_count", "the number of characters of the content"),
+        ("reading_time_minutes", "the estimated reading time of the content in minutes"),
+    ):
+        op.execute(f"comment on column fastapi_article.{column_name} is '{comment}'")
+    op.create_index(
+        "fastapi_article_writer_id_word_count_idx", "fastapi_article", ["writer_id", "word_count"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("fastapi_article_writer_id_word_count_idx", table_name="fastapi_article")
+    op.execute(
+        """
+    alter table fastapi_article
+        drop column reading_time_minutes,
+        drop column character_count,
+        drop column word_count
+    """
+    )
@@ -0,0 +1,170 @@
+"""rank of the terms per article, maintained with the term occurrences
+
+Revision ID: d2f6a8c13e57
+Revises: c4a8e2d71f36
+Create Date: 2024-09-23 10:27:14.662093
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f6a8c13e57"
+down_revision: Union[str, None] = "c4a8e2d71f36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNC_TERM_OCCURRENCE = """
+    create or replace function sync_term_occurrence() returns trigger
+    language plpgsql
+    as $$
+    declare
+        emptied_words text[];
+    begin
+        if tg_op = 'UPDATE'
+            and old.article_content_simple_with_no_stop_words
+                is not distinct from new.article_content_simple_with_no_stop_words then
+            return null;
+        end if;
+
+        with term_delta as (
+            select word, -1 as number_of_articles, -number_of_occurrences as number_of_occurrences
+            from term_occurrence_per_article
+            where article_id = old.article_id
+            union all
+            select lexeme, 1, coalesce(array_length(positions, 1), 1)
+            from unnest(new.article_content_simple_with_no_stop_words)
+        ),
+        upserted as (
+            insert into term_occurrence_per_corpus as corpus (word, number_of_articles, number_of_occurrences)
+            select word, sum(number_of_articles), sum(number_of_occurrences)
+            from term_delta
+            group by word
+            having sum(number_of_articles) <> 0 or sum(number_of_occurrences) <> 0
+            order by word
+            on conflict (word) do update
+            set number_of_articles = corpus.number_of_articles + excluded.number_of_articles,
+                number_of_occurrences = corpus.number_of_occurrences + excluded.number_of_occurrences
+            returning corpus.word, corpus.number_of_articles
+        )
+        select array_agg(word) into emptied_words from upserted where number_of_articles <= 0;
+
+        if emptied_words is not null then
+            delete from term_occurrence_per_corpus where word = any(emptied_words);
+        end if;
+
+        delete from term_occurrence_per_article where article_id = old.article_id;
+
+        {insert_article_terms}
+
+        return null;
+    end;
+    $$
+"""
+
+INSERT_ARTICLE_TERMS = """
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+        select new.article_id, lexeme, coalesce(array_length(positions, 1), 1)
+        from unnest(new.article_content_simple_with_no_stop_words);
+"""
+
+# the rank orders the terms of the article by number of occurrences, the ties by word
+INSERT_RANKED_ARTICLE_TERMS = """
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences, term_rank)
+        select
+            new.article_id,
+            lexeme,
+            coalesce(array_length(positions, 1), 1),
+            row_number() over (order by coalesce(array_length(positions, 1), 1) desc, lexeme)
+        from unnest(new.article_content_simple_with_no_stop_words);
+"""
+
+REBUILD_TERM_OCCURRENCE = """
+    create or replace function rebuild_term_occurrence() returns void
+    language sql
+    as $$
+        truncate term_occurrence_per_article, term_occurrence_per_corpus, term_occurrence_per_writer;
+
+        {insert_article_terms}
+
+        insert into term_occurrence_per_corpus (word, number_of_articles, number_of_occurrences)
+        select word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        group by word;
+
+        insert into term_occurrence_per_writer (writer_id, word, number_of_articles, number_of_occurrences)
+        select fastapi_article.writer_id, word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        join fastapi_article on term_occurrence_per_article.article_id = fastapi_article.article_id
+        where fastapi_article.writer_id is not null
+        group by fastapi_article.writer_id, word;
+    $$
+"""
+
+REBUILD_ARTICLE_TERMS = """
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences)
+        select
+            fastapi_article.article_id,
+            terms.lexeme,
+            coalesce(array_length(terms.positions, 1), 1)
+        from fastapi_article,
+            unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms;
+"""
+
+REBUILD_RANKED_ARTICLE_TERMS = """
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences, term_rank)
+        select
+            fastapi_article.article_id,
+            terms.lexeme,
+            coalesce(array_length(terms.positions, 1), 1),
+            row_number() over (
+                partition by fastapi_article.article_id
+                order by coalesce(array_length(terms.positions, 1), 1) desc, terms.lexeme
+            )
+        from fastapi_article,
+            unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms;
+"""
+
+
+def upgrade() -> None:
+    op.execute("alter table term_occurrence_per_article add column term_rank integer")
+
+    op.execute(
+        """
+    update term_occurrence_per_article
+    set term_rank = ranked.term_rank
+    from (
+        select
+            article_id,
+            word,
+            row_number() over (partition by article_id order by number_of_occurrences desc, word) as term_rank
+        from term_occurrence_per_article
+    ) as ranked
+    where term_occurrence_per_article.article_id = ranked.article_id
+        and term_occurrence_per_article.word = ranked.word
+    """
+    )
+    op.execute("alter table term_occurrence_per_article alter column term_rank set not null")
+
+    # the top terms of all the articles are a small part of the table, read with an index only scan
+    op.execute(
+        """
+    create index term_occurrence_per_article_top_idx
+        on term_occurrence_per_article (article_id, term_rank) include (word, number_of_occurrences)
+        where term_rank <= 20
+    """
+    )
+
+    op.execute(SYNC_TERM_OCCURRENCE.replace("{insert_article_terms}", INSERT_RANKED_ARTICLE_TERMS))
+    op.execute(REBUILD_TERM_OCCURRENCE.replace("{insert_article_terms}", REBUILD_RANKED_ARTICLE_TERMS))
+
+
+def downgrade() -> None:
+    op.execute(REBUILD_TERM_OCCURRENCE.replace("{insert_article_terms}", REBUILD_ARTICLE_TERMS))
+    op.execute(SYNC_TERM_OCCURRENCE.replace("{insert_article_terms}", INSERT_ARTICLE_TERMS))
+
+    op.execute("drop index term_occurrence_per_article_top_idx")
+    op.execute("alter table term_occurrence_per_article drop column term_rank")
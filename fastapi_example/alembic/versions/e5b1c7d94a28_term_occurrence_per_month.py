@@ -0,0 +1,233 @@
+"""monthly rollups of the term occurrences of the published articles, maintained by a trigger on fastapi_article
+
+Revision ID: e5b1c7d94a28
+Revises: d2f6a8c13e57
+Create Date: 2024-09-27 16:48:03.105276
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b1c7d94a28"
+down_revision: Union[str, None] = "d2f6a8c13e57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REBUILD_TERM_OCCURRENCE = """
+    create or replace function rebuild_term_occurrence() returns void
+    language sql
+    as $$
+        truncate term_occurrence_per_article, term_occurrence_per_corpus, term_occurrence_per_writer{month_tables};
+
+        insert into term_occurrence_per_article (article_id, word, number_of_occurrences, term_rank)
+        select
+            fastapi_article.article_id,
+            terms.lexeme,
+            coalesce(array_length(terms.positions, 1), 1),
+            row_number() over (
+                partition by fastapi_article.article_id
+                order by coalesce(array_length(terms.positions, 1), 1) desc, terms.lexeme
+            )
+        from fastapi_article,
+            unnest(fastapi_article.article_content_simple_with_no_stop_words) as terms;
+
+        insert into term_occurrence_per_corpus (word, number_of_articles, number_of_occurrences)
+        select word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        group by word;
+
+        insert into term_occurrence_per_writer (writer_id, word, number_of_articles, number_of_occurrences)
+        select fastapi_article.writer_id, word, count(*), sum(number_of_occurrences)
+        from term_occurrence_per_article
+        join fastapi_article on term_occurrence_per_article.article_id = fastapi_article.article_id
+        where fastapi_article.writer_id is not null
+        group by fastapi_article.writer_id, word;
+        {insert_month_tables}
+    $$
+"""
+
+INSERT_MONTH_TABLES = """
+        insert into term_occurrence_per_month (month, word, number_of_articles, number_of_occurrences)
+        select
+            date_trunc('month', fastapi_article.date_first_published at time zone 'UTC')::date,
+            word,
+            count(*),
+            sum(number_of_occurrences)
+        from term_occurrence_per_article
+        join fastapi_article on term_occurrence_per_article.article_id = fastapi_article.article_id
+        where fastapi_article.date_first_published is not null
+        group by 1, word;
+
+        insert into article_count_per_month (month, number_of_articles, number_of_occurrences)
+        select
+            date_trunc('month', fastapi_article.date_first_published at time zone 'UTC')::date,
+            count(distinct fastapi_article.article_id),
+            coalesce(sum(term_occurrence_per_article.number_of_occurrences), 0)
+        from fastapi_article
+        left join term_occurrence_per_article on term_occurrence_per_article.article_id = fastapi_article.article_id
+        where fastapi_article.date_first_published is not null
+        group by 1;
+"""
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+    create table term_occurrence_per_month (
+        month date not null,
+        word text not null,
+        number_of_articles integer not null,
+        number_of_occurrences integer not null,
+        primary key (month, word)
+    )
+    """
+    )
+    op.execute(
+        """
+    comment on table term_occurrence_per_month is
+        'number of published articles and occurrences of each term per month of first publication, '
+        'maintained by a trigger on fastapi_article'
+    """
+    )
+    op.execute(
+        """
+    create index term_occurrence_per_month_top_idx
+        on term_occurrence_per_month (month, number_of_occurrences desc)
+    """
+    )
+
+    op.execute(
+        """
+    create table article_count_per_month (
+        month date not null primary key,
+        number_of_articles integer not null,
+        number_of_occurrences integer not null
+    )
+    """
+    )
+    op.execute(
+        """
+    comment on table article_count_per_month is
+        'number of published articles and term occurrences per month of first publication, '
+        'maintained by a trigger on fastapi_article'
+    """
+    )
+
+    op.execute(INSERT_MONTH_TABLES)
+
+    # the month of an article is the month of its first publication in UTC, the drafts have none and are not counted,
+    # a change of month is a delete for the old month and an insert for the new one
+    op.execute(
+        """
+    create function sync_term_occurrence_per_month() returns trigger
+    language plpgsql
+    as $$
+    declare
+        old_month date;
+        new_month date;
+        emptied_months date[];
+        emptied_words text[];
+    begin
+        if tg_op in ('UPDATE', 'DELETE') then
+            old_month := date_trunc('month', old.date_first_published at time zone 'UTC')::date;
+        end if;
+        if tg_op in ('UPDATE', 'INSERT') then
+            new_month := date_trunc('month', new.date_first_published at time zone 'UTC')::date;
+        end if;
+
+        if old_month is null and new_month is null then
+            return null;
+        end if;
+        if tg_op = 'UPDATE'
+            and old_month is not distinct from new_month
+            and old.article_content_simple_with_no_stop_words
+                is not distinct from new.article_content_simple_with_no_stop_words then
+            return null;
+        end if;
+
+        with term_delta as (
+            select old_month as month, lexeme as word, -1 as number_of_articles,
+                -coalesce(array_length(positions, 1), 1) as number_of_occurrences
+            from unnest(old.article_content_simple_with_no_stop_words)
+            where old_month is not null
+            union all
+            select new_month, lexeme, 1, coalesce(array_length(positions, 1), 1)
+            from unnest(new.article_content_simple_with_no_stop_words)
+            where new_month is not null
+        ),
+        upserted as (
+            insert into term_occurrence_per_month as month_term
+                (month, word, number_of_articles, number_of_occurrences)
+            select month, word, sum(number_of_articles), sum(number_of_occurrences)
+            from term_delta
+            group by month, word
+            having sum(number_of_articles) <> 0 or sum(number_of_occurrences) <> 0
+            order by month, word
+            on conflict (month, word) do update
+            set number_of_articles = month_term.number_of_articles + excluded.number_of_articles,
+                number_of_occurrences = month_term.number_of_occurrences + excluded.number_of_occurrences
+            returning month_term.month, month_term.word, month_term.number_of_articles
+        )
+        select array_agg(month), array_agg(word) into emptied_months, emptied_words
+        from upserted
+        where number_of_articles <= 0;
+
+        if emptied_words is not null then
+            delete from term_occurrence_per_month
+            where (month, word) in (select * from unnest(emptied_months, emptied_words));
+        end if;
+
+        with article_delta as (
+            select old_month as month, -1 as number_of_articles,
+                -coalesce(sum(coalesce(array_length(positions, 1), 1)), 0) as number_of_occurrences
+            from unnest(old.article_content_simple_with_no_stop_words)
+            having old_month is not null
+            union all
+            select new_month, 1, coalesce(sum(coalesce(array_length(positions, 1), 1)), 0)
+            from unnest(new.article_content_simple_with_no_stop_words)
+            having new_month is not null
+        )
+        insert into article_count_per_month as month_count (month, number_of_articles, number_of_occurrences)
+        select month, sum(number_of_articles), sum(number_of_occurrences)
+        from article_delta
+        group by month
+        having sum(number_of_articles) <> 0 or sum(number_of_occurrences) <> 0
+        order by month
+        on conflict (month) do update
+        set number_of_articles = month_count.number_of_articles + excluded.number_of_articles,
+            number_of_occurrences = month_count.number_of_occurrences + excluded.number_of_occurrences;
+
+        delete from article_count_per_month
+        where month in (old_month, new_month) and number_of_articles <= 0;
+
+        return null;
+    end;
+    $$
+    """
+    )
+
+    op.execute(
+        """
+    create trigger fastapi_article_term_occurrence_per_month_trg
+    after insert or delete or update of article_content, date_first_published on fastapi_article
+    for each row execute function sync_term_occurrence_per_month()
+    """
+    )
+
+    op.execute(
+        REBUILD_TERM_OCCURRENCE.replace(
+            "{month_tables}", ", term_occurrence_per_month, article_count_per_month"
+        ).replace("{insert_month_tables}", INSERT_MONTH_TABLES)
+    )
+
+
+def downgrade() -> None:
+    op.execute(REBUILD_TERM_OCCURRENCE.replace("{month_tables}", "").replace("{insert_month_tables}", ""))
+    op.execute("drop trigger fastapi_article_term_occurrence_per_month_trg on fastapi_article")
+    op.execute("drop function sync_term_occurrence_per_month()")
+    op.execute("drop table article_count_per_month")
+    op.execute("drop table term_occurrence_per_month")
@@ -0,0 +1,96 @@
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import Query
+
+from mysite.admin.schemas import AnalyticsAdmissionOutSchema
+from mysite.admin.schemas import AnalyticsRefreshOutSchema
+from mysite.admin.schemas import DuckdbEngineOutSchema
+from mysite.admin.schemas import QueryMetricsOutSchema
+from mysite.admin.schemas import QueryPlansOutSchema
+from mysite.admin.schemas import RenderPoolOutSchema
+from mysite.admin.schemas import ResponseCacheOutSchema
+from mysite.admin.schemas import SingleFlightOutSchema
+from mysite.admin.schemas import TfidfEngineOutSchema
+from mysite.admin.schemas import WriterPrincipalCacheOutSchema
+from mysite.database import analytics_engine
+from mysite.database import plan_capture
+from mysite.database import query_metrics
+from mysite.text_analytics.api import analytics_admission_limiter
+from mysite.text_analytics.api import analytics_response_cache
+from mysite.text_analytics.api import analytics_single_flight
+from mysite.text_analytics.duckdb_engine import duckdb_engine
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.rendering import wordcloud_render_pool
+from mysite.text_analytics.tfidf_engine import tfidf_engine
+from mysite.utils.auth import authenticate_admin
+from mysite.utils.auth import writer_principal_cache
+
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(authenticate_admin)])
+
+
+@admin_router.get("/analytics-refresh", response_model=AnalyticsRefreshOutSchema)
+async def get_analytics_refresh():
+    return analytics_refresher.status()
+
+
+@admin_router.post("/analytics-refresh")
+async def request_analytics_refresh():
+    analytics_refresher.request_refresh()
+    return {"detail": "Refresh requested"}
+
+
+@admin_router.get("/analytics-cache", response_model=ResponseCacheOutSchema)
+async def get_analytics_cache():
+    return analytics_response_cache.status()
+
+
+@admin_router.get("/render-pool", response_model=RenderPoolOutSchema)
+async def get_render_pool():
+    return wordcloud_render_pool.status()
+
+
+@admin_router.get("/tfidf-engine", response_model=TfidfEngineOutSchema)
+async def get_tfidf_engine():
+    return tfidf_engine.status()
+
+
+@admin_router.get("/duckdb-engine", response_model=DuckdbEngineOutSchema)
+async def get_duckdb_engine():
+    return duckdb_engine.status()
+
+
+@admin_router.get("/query-metrics", response_model=QueryMetricsOutSchema)
+async def get_query_metrics(limit: int = Query(50, ge=1, le=1000, description="the number of statements")):
+    return query_metrics.status(limit)
+
+
+@admin_router.delete("/query-metrics")
+async def reset_query_metrics():
+    query_metrics.reset()
+    return {"detail": "Query metrics reset"}
+
+
+@admin_router.get("/query-plans", response_model=QueryPlansOutSchema)
+async def get_query_plans(
+    fingerprint: str | None = Query(None, description="only the plans of the statement fingerprint"),
+    limit: int = Query(10, ge=1, le=100, description="the number of plans"),
+):
+    return plan_capture.status(fingerprint, limit)
+
+
+@admin_router.get("/analytics-admission", response_model=AnalyticsAdmissionOutSchema)
+async def get_analytics_admission():
+    return analytics_admission_limiter.status() | {
+        "pool_size": analytics_engine.pool.size(),
+        "pool_checked_out": analytics_engine.pool.checkedout(),
+    }
+
+
+@admin_router.get("/analytics-single-flight", response_model=SingleFlightOutSchema)
+async def get_analytics_single_flight():
+    return analytics_single_flight.status()
+
+
+@admin_router.get("/writer-principal-cache", response_model=WriterPrincipalCacheOutSchema)
+async def get_writer_principal_cache():
+    return writer_principal_cache.status()
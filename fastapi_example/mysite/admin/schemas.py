@@ -0,0 +1,181 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AnalyticsRefreshOutSchema(BaseModel):
+    generation: int = Field(..., description="the generation of the analytics data, incremented by each refresh")
+    lsn: str | None = Field(None, description="the WAL location of the primary at the end of the last refresh")
+    last_refreshed: datetime | None = Field(None, description="the date time in UTC, when the last refresh finished")
+    last_duration_ms: float | None = Field(None, description="the duration of the last refresh in milliseconds")
+    last_error: str | None = Field(None, description="the error of the last refresh, if it failed")
+    refresh_pending: bool = Field(..., description="true if article writes are waiting for a refresh")
+    staleness_seconds: float = Field(..., description="the seconds since the oldest write waiting for a refresh")
+    number_of_requests: int = Field(..., description="the number of refresh requests since startup")
+    number_of_refreshes: int = Field(..., description="the number of refreshes since startup")
+    number_of_skipped: int = Field(..., description="the number of periodic refreshes skipped, nothing changed")
+    materialized_views: list[str] = Field(..., description="the materialized views refreshed concurrently")
+
+
+class ResponseCacheOutSchema(BaseModel):
+    number_of_entries: int = Field(..., description="the number of cached responses")
+    size_bytes: int = Field(..., description="the total size of the cached responses")
+    max_bytes: int = Field(..., description="the size above which the least recently used responses are evicted")
+    hits: int = Field(..., description="the number of requests served from the cache")
+    misses: int = Field(..., description="the number of requests rendered again")
+    bypasses: int = Field(..., description="the number of responses not cached, read from a lagging database")
+    evictions: int = Field(..., description="the number of responses evicted to stay within max_bytes")
+
+
+class RenderPoolOutSchema(BaseModel):
+    max_workers: int = Field(..., description="the number of worker processes")
+    max_queue: int = Field(..., description="the number of renders allowed to wait for a worker")
+    in_flight: int = Field(..., description="the number of renders running or waiting for a worker")
+    queue_depth: int = Field(..., description="the number of renders waiting for a worker")
+    number_of_renders: int = Field(..., description="the number of completed renders since startup")
+    number_of_rejections: int = Field(..., description="the number of renders rejected as the pool was saturated")
+    number_of_failures: int = Field(..., description="the number of failed renders since startup")
+    number_of_restarts: int = Field(..., description="the number of times the pool was restarted after a worker died")
+    average_render_ms: float | None = Field(None, description="the average render time in a worker")
+    average_wait_ms: float | None = Field(None, description="the average time waiting for a worker")
+    max_render_ms: float | None = Field(None, description="the longest render time in a worker")
+    last_render_ms: float | None = Field(None, description="the render time of the last render")
+
+
+class TfidfEngineOutSchema(BaseModel):
+    loaded: bool = Field(..., description="true once the TF-IDF matrix is built")
+    number_of_articles: int = Field(..., description="the number of articles, rows of the matrix")
+    vocabulary_size: int = Field(..., description="the number of distinct words, columns of the matrix")
+    number_of_entries: int = Field(..., description="the number of non zero scores of the matrix")
+    size_bytes: int = Field(..., description="the size of the matrix arrays")
+    last_build_ms: float | None = Field(None, description="the duration of the last build in milliseconds")
+    last_number_of_changed_articles: int | None = Field(
+        None, description="the number of articles whose term occurrences were read again by the last build"
+    )
+    number_of_neighbours: int = Field(..., description="the number of similar articles kept per article")
+    neighbours_full_build: bool | None = Field(
+        None, description="true if the last update of the similar articles computed all of them again"
+    )
+    neighbours_changes_since_full_build: int = Field(
+        ..., description="the number of articles created, changed or deleted since the last full build"
+    )
+    last_neighbours_ms: float | None = Field(
+        None, description="the duration of the last update of the similar articles in milliseconds"
+    )
+
+
+class DuckdbEngineOutSchema(BaseModel):
+    installed: bool = Field(..., description="true if duckdb is installed")
+    queries: list[str] = Field(..., description="the analytics queries served by DuckDB")
+    generation: int | None = Field(None, description="the generation of the analytics data of the snapshot")
+    up_to_date: bool = Field(..., description="true if the snapshot is of the current generation")
+    number_of_rows: dict[str, int] = Field(..., description="the number of rows of each table of the snapshot")
+    size_bytes: int = Field(..., description="the size of the Parquet files of the snapshot")
+    last_export_ms: float | None = Field(None, description="the duration of the last export in milliseconds")
+    last_error: str | None = Field(None, description="the error of the last export, if it failed")
+    number_of_queries: int = Field(..., description="the number of queries served by DuckDB since startup")
+    number_of_fallbacks: int = Field(
+        ..., description="the number of queries enabled for DuckDB run on Postgres as the snapshot was behind"
+    )
+
+
+class StatementMetricsSchema(BaseModel):
+    fingerprint: str = Field(..., description="the hash of the normalized statement")
+    statement: str = Field(..., description="the statement with its parameters and literals replaced by ?")
+    sample_statement: str | None = Field(None, description="the full text of a sampled execution")
+    count: int = Field(..., description="the number of executions")
+    errors: int = Field(..., description="the number of failed executions")
+    total_ms: float = Field(..., description="the total duration of the executions in milliseconds")
+    mean_ms: float | None = Field(None, description="the mean duration of the executions in milliseconds")
+    max_ms: float = Field(..., description="the longest execution in milliseconds")
+    rows: int = Field(..., description="the number of rows returned or affected")
+    compiled_cache_hits: int = Field(..., description="the number of executions compiled from the cache")
+    prepared_statement_cache_hits: int = Field(..., description="the number of executions prepared from the cache")
+    latency_histogram: dict[str, int] = Field(
+        ..., description="the number of executions per latency bucket, keyed on the upper bound in milliseconds"
+    )
+
+
+class SlowQuerySchema(BaseModel):
+    fingerprint: str = Field(..., description="the hash of the normalized statement")
+    duration_ms: float = Field(..., description="the duration of the execution in milliseconds")
+    rows: int = Field(..., description="the number of rows returned or affected, -1 if it failed")
+    parameter_types: str = Field(..., description="the types of the bind parameters, truncated")
+    executed: datetime = Field(..., description="the date time in UTC, when the execution finished")
+
+
+class QueryMetricsOutSchema(BaseModel):
+    started: datetime = Field(..., description="the date time in UTC, when the metrics were started or reset")
+    number_of_statements: int = Field(..., description="the number of executions recorded")
+    number_of_fingerprints: int = Field(..., description="the number of distinct normalized statements")
+    number_of_evictions: int = Field(..., description="the number of fingerprints dropped as the limit was reached")
+    slow_query_ms: float = Field(..., description="the duration above which the parameter types are kept")
+    latency_buckets_ms: list[float] = Field(..., description="the upper bounds of the latency buckets")
+    compiled_cache_hits: int = Field(..., description="the number of executions compiled from the cache")
+    compiled_cache_misses: int = Field(..., description="the number of executions compiled")
+    compiled_cache_hit_ratio: float | None = Field(None, description="the share of executions compiled from the cache")
+    prepared_statement_cache_hits: int = Field(..., description="the number of executions prepared from the cache")
+    prepared_statement_cache_misses: int = Field(..., description="the number of executions prepared")
+    prepared_statement_cache_hit_ratio: float | None = Field(
+        None, description="the share of executions prepared from the cache"
+    )
+    statements: list[StatementMetricsSchema] = Field(..., description="the statements by total duration, highest first")
+    slow_queries: list[SlowQuerySchema] = Field(..., description="the last slow executions, latest first")
+
+
+class QueryPlanSchema(BaseModel):
+    fingerprint: str = Field(..., description="the hash of the normalized statement")
+    statement: str = Field(..., description="the statement with its parameters and literals replaced by ?")
+    database: str = Field(..., description="the url, without the password, of the database which executed it")
+    duration_ms: float = Field(..., description="the duration of the slow execution in milliseconds")
+    planning_ms: float | None = Field(None, description="the planning time of the explained execution")
+    execution_ms: float | None = Field(None, description="the execution time of the explained execution")
+    plan_shape: str = Field(..., description="the node types and relations of the plan")
+    plan: dict = Field(..., description="the EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output")
+    captured: datetime = Field(..., description="the date time in UTC, when the plan was captured")
+
+
+class QueryPlansOutSchema(BaseModel):
+    enabled: bool = Field(..., description="whether the plans of the slow statements are captured")
+    threshold_ms: float = Field(..., description="the duration above which the statements are explained")
+    sample_rate: float = Field(..., description="the share of the slow statements explained")
+    number_of_captures: int = Field(..., description="the number of plans captured")
+    number_of_skipped: int = Field(..., description="the number of slow statements not explained")
+    number_of_errors: int = Field(..., description="the number of failed captures")
+    last_error: str | None = Field(None, description="the last error of a capture")
+    plans: list[QueryPlanSchema] = Field(..., description="the latest plans, latest first")
+
+
+class AnalyticsAdmissionOutSchema(BaseModel):
+    max_running: int = Field(..., description="the number of analytics requests running at once")
+    max_queued: int = Field(..., description="the number of analytics requests waiting at once")
+    running: int = Field(..., description="the number of analytics requests running")
+    queued: int = Field(..., description="the number of analytics requests waiting")
+    number_of_admitted: int = Field(..., description="the number of analytics requests admitted")
+    number_of_rejected_queue_full: int = Field(..., description="the number of requests rejected with a 429")
+    number_of_rejected_queue_timeout: int = Field(..., description="the number of requests rejected with a 503")
+    pool_size: int = Field(..., description="the number of connections of the analytics pool")
+    pool_checked_out: int = Field(..., description="the number of connections of the analytics pool in use")
+
+
+class SingleFlightOutSchema(BaseModel):
+    number_of_calls: int = Field(..., description="the number of requests missing the cache")
+    number_of_executions: int = Field(..., description="the number of executions of the routes")
+    number_of_coalesced: int = Field(..., description="the number of requests served by the execution of another")
+    number_of_cancelled: int = Field(..., description="the number of executions cancelled once no request waited")
+    number_of_fallbacks: int = Field(..., description="the number of requests executed again, the result sent once")
+    number_of_in_flight: int = Field(..., description="the number of executions running")
+    coalescing_ratio: float | None = Field(None, description="the share of the requests served by another execution")
+
+
+class WriterPrincipalCacheOutSchema(BaseModel):
+    number_of_entries: int = Field(..., description="the number of authenticated writers cached")
+    max_entries: int = Field(..., description="the number of authenticated writers cached at most")
+    ttl_seconds: float = Field(..., description="the time an authenticated writer is cached for")
+    hits: int = Field(..., description="the number of authentications served from the cache")
+    misses: int = Field(..., description="the number of authentications looked up in the database")
+    invalidations: int = Field(..., description="the number of entries invalidated by the writes of their writer")
+    stale_lookups: int = Field(
+        ..., description="the number of lookups not cached as their writer was invalidated since"
+    )
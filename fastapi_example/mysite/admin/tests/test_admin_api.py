@@ -0,0 +1,162 @@
+import asyncio
+import uuid
+
+import pytest
+from httpx import ASGITransport
+from httpx import AsyncClient
+
+from mysite import settings
+from mysite.database import engine
+from mysite.database import plan_capture
+from mysite.database import query_metrics
+from mysite.main import app
+from mysite.text_analytics.refresh import analytics_refresher
+
+ADMIN_API_KEY = "thisshouldbeasecret"
+
+
+@pytest.fixture(autouse=True)
+def admin_api_key(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", ADMIN_API_KEY)
+
+
+@pytest.mark.asyncio(scope="session")
+class TestAdmin:
+    async def test_admin_unauthenticated(self):
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get("/api/v1/fastapi/admin/query-metrics")
+            assert response.status_code == 401
+
+            response = await client.delete("/api/v1/fastapi/admin/query-metrics", headers={"key": "public"})
+            assert response.status_code == 401
+
+    async def test_get_analytics_refresh(self):
+        generation = analytics_refresher.generation
+        await analytics_refresher.refresh()
+
+        async with AsyncClient(
+            base_url="http://test", transport=ASGITransport(app=app), headers={"key": ADMIN_API_KEY}
+        ) as client:
+            response = await client.get("/api/v1/fastapi/admin/analytics-refresh")
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data["generation"] == generation + 1
+        assert response_data["last_refreshed"]
+        assert not response_data["refresh_pending"]
+
+    async def test_request_analytics_refresh(self):
+        async with AsyncClient(
+            base_url="http://test", transport=ASGITransport(app=app), headers={"key": ADMIN_API_KEY}
+        ) as client:
+            response = await client.post("/api/v1/fastapi/admin/analytics-refresh")
+            assert response.status_code == 200
+
+            response = await client.get("/api/v1/fastapi/admin/analytics-refresh")
+
+        assert response.json()["refresh_pending"]
+
+    async def test_failed_refresh_stays_pending(self, monkeypatch):
+        analytics_refresher.request_refresh()
+        monkeypatch.setattr(analytics_refresher, "materialized_views", ["missing_materialized_view"])
+        await analytics_refresher.refresh()
+
+        status = analytics_refresher.status()
+        assert status["last_error"]
+        assert status["refresh_pending"]
+        assert status["staleness_seconds"] > 0
+
+        monkeypatch.undo()
+        await analytics_refresher.refresh()
+        assert not analytics_refresher.status()["refresh_pending"]
+
+    async def test_periodic_refresh_skipped_without_changes(self, monkeypatch):
+        number_of_writes = 1
+
+        async def get_number_of_writes(db):
+            return number_of_writes
+
+        monkeypatch.setattr(analytics_refresher, "number_of_writes", get_number_of_writes)
+        await analytics_refresher.refresh()
+        generation = analytics_refresher.generation
+
+        await analytics_refresher.refresh(only_if_changed=True)
+        assert analytics_refresher.generation == generation
+        assert analytics_refresher.status()["number_of_skipped"] >= 1
+
+        number_of_writes = 2
+        await analytics_refresher.refresh(only_if_changed=True)
+        assert analytics_refresher.generation == generation + 1
+
+        analytics_refresher.request_refresh()
+        await analytics_refresher.refresh(only_if_changed=True)
+        assert analytics_refresher.generation == generation + 2
+
+    async def test_get_query_metrics(self):
+        async with AsyncClient(
+            base_url="http://test", transport=ASGITransport(app=app), headers={"key": ADMIN_API_KEY}
+        ) as client:
+            response = await client.delete("/api/v1/fastapi/admin/query-metrics")
+            assert response.status_code == 200
+
+            for _ in range(2):
+                await client.get("/api/v1/fastapi/writers")
+            response = await client.get("/api/v1/fastapi/admin/query-metrics")
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data["number_of_statements"] >= 2
+        statement = max(response_data["statements"], key=lambda statement: statement["count"])
+        assert statement["count"] >= 2
+        assert sum(statement["latency_histogram"].values()) == statement["count"]
+        assert statement["compiled_cache_hits"] >= 1
+        assert response_data["compiled_cache_hit_ratio"] > 0
+        assert "$1" not in statement["statement"]
+
+    async def test_slow_query_parameters_not_kept(self, monkeypatch):
+        monkeypatch.setattr(query_metrics, "slow_query_ms", 0)
+        writer_id = uuid.uuid4()
+
+        async with AsyncClient(
+            base_url="http://test", transport=ASGITransport(app=app), headers={"key": ADMIN_API_KEY}
+        ) as client:
+            await client.get(f"/api/v1/fastapi/writers/{writer_id}")
+            response = await client.get("/api/v1/fastapi/admin/query-metrics")
+
+        slow_queries = response.json()["slow_queries"]
+        assert slow_queries
+        assert all(str(writer_id) not in slow_query["parameter_types"] for slow_query in slow_queries)
+        assert any("UUID" in slow_query["parameter_types"] for slow_query in slow_queries)
+
+    async def test_get_query_plans(self, monkeypatch):
+        monkeypatch.setattr(plan_capture, "enabled", True)
+        monkeypatch.setattr(plan_capture, "threshold_ms", 0)
+        monkeypatch.setattr(plan_capture, "sample_rate", 1)
+        monkeypatch.setattr(plan_capture, "interval_seconds", 0)
+        number_of_captures = plan_capture.number_of_captures
+
+        async with AsyncClient(
+            base_url="http://test", transport=ASGITransport(app=app), headers={"key": ADMIN_API_KEY}
+        ) as client:
+            await client.get("/api/v1/fastapi/writers")
+            async with asyncio.timeout(10):
+                while plan_capture.number_of_captures == number_of_captures:
+                    await asyncio.sleep(0.05)
+
+            response = await client.get("/api/v1/fastapi/admin/query-plans", params={"limit": 1})
+
+        assert response.status_code == 200
+        plan = response.json()["plans"][0]
+        assert plan["statement"].lower().startswith("select")
+        assert plan["plan"]["Plan"]["Node Type"]
+        assert plan["plan_shape"]
+        assert plan["database"]
+
+    async def test_query_plan_not_captured_for_writing_function(self):
+        number_of_errors = plan_capture.number_of_errors
+        statement = "select rebuild_term_occurrence()"
+
+        await plan_capture.capture(engine, query_metrics.fingerprint(statement), statement, None, 0)
+
+        assert plan_capture.number_of_errors == number_of_errors + 1
+        assert "read-only" in plan_capture.last_error
@@ -3,6 +3,7 @@ import logging
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi import Query
 from fastapi.responses import HTMLResponse
 from pydantic import UUID4
 from sqlalchemy import delete
@@ -14,14 +15,20 @@ from mysite.articles.constants import ArticleStatus
 from mysite.articles.models import Article
 from mysite.articles.models import ArticleTags
 from mysite.articles.models import Tag
+from mysite.articles.queries import select_article_with_writer_and_tags
 from mysite.articles.schemas import ArticleExtendedOutSchema
 from mysite.articles.schemas import ArticleInSchema
 from mysite.articles.schemas import ArticleOutSchema
+from mysite.articles.schemas import ArticleSearchOutSchema
 from mysite.articles.schemas import TagInSchema
+from mysite.articles.search import InvalidCursor
+from mysite.articles.search import search_articles
 from mysite.database import get_db
+from mysite.database import get_read_db
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.utils.auth import WriterPrincipal
 from mysite.utils.auth import authenticate_user
 from mysite.utils.auth import authenticate_writer
-from mysite.writers.models import Writer
 
 articles_router = APIRouter(prefix="/articles")
 logger = logging.getLogger(__file__)
@@ -29,7 +36,9 @@ logger = logging.getLogger(__file__)
 
 @articles_router.post("", response_model=ArticleOutSchema)
 async def create_article(
-    input_data: ArticleInSchema, auth: Writer = Depends(authenticate_writer), db: AsyncSession = Depends(get_db)
+    input_data: ArticleInSchema,
+    auth: WriterPrincipal = Depends(authenticate_writer),
+    db: AsyncSession = Depends(get_db),
 ):
     article_obj = Article(
         article_name=input_data.article_name,
@@ -41,6 +50,8 @@ async def create_article(
     await db.commit()
     await db.refresh(article_obj)
 
+    analytics_refresher.request_refresh()
+
     return article_obj
 
 
@@ -75,21 +86,49 @@ async def add_tags(
     return {"detail": "Added successfully"}
 
 
+@articles_router.get("/search", response_model=ArticleSearchOutSchema)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="the search query, in web search syntax"),
+    writer_id: UUID4 | None = Query(None, description="only the articles of this writer"),
+    tag: str | None = Query(None, max_length=70, description="only the articles with this tag"),
+    article_status: ArticleStatus | None = Query(None, description="only the articles with this status"),
+    headline: bool = Query(False, description="include the fragments of the content matching the query"),
+    cursor: str | None = Query(None, description="the next_cursor of the previous page"),
+    limit: int = Query(20, ge=1, le=100, description="the number of articles per page"),
+    auth=Depends(authenticate_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Full text search over the stored tsvector, ranked with ts_rank_cd and paginated with a keyset cursor.
+    """
+    is_writer = isinstance(auth, WriterPrincipal)
+    try:
+        return await search_articles(
+            db,
+            q=q,
+            writer_id=writer_id,
+            tag=tag,
+            article_status=article_status,
+            visible_writer_id=auth.writer_id if is_writer else None,
+            headline=headline,
+            show_members_only_content=is_writer or auth.get("medium_member", False),
+            cursor=cursor,
+            limit=limit,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
 @articles_router.get("/{article_id}", response_model=ArticleExtendedOutSchema)
-async def get_article(article_id: UUID4, auth=Depends(authenticate_user), db: AsyncSession = Depends(get_db)):
+async def get_article(article_id: UUID4, auth=Depends(authenticate_user), db: AsyncSession = Depends(get_read_db)):
     """
     This code is intended for learning purposes, in the area of using multiple authenticators in one API.
     """
-    article_obj = await db.scalar(
-        select(Article)
-        .options(joinedload(Article.writer, innerjoin=True))
-        .options(joinedload(Article.tags, innerjoin=False))
-        .where(Article.article_id == article_id)
-    )
+    article_obj = await db.scalar(select_article_with_writer_and_tags(article_id))
     if not article_obj:
         raise HTTPException(status_code=404, detail="Article not found")
 
-    if isinstance(auth, Writer):
+    if isinstance(auth, WriterPrincipal):
         if article_obj.article_status == ArticleStatus.draft.value and article_obj.writer_id != auth.writer_id:
             raise HTTPException(status_code=403, detail="you are not allowed to read this article")
         return article_obj
@@ -104,7 +143,7 @@ async def get_article(article_id: UUID4, auth=Depends(authenticate_user), db: As
 
 
 @articles_router.get("/{article_id}/html", response_class=HTMLResponse)
-async def get_article_html(article_id: UUID4, db: AsyncSession = Depends(get_db)):
+async def get_article_html(article_id: UUID4, db: AsyncSession = Depends(get_read_db)):
     """
     This code is intended for learning purposes, in the area of using multiple authenticators in one API.
     """
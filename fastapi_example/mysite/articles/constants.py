@@ -4,3 +4,15 @@ from enum import Enum
 class ArticleStatus(Enum):
     draft = "DRAFT"
     published = "PUBLISHED"
+
+
+# average silent reading speed of an adult, used for the estimated reading time of the articles
+READING_WORDS_PER_MINUTE = 238
+
+# the words are the runs of non whitespace characters, each word replaced by one character adds one to the length
+WORD_COUNT_EXPRESSION = (
+    r"char_length(regexp_replace(coalesce(article_content, ''), '\S+', 'x', 'g'))"
+    r" - char_length(regexp_replace(coalesce(article_content, ''), '\S+', '', 'g'))"
+)
+CHARACTER_COUNT_EXPRESSION = "coalesce(char_length(article_content), 0)"
+READING_TIME_EXPRESSION = f"ceil(({WORD_COUNT_EXPRESSION}) / {READING_WORDS_PER_MINUTE:d}.0)::integer"
@@ -5,6 +5,7 @@ from sqlalchemy import Computed
 from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
 from sqlalchemy import Index
+from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import Text
 from sqlalchemy import literal
@@ -14,6 +15,9 @@ from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import expression
 
+from mysite.articles.constants import CHARACTER_COUNT_EXPRESSION
+from mysite.articles.constants import READING_TIME_EXPRESSION
+from mysite.articles.constants import WORD_COUNT_EXPRESSION
 from mysite.articles.constants import ArticleStatus
 from mysite.models import Base
 
@@ -74,6 +78,7 @@ class Article(Base):
             "article_content_simple_with_no_stop_words",
             postgresql_using="gin",
         ),
+        Index("fastapi_article_writer_id_word_count_idx", "writer_id", "word_count"),
         {"comment": "general information about articles"},
     )
 
@@ -90,6 +95,26 @@ class Article(Base):
     article_name = Column(String, nullable=False, comment="the name of the article")
     article_content = Column(Text, nullable=True, comment="the content of the article")
 
+    # computed at write time, such that reading the statistics does not read the content
+    word_count = Column(
+        Integer,
+        Computed(WORD_COUNT_EXPRESSION, persisted=True),
+        nullable=False,
+        comment="the number of words of the content",
+    )
+    character_count = Column(
+        Integer,
+        Computed(CHARACTER_COUNT_EXPRESSION, persisted=True),
+        nullable=False,
+        comment="the number of characters of the content",
+    )
+    reading_time_minutes = Column(
+        Integer,
+        Computed(READING_TIME_EXPRESSION, persisted=True),
+        nullable=False,
+        comment="the estimated reading time of the content in minutes",
+    )
+
     date_created = Column(
         DateTime(timezone=True),
         server_default=text("statement_timestamp()"),
@@ -0,0 +1,21 @@
+import uuid
+
+from sqlalchemy import StatementLambdaElement
+from sqlalchemy import lambda_stmt
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from mysite.articles.models import Article
+
+
+def select_article_with_writer_and_tags(article_id: uuid.UUID) -> StatementLambdaElement:
+    """
+    The article of the id with its writer and its tags, the statement is built and compiled once, the id is its only
+    parameter.
+    """
+    return lambda_stmt(
+        lambda: select(Article)
+        .options(joinedload(Article.writer, innerjoin=True))
+        .options(joinedload(Article.tags, innerjoin=False))
+        .where(Article.article_id == article_id)
+    )
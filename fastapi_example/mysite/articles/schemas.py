@@ -50,6 +50,9 @@ class ArticleOutSchema(BaseModel):
     writer_id: UUID4 = Field(..., description="unique identifier of the writer")
     article_name: str = Field(..., description="the name of the article")
     article_content: str | None = Field(None, description="the content of the article")
+    word_count: int = Field(..., description="the number of words of the content")
+    character_count: int = Field(..., description="the number of characters of the content")
+    reading_time_minutes: int = Field(..., description="the estimated reading time of the content in minutes")
     article_status: ArticleStatus = Field(..., description="the status of the article")
     date_first_published: datetime | None = Field(None, description="the date the article was published the first time")
     members_only_flag: bool = Field(..., description="true if it is a members only article")
@@ -64,3 +67,21 @@ class WriterOutSchema(BaseModel):
 class ArticleExtendedOutSchema(ArticleOutSchema):
     writer: WriterOutSchema = Field(..., description="information about the writer of the article")
     tags: list[TagSchema] | None = Field(None, max_length=5, description="the list of tags of the article")
+
+
+class ArticleSearchResultSchema(BaseModel):
+    article_id: UUID4 = Field(..., description="unique identifier of the article")
+    writer_id: UUID4 = Field(..., description="unique identifier of the writer")
+    article_name: str = Field(..., description="the name of the article")
+    article_status: ArticleStatus = Field(..., description="the status of the article")
+    date_first_published: datetime | None = Field(None, description="the date the article was published the first time")
+    members_only_flag: bool = Field(..., description="true if it is a members only article")
+    word_count: int = Field(..., description="the number of words of the content")
+    reading_time_minutes: int = Field(..., description="the estimated reading time of the content in minutes")
+    rank: float = Field(..., description="the relevance of the article for the query, higher is better")
+    headline: str | None = Field(None, description="the fragments of the content matching the query, when requested")
+
+
+class ArticleSearchOutSchema(BaseModel):
+    results: list[ArticleSearchResultSchema] = Field(..., description="the matching articles, best ranked first")
+    next_cursor: str | None = Field(None, description="the cursor of the next page, none on the last page")
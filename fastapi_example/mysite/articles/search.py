@@ -0,0 +1,143 @@
+import base64
+import json
+import uuid
+
+from pydantic import UUID4
+from sqlalchemy import Select
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import desc
+from sqlalchemy import exists
+from sqlalchemy import func
+from sqlalchemy import null
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mysite.articles.constants import ArticleStatus
+from mysite.articles.models import Article
+from mysite.articles.models import ArticleTags
+from mysite.articles.models import Tag
+from mysite.articles.schemas import string_to_capwords
+
+# the text search configuration of article_content_simple_with_no_stop_words
+SEARCH_CONFIGURATION = "simple_with_stop_words"
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=30, MinWords=10, StartSel=<b>, StopSel=</b>"
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(rank: float, article_id: UUID4) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, str(article_id)]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    try:
+        rank, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), uuid.UUID(article_id)
+    except (ValueError, TypeError) as error:
+        raise InvalidCursor() from error
+
+
+def search_query(
+    q: str,
+    writer_id: UUID4 | None,
+    tag: str | None,
+    article_status: ArticleStatus | None,
+    visible_writer_id: UUID4 | None,
+    cursor: str | None,
+    limit: int,
+) -> Select:
+    """
+    The page of the articles matching the query, best ranked first, after the cursor.
+
+    The match uses the GIN index of the stored tsvector, only the projected columns are read,
+    the published articles are visible to everybody and the drafts to their writer only.
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIGURATION, q)
+    rank = func.ts_rank_cd(Article.article_content_simple_with_no_stop_words, ts_query).label("rank")
+
+    query = select(
+        Article.article_id,
+        Article.writer_id,
+        Article.article_name,
+        Article.article_status,
+        Article.date_first_published,
+        Article.members_only_flag,
+        Article.word_count,
+        Article.reading_time_minutes,
+        rank,
+    ).where(Article.article_content_simple_with_no_stop_words.bool_op("@@")(ts_query))
+
+    visible = Article.article_status == ArticleStatus.published.value
+    if visible_writer_id:
+        visible = or_(visible, Article.writer_id == visible_writer_id)
+    query = query.where(visible)
+
+    if writer_id:
+        query = query.where(Article.writer_id == writer_id)
+    if article_status:
+        query = query.where(Article.article_status == article_status.value)
+    if tag:
+        query = query.where(
+            exists()
+            .where(ArticleTags.article_id == Article.article_id)
+            .where(ArticleTags.tag_id == Tag.tag_id)
+            .where(Tag.tag_name == string_to_capwords(tag))
+        )
+
+    if cursor:
+        cursor_rank, cursor_article_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                rank.expression < cursor_rank,
+                and_(rank.expression == cursor_rank, Article.article_id > cursor_article_id),
+            )
+        )
+
+    return query.order_by(desc(rank), Article.article_id).limit(limit)
+
+
+async def search_articles(
+    db: AsyncSession,
+    q: str,
+    writer_id: UUID4 | None,
+    tag: str | None,
+    article_status: ArticleStatus | None,
+    visible_writer_id: UUID4 | None,
+    headline: bool,
+    show_members_only_content: bool,
+    cursor: str | None,
+    limit: int,
+) -> dict:
+    page_subquery = search_query(q, writer_id, tag, article_status, visible_writer_id, cursor, limit).subquery(
+        "page_subquery"
+    )
+
+    columns = [page_subquery]
+    if headline:
+        # only the content of the articles of the page is read
+        headline_column = func.ts_headline(
+            SEARCH_CONFIGURATION,
+            Article.article_content,
+            func.websearch_to_tsquery(SEARCH_CONFIGURATION, q),
+            HEADLINE_OPTIONS,
+        )
+        if not show_members_only_content:
+            # the content of the members only articles is not shown to the public
+            headline_column = case((page_subquery.c.members_only_flag, null()), else_=headline_column)
+        columns.append(headline_column.label("headline"))
+
+    query = select(*columns).order_by(desc(page_subquery.c.rank), page_subquery.c.article_id)
+    if headline:
+        query = query.join(Article, Article.article_id == page_subquery.c.article_id)
+
+    results = [row._asdict() for row in await db.execute(query)]
+
+    next_cursor = None
+    if len(results) == limit:
+        next_cursor = encode_cursor(results[-1]["rank"], results[-1]["article_id"])
+
+    return {"results": results, "next_cursor": next_cursor}
@@ -63,6 +63,22 @@ class TestArticle:
         assert response_data["article_name"] == "Dummy article"
         assert response_data["article_status"] == ArticleStatus.draft.value
 
+    async def test_create_content_statistics(self):
+        writer_id = await self.writer_1_id()
+        article_content = " ".join(["word"] * 300) + "\n  last words "
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.post(
+                "/api/v1/fastapi/articles",
+                json={"article_name": "Statistics article", "article_content": article_content},
+                headers={"Authorization": f"Bearer {str(writer_id)}"},
+            )
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data["word_count"] == 302
+        assert response_data["character_count"] == len(article_content)
+        assert response_data["reading_time_minutes"] == 2
+
     async def test_get_article_unauthenticated_unknown_bearer_token(self):
         async with SessionLocal() as db:
             article_obj = await db.scalar(select(Article).limit(1))
@@ -194,3 +210,58 @@ class TestArticle:
                 .options(joinedload(Article.tags, innerjoin=False))
             )
             assert len(article_obj.tags) == 5
+
+    async def test_search_own_drafts_paginated(self):
+        writer_id = await self.writer_1_id()
+        word = "".join(random.choice(string.ascii_lowercase) for i in range(20))
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            for number_of_occurrences in range(1, 4):
+                response = await client.post(
+                    "/api/v1/fastapi/articles",
+                    json={
+                        "article_name": "Search article",
+                        "article_content": f"{word} other " * number_of_occurrences,
+                    },
+                    headers={"Authorization": f"Bearer {str(writer_id)}"},
+                )
+                response.raise_for_status()
+
+            response = await client.get(
+                "/api/v1/fastapi/articles/search",
+                params={"q": word, "limit": 2, "headline": True},
+                headers={"Authorization": f"Bearer {str(writer_id)}"},
+            )
+            assert response.status_code == 200
+            first_page = response.json()
+            assert len(first_page["results"]) == 2
+            assert first_page["results"][0]["rank"] >= first_page["results"][1]["rank"]
+            assert f"<b>{word}</b>" in first_page["results"][0]["headline"]
+            assert "article_content" not in first_page["results"][0]
+
+            response = await client.get(
+                "/api/v1/fastapi/articles/search",
+                params={"q": word, "limit": 2, "cursor": first_page["next_cursor"]},
+                headers={"Authorization": f"Bearer {str(writer_id)}"},
+            )
+            assert response.status_code == 200
+            second_page = response.json()
+            assert len(second_page["results"]) == 1
+            assert second_page["next_cursor"] is None
+            assert second_page["results"][0]["article_id"] not in [
+                result["article_id"] for result in first_page["results"]
+            ]
+
+            # drafts are not visible to the public
+            response = await client.get(
+                "/api/v1/fastapi/articles/search", params={"q": word}, headers={"key": "thisshouldbeatoken"}
+            )
+            assert response.status_code == 200
+            assert response.json()["results"] == []
+
+    async def test_search_invalid_cursor(self):
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(
+                "/api/v1/fastapi/articles/search", params={"q": "data", "cursor": "invalid"}, headers={"key": "public"}
+            )
+
+        assert response.status_code == 422
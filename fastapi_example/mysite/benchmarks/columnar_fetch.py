@@ -0,0 +1,126 @@
+"""
+Compares pd.read_sql_query through run_sync, the former query_to_pandas_df, with the asyncpg columnar fetch
+of query_to_df and query_to_df_chunks, on synthetic term occurrences of increasing size.
+
+Reports the latency, the peak of the python allocations while fetching and the memory of the resulting dataframe.
+Nothing is persisted, the synthetic rows live in a temporary table which is dropped at rollback.
+
+    python mysite/benchmarks/columnar_fetch.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from contextlib import aclosing
+
+import pandas as pd
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import Uuid
+from sqlalchemy import column
+from sqlalchemy import select
+from sqlalchemy import table
+from sqlalchemy import text
+
+from mysite.database import SessionLocal
+from mysite.database import query_to_df
+from mysite.database import query_to_df_chunks
+
+# create table as does not accept bind parameters, the sizes are integers formatted into the statement
+CREATE_BENCHMARK_TERM_OCCURRENCE = """
+    create temporary table benchmark_term_occurrence on commit drop as
+    select
+        md5((row_number / {words_per_article:d})::text)::uuid as article_id,
+        'term' || floor(random() * random() * {vocabulary_size:d})::int as word,
+        (1 + floor(random() * 20))::int as number_of_occurrences
+    from generate_series(0, {number_of_rows:d} - 1) as row_number
+"""
+
+benchmark_term_occurrence = table(
+    "benchmark_term_occurrence",
+    column("article_id", Uuid),
+    column("word", String),
+    column("number_of_occurrences", Integer),
+)
+QUERY = select(benchmark_term_occurrence)
+
+
+def read_sql_query(session, query):
+    return pd.read_sql_query(query, session.connection())
+
+
+async def fetch_read_sql_query(db) -> pd.DataFrame:
+    return await db.run_sync(read_sql_query, QUERY)
+
+
+async def fetch_query_to_df(db) -> pd.DataFrame:
+    return await query_to_df(db, QUERY)
+
+
+async def fetch_query_to_df_chunks(db, chunk_size: int) -> pd.DataFrame:
+    number_of_occurrences = 0
+    chunks = query_to_df_chunks(db, QUERY, chunk_size=chunk_size)
+    async with aclosing(chunks):
+        async for df in chunks:
+            # consumed chunk by chunk, only one chunk is held in memory
+            number_of_occurrences += int(df["number_of_occurrences"].sum())
+    return df
+
+
+async def measure(fetch) -> tuple[float, float, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = await fetch()
+    duration_ms = (time.perf_counter() - start) * 1000
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration_ms, peak_bytes / 2**20, df.memory_usage(deep=True).sum() / 2**20, len(df)
+
+
+async def benchmark(sizes: list[int], words_per_article: int, vocabulary_size: int, chunk_size: int):
+    print(f"{'rows':>10} | {'method':>20} | {'latency (ms)':>12} | {'peak (MiB)':>10} | {'dataframe (MiB)':>15}")
+
+    for number_of_rows in sizes:
+        async with SessionLocal() as db:
+            await db.execute(
+                text(
+                    CREATE_BENCHMARK_TERM_OCCURRENCE.format(
+                        number_of_rows=number_of_rows,
+                        words_per_article=words_per_article,
+                        vocabulary_size=vocabulary_size,
+                    )
+                )
+            )
+            await db.execute(text("analyze benchmark_term_occurrence"))
+
+            methods = {
+                "read_sql_query": lambda: fetch_read_sql_query(db),
+                "query_to_df": lambda: fetch_query_to_df(db),
+                "query_to_df_chunks": lambda: fetch_query_to_df_chunks(db, chunk_size),
+            }
+            for method, fetch in methods.items():
+                duration_ms, peak_mib, df_mib, _ = await measure(fetch)
+                print(
+                    f"{number_of_rows:>10} | {method:>20} | {duration_ms:>12.2f} | {peak_mib:>10.2f} | {df_mib:>15.2f}"
+                )
+
+            await db.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--words-per-article", type=int, default=200)
+    parser.add_argument("--vocabulary-size", type=int, default=20_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="number of rows per chunk of query_to_df_chunks")
+    arguments = parser.parse_args()
+
+    asyncio.run(
+        benchmark(
+            sizes=arguments.sizes,
+            words_per_article=arguments.words_per_article,
+            vocabulary_size=arguments.vocabulary_size,
+            chunk_size=arguments.chunk_size,
+        )
+    )
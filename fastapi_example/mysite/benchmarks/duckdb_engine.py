@@ -0,0 +1,114 @@
+"""
+Compares the text analytics queries run on Postgres with the same queries run by the DuckDB engine
+over a Parquet snapshot of the analytics tables, on the data of the database (eg: after load_medium_articles.py).
+
+Reports the duration of the snapshot export, the p50 and p95 latency of each query on each engine,
+and the load put on Postgres while querying, as the shared blocks and the tuples read in pg_stat_database.
+Requires duckdb to be installed, the snapshot is written to a temporary directory which is removed at the end.
+
+    python mysite/benchmarks/duckdb_engine.py --iterations 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy import text
+
+from mysite.database import SessionLocal
+from mysite.text_analytics.constants import AnalyticsQueryEnum
+from mysite.text_analytics.duckdb_engine import MEDIUM_WRITER_EMAIL
+from mysite.text_analytics.duckdb_engine import POSTGRES_QUERIES
+from mysite.text_analytics.duckdb_engine import DuckdbEngine
+from mysite.writers.models import Writer
+
+# the statistics of the backends are sent at the end of their transactions and read in a snapshot per transaction
+DATABASE_STATISTICS = """
+    select blks_hit + blks_read as blocks, tup_returned + tup_fetched as tuples
+    from pg_stat_database
+    where datname = current_database()
+"""
+
+
+async def database_statistics() -> tuple[int, int]:
+    await asyncio.sleep(1)
+    async with SessionLocal() as db:
+        return tuple((await db.execute(text(DATABASE_STATISTICS))).first())
+
+
+def percentile(durations: list[float], q: int) -> float:
+    return statistics.quantiles(durations, n=100, method="inclusive")[q - 1] if len(durations) > 1 else durations[0]
+
+
+async def run_engine(engine: str, duckdb_engine: DuckdbEngine, query: AnalyticsQueryEnum, arguments: tuple):
+    if engine == "duckdb":
+        return await duckdb_engine.run(query, *arguments)
+    async with SessionLocal() as db:
+        return await POSTGRES_QUERIES[query](db, *arguments)
+
+
+async def benchmark(iterations: int, threads: int, chunk_size: int):
+    async with SessionLocal() as db:
+        writer_id = await db.scalar(select(Writer.writer_id).where(Writer.email == MEDIUM_WRITER_EMAIL))
+    if not writer_id:
+        raise SystemExit("The medium writer does not exist, load the data with load_medium_articles.py first")
+
+    with tempfile.TemporaryDirectory() as directory:
+        duckdb_engine = DuckdbEngine(
+            directory=Path(directory),
+            queries=[query.value for query in AnalyticsQueryEnum],
+            threads=threads,
+            chunk_size=chunk_size,
+        )
+        async with SessionLocal() as db:
+            duckdb_engine.snapshot = await duckdb_engine.export(db, generation=0)
+        snapshot = duckdb_engine.snapshot
+        print(
+            f"Exported {sum(snapshot.number_of_rows.values())} rows, "
+            f"{snapshot.size_bytes / 2**20:.2f} MiB of Parquet in {snapshot.export_ms:.2f} ms"
+        )
+
+        print(
+            f"{'query':>24} | {'engine':>8} | {'p50 (ms)':>10} | {'p95 (ms)':>10} | "
+            f"{'pg blocks':>10} | {'pg tuples':>10}"
+        )
+        for query in AnalyticsQueryEnum:
+            arguments = (
+                (writer_id,)
+                if query in (AnalyticsQueryEnum.writer_content_length, AnalyticsQueryEnum.writer_most_used_words)
+                else ()
+            )
+
+            for engine in ("postgres", "duckdb"):
+                # warm up, the first run reads the files or the pages into the caches
+                await run_engine(engine, duckdb_engine, query, arguments)
+
+                blocks_before, tuples_before = await database_statistics()
+                durations = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await run_engine(engine, duckdb_engine, query, arguments)
+                    durations.append((time.perf_counter() - start) * 1000)
+                blocks_after, tuples_after = await database_statistics()
+
+                print(
+                    f"{query.value:>24} | {engine:>8} | {percentile(durations, 50):>10.2f} | "
+                    f"{percentile(durations, 95):>10.2f} | {blocks_after - blocks_before:>10} | "
+                    f"{tuples_after - tuples_before:>10}"
+                )
+
+        duckdb_engine.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="number of runs of each query on each engine")
+    parser.add_argument("--threads", type=int, default=2, help="number of DuckDB threads")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="number of rows per Parquet file")
+    arguments = parser.parse_args()
+
+    asyncio.run(benchmark(iterations=arguments.iterations, threads=arguments.threads, chunk_size=arguments.chunk_size))
@@ -0,0 +1,101 @@
+"""
+Compares the hot CRUD statements rebuilt at each request, as get_article, get_writer and authenticate_writer did,
+with the lambda and prebuilt statements of mysite/articles/queries.py and mysite/writers/queries.py.
+
+Reports the python overhead per request of building the statement and computing its cache key, which is what
+SQLAlchemy does before looking up its compiled cache, then the latency of executing it against the database,
+with the hit ratios of the compiled and prepared statement caches.
+
+    python mysite/benchmarks/statement_caching.py --iterations 10000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from mysite.articles.models import Article
+from mysite.articles.queries import select_article_with_writer_and_tags
+from mysite.database import SessionLocal
+from mysite.database import query_metrics
+from mysite.writers.models import Writer
+from mysite.writers.queries import WRITER_EXTENDED_QUERY
+from mysite.writers.queries import select_writer_principal
+from mysite.writers.queries import writer_extended_query
+
+
+def rebuilt_statements(writer_id, article_id) -> dict:
+    return {
+        "get_article": (
+            lambda: select(Article)
+            .options(joinedload(Article.writer, innerjoin=True))
+            .options(joinedload(Article.tags, innerjoin=False))
+            .where(Article.article_id == article_id),
+            {},
+        ),
+        "get_writer": (writer_extended_query, {"writer_id": writer_id}),
+        "authenticate_writer": (lambda: select(Writer).where(Writer.writer_id == str(writer_id)), {}),
+    }
+
+
+def cached_statements(writer_id, article_id) -> dict:
+    return {
+        "get_article": (lambda: select_article_with_writer_and_tags(article_id), {}),
+        "get_writer": (lambda: WRITER_EXTENDED_QUERY, {"writer_id": writer_id}),
+        "authenticate_writer": (lambda: select_writer_principal(writer_id), {}),
+    }
+
+
+def measure_build_us(build, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build()._generate_cache_key()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+async def measure_execute_us(build, parameters: dict, iterations: int) -> float:
+    async with SessionLocal() as db:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            (await db.execute(build(), parameters)).first()
+        duration = time.perf_counter() - start
+    return duration / iterations * 1_000_000
+
+
+async def benchmark(iterations: int, execute_iterations: int):
+    async with SessionLocal() as db:
+        article = (await db.execute(select(Article.article_id, Article.writer_id).limit(1))).first()
+    if article is None:
+        raise SystemExit("No article to benchmark, load articles first")
+    article_id, writer_id = article
+
+    print(
+        f"{'statement':>20} | {'variant':>8} | {'build + cache key (us)':>22} | {'execute (us)':>12} | "
+        f"{'compiled hits':>13} | {'prepared hits':>13}"
+    )
+    for variant, statements in (
+        ("rebuilt", rebuilt_statements(writer_id, article_id)),
+        ("cached", cached_statements(writer_id, article_id)),
+    ):
+        for name, (build, parameters) in statements.items():
+            build_us = measure_build_us(build, iterations)
+            query_metrics.reset()
+            execute_us = await measure_execute_us(build, parameters, execute_iterations)
+            status = query_metrics.status(limit=0)
+            compiled_hit_ratio = status["compiled_cache_hit_ratio"] or 0
+            prepared_hit_ratio = status["prepared_statement_cache_hit_ratio"] or 0
+            print(
+                f"{name:>20} | {variant:>8} | {build_us:>22.2f} | {execute_us:>12.2f} | "
+                f"{compiled_hit_ratio:>13.2%} | {prepared_hit_ratio:>13.2%}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10_000, help="number of builds per statement")
+    parser.add_argument("--execute-iterations", type=int, default=1_000, help="number of executions per statement")
+    arguments = parser.parse_args()
+
+    asyncio.run(benchmark(iterations=arguments.iterations, execute_iterations=arguments.execute_iterations))
@@ -0,0 +1,108 @@
+"""
+Compares the former definition of term_occurrence_per_article_mv, one ts_stat query per article,
+with the set based unnest of rebuild_term_occurrence(), on synthetic corpora of increasing size.
+
+Nothing is persisted, the synthetic articles live in a temporary table which is dropped at rollback.
+
+    python mysite/benchmarks/term_occurrence_rebuild.py --sizes 100 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from mysite.database import SessionLocal
+
+# create table as does not accept bind parameters, the sizes are integers formatted into the statement
+CREATE_BENCHMARK_ARTICLES = """
+    create temporary table benchmark_article on commit drop as
+    select
+        gen_random_uuid() as article_id,
+        to_tsvector(
+            'simple_with_stop_words',
+            string_agg('term' || floor(random() * random() * {vocabulary_size:d})::int, ' ')
+        ) as article_content_simple_with_no_stop_words
+    from generate_series(1, {number_of_articles:d}) as article_number,
+        generate_series(1, {article_length:d}) as word_number
+    group by article_number
+"""
+
+TS_STAT_PER_ARTICLE = """
+    select article_id, word, nentry as number_of_occurrences
+    from benchmark_article,
+        ts_stat('select article_content_simple_with_no_stop_words from benchmark_article where article_id = '
+                || quote_literal(article_id) || '::uuid')
+"""
+
+SET_BASED = """
+    select article_id, terms.lexeme as word, coalesce(array_length(terms.positions, 1), 1) as number_of_occurrences
+    from benchmark_article,
+        unnest(article_content_simple_with_no_stop_words) as terms
+"""
+
+
+async def time_query(db, table_name: str, query: str) -> float:
+    start = time.perf_counter()
+    await db.execute(text(f"create temporary table {table_name} on commit drop as {query}"))
+    return (time.perf_counter() - start) * 1000
+
+
+async def benchmark(sizes: list[int], article_length: int, vocabulary_size: int, ts_stat_limit: int):
+    print(f"{'articles':>10} | {'ts_stat per article (ms)':>25} | {'set based (ms)':>15} | {'differences':>11}")
+
+    for number_of_articles in sizes:
+        async with SessionLocal() as db:
+            await db.execute(
+                text(
+                    CREATE_BENCHMARK_ARTICLES.format(
+                        number_of_articles=number_of_articles,
+                        article_length=article_length,
+                        vocabulary_size=vocabulary_size,
+                    )
+                )
+            )
+            await db.execute(text("analyze benchmark_article"))
+
+            set_based_ms = await time_query(db, "benchmark_set_based", SET_BASED)
+
+            ts_stat_ms = None
+            differences = None
+            if number_of_articles <= ts_stat_limit:
+                ts_stat_ms = await time_query(db, "benchmark_ts_stat", TS_STAT_PER_ARTICLE)
+                differences = await db.scalar(
+                    text(
+                        """select count(*) from (
+                            (select * from benchmark_set_based except select * from benchmark_ts_stat)
+                            union all
+                            (select * from benchmark_ts_stat except select * from benchmark_set_based)
+                        ) as difference"""
+                    )
+                )
+
+            await db.rollback()
+
+        ts_stat_column = f"{ts_stat_ms:.2f}" if ts_stat_ms is not None else "skipped"
+        differences_column = differences if differences is not None else "-"
+        print(f"{number_of_articles:>10} | {ts_stat_column:>25} | {set_based_ms:>15.2f} | {differences_column:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--article-length", type=int, default=300, help="number of words per article")
+    parser.add_argument("--vocabulary-size", type=int, default=20_000)
+    parser.add_argument(
+        "--ts-stat-limit", type=int, default=100_000, help="skip the ts_stat approach above this number of articles"
+    )
+    arguments = parser.parse_args()
+
+    asyncio.run(
+        benchmark(
+            sizes=arguments.sizes,
+            article_length=arguments.article_length,
+            vocabulary_size=arguments.vocabulary_size,
+            ts_stat_limit=arguments.ts_stat_limit,
+        )
+    )
@@ -0,0 +1,181 @@
+"""
+Benchmarks the text analytics endpoints on synthetic corpora of increasing size.
+
+For each size, the synthetic corpus is generated (see mysite/utils/generate_synthetic_corpus.py), the analytics
+data is refreshed and each endpoint is requested through the app, with the response cache cleared before each
+request, such that the queries and the renders are measured rather than the cache.
+
+Records the load and refresh durations and the p50 and p95 latency of each endpoint, saved as JSON with the commit,
+such that the results of two commits can be compared.
+
+    python mysite/benchmarks/text_analytics_endpoints.py --sizes 10000 100000 1000000 --bulk
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+
+from httpx import ASGITransport
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from mysite.articles.models import Article
+from mysite.database import SessionLocal
+from mysite.main import app
+from mysite.text_analytics.api import analytics_response_cache
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.rendering import wordcloud_render_pool
+from mysite.text_analytics.tfidf_engine import tfidf_engine
+from mysite.utils.generate_synthetic_corpus import add_corpus_arguments
+from mysite.utils.generate_synthetic_corpus import generate_synthetic_corpus
+
+ENDPOINTS = {
+    "writer-content-length": "/api/v1/fastapi/text-analytics/writer-content-length/{writer_id}",
+    "writer-stats-most-user-words": "/api/v1/fastapi/text-analytics/writer-stats-most-user-words/{writer_id}",
+    "wordcloud": "/api/v1/fastapi/text-analytics/wordcloud",
+    "tf-idf-most-user-word": "/api/v1/fastapi/text-analytics/tf-idf-most-user-word",
+    "order-by-postgres": "/api/v1/fastapi/text-analytics/order-by-postgres",
+    "data/writer-content-length": "/api/v1/fastapi/text-analytics/data/writer-content-length/{writer_id}",
+    "data/writer-stats-most-user-words": "/api/v1/fastapi/text-analytics/data/writer-stats-most-user-words/{writer_id}",
+    "data/wordcloud": "/api/v1/fastapi/text-analytics/data/wordcloud",
+    "article-top-terms": "/api/v1/fastapi/text-analytics/articles/{article_id}/top-terms",
+    "writer-top-terms": "/api/v1/fastapi/text-analytics/writers/{writer_id}/top-terms",
+    "similar-articles": "/api/v1/fastapi/text-analytics/articles/{article_id}/similar",
+    "trends": "/api/v1/fastapi/text-analytics/trends",
+}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latency_summary(durations: list[float]) -> dict:
+    quantiles = statistics.quantiles(durations, n=100, method="inclusive") if len(durations) > 1 else durations * 99
+    return {
+        "p50_ms": quantiles[49],
+        "p95_ms": quantiles[94],
+        "mean_ms": statistics.fmean(durations),
+        "max_ms": max(durations),
+    }
+
+
+async def benchmark_endpoints(client: AsyncClient, parameters: dict, iterations: int) -> dict:
+    results = {}
+    for name, path in ENDPOINTS.items():
+        url = path.format(**parameters)
+        durations = []
+        status_codes = set()
+        size_bytes = 0
+        for _ in range(iterations):
+            analytics_response_cache.clear()
+            start = time.perf_counter()
+            response = await client.get(url)
+            durations.append((time.perf_counter() - start) * 1000)
+            status_codes.add(response.status_code)
+            size_bytes = len(response.content)
+
+        results[name] = latency_summary(durations) | {"status_codes": sorted(status_codes), "size_bytes": size_bytes}
+        print(f"{name:>36} | {results[name]['p50_ms']:>10.2f} | {results[name]['p95_ms']:>10.2f}")
+    return results
+
+
+async def benchmark_size(number_of_articles: int, iterations: int, corpus_arguments: dict) -> dict:
+    start = time.perf_counter()
+    writer_ids = await generate_synthetic_corpus(number_of_articles=number_of_articles, **corpus_arguments)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    await analytics_refresher.refresh()
+    refresh_ms = (time.perf_counter() - start) * 1000
+
+    async with SessionLocal() as db:
+        # postgres has no min of uuid, ordered such that the same article is benchmarked at each run
+        article_id = await db.scalar(
+            select(Article.article_id).where(Article.writer_id == writer_ids[0]).order_by(Article.article_id).limit(1)
+        )
+
+    print(f"{number_of_articles} articles, loaded in {load_ms:.2f} ms, refreshed in {refresh_ms:.2f} ms")
+    print(f"{'endpoint':>36} | {'p50 (ms)':>10} | {'p95 (ms)':>10}")
+    async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app), timeout=None) as client:
+        endpoints = await benchmark_endpoints(
+            client, {"writer_id": writer_ids[0], "article_id": article_id}, iterations
+        )
+
+    return {
+        "number_of_articles": number_of_articles,
+        "load_ms": load_ms,
+        "refresh": {
+            "total_ms": refresh_ms,
+            "materialized_views_ms": analytics_refresher.last_duration_ms,
+            "tfidf_build_ms": tfidf_engine.last_build_ms,
+            "tfidf_neighbours_ms": tfidf_engine.last_neighbours_ms,
+        },
+        "endpoints": endpoints,
+    }
+
+
+async def benchmark(sizes: list[int], iterations: int, output_directory: Path, corpus_arguments: dict):
+    started = datetime.now(tz=timezone.utc)
+    commit = git_commit()
+
+    wordcloud_render_pool.start()
+    try:
+        results = [await benchmark_size(size, iterations, corpus_arguments) for size in sizes]
+    finally:
+        wordcloud_render_pool.stop()
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    output_path = output_directory / f"text_analytics_{started:%Y%m%dT%H%M%S}_{(commit or 'unknown')[:12]}.json"
+    output_path.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "started": started.isoformat(),
+                "iterations": iterations,
+                "corpus": corpus_arguments,
+                "results": results,
+            },
+            indent=2,
+            default=str,
+        )
+    )
+    print(f"Saved the results to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--iterations", type=int, default=20, help="number of requests per endpoint")
+    parser.add_argument("--output-directory", type=Path, default=Path("benchmark_results"))
+    add_corpus_arguments(parser)
+    arguments = parser.parse_args()
+
+    asyncio.run(
+        benchmark(
+            sizes=arguments.sizes,
+            iterations=arguments.iterations,
+            output_directory=arguments.output_directory,
+            corpus_arguments={
+                "number_of_writers": arguments.number_of_writers,
+                "article_length": arguments.article_length,
+                "vocabulary_size": arguments.vocabulary_size,
+                "zipf_exponent": arguments.zipf_exponent,
+                "months": arguments.months,
+                "anchor_date": arguments.anchor_date,
+                "seed": arguments.seed,
+                "batch_size": arguments.batch_size,
+                "bulk": arguments.bulk,
+            },
+        )
+    )
@@ -0,0 +1,128 @@
+"""
+Compares the ways of reading the top terms of each article on synthetic term occurrences of increasing size:
+row_number() over a window and distinct on, which sort all the terms of all the articles on each query,
+with the term_rank maintained by the trigger, read through the partial index of the top ranks.
+
+Nothing is persisted, the synthetic rows live in a temporary table which is dropped at rollback.
+
+    python mysite/benchmarks/top_terms_per_article.py --sizes 100 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from mysite.database import SessionLocal
+
+# create table as does not accept bind parameters, the sizes are integers formatted into the statement
+CREATE_BENCHMARK_TERM_OCCURRENCE = """
+    create temporary table benchmark_term_occurrence on commit drop as
+    select
+        article_id,
+        word,
+        number_of_occurrences,
+        row_number() over (partition by article_id order by number_of_occurrences desc, word)::int as term_rank
+    from (
+        select
+            md5(article_number::text)::uuid as article_id,
+            'term' || floor(random() * random() * {vocabulary_size:d})::int as word,
+            count(*)::int as number_of_occurrences
+        from generate_series(1, {number_of_articles:d}) as article_number,
+            generate_series(1, {article_length:d}) as word_number
+        group by 1, 2
+    ) as term_occurrence
+"""
+
+CREATE_BENCHMARK_INDEXES = [
+    "alter table benchmark_term_occurrence add primary key (article_id, word)",
+    """create index on benchmark_term_occurrence (article_id, term_rank) include (word, number_of_occurrences)
+        where term_rank <= 20""",
+    "analyze benchmark_term_occurrence",
+]
+
+QUERIES = {
+    "top 20 - window": """
+        select word, sum(number_of_occurrences)
+        from (
+            select word, number_of_occurrences,
+                row_number() over (partition by article_id order by number_of_occurrences desc) as rank
+            from benchmark_term_occurrence
+        ) as ranked
+        where rank <= 20
+        group by word
+    """,
+    "top 20 - term_rank": """
+        select word, sum(number_of_occurrences)
+        from benchmark_term_occurrence
+        where term_rank <= 20
+        group by word
+    """,
+    "top 1 - distinct on": """
+        select distinct on (article_id) article_id, word
+        from benchmark_term_occurrence
+        order by article_id, number_of_occurrences desc
+    """,
+    "top 1 - term_rank": """
+        select article_id, word
+        from benchmark_term_occurrence
+        where term_rank = 1
+        order by article_id
+    """,
+}
+
+
+async def benchmark(sizes: list[int], article_length: int, vocabulary_size: int, repeat: int):
+    print(f"{'articles':>10} | {'rows':>10} | " + " | ".join(f"{name + ' (ms)':>24}" for name in QUERIES))
+
+    for number_of_articles in sizes:
+        async with SessionLocal() as db:
+            await db.execute(
+                text(
+                    CREATE_BENCHMARK_TERM_OCCURRENCE.format(
+                        number_of_articles=number_of_articles,
+                        article_length=article_length,
+                        vocabulary_size=vocabulary_size,
+                    )
+                )
+            )
+            for statement in CREATE_BENCHMARK_INDEXES:
+                await db.execute(text(statement))
+            number_of_rows = await db.scalar(text("select count(*) from benchmark_term_occurrence"))
+
+            durations = []
+            for query in QUERIES.values():
+                # the best of the repeats, the first run warms the cache
+                best_ms = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    (await db.execute(text(query))).all()
+                    duration_ms = (time.perf_counter() - start) * 1000
+                    best_ms = duration_ms if best_ms is None else min(best_ms, duration_ms)
+                durations.append(best_ms)
+
+            await db.rollback()
+
+        print(
+            f"{number_of_articles:>10} | {number_of_rows:>10} | "
+            + " | ".join(f"{duration_ms:>24.2f}" for duration_ms in durations)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--article-length", type=int, default=300, help="number of words per article")
+    parser.add_argument("--vocabulary-size", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs per query")
+    arguments = parser.parse_args()
+
+    asyncio.run(
+        benchmark(
+            sizes=arguments.sizes,
+            article_length=arguments.article_length,
+            vocabulary_size=arguments.vocabulary_size,
+            repeat=arguments.repeat,
+        )
+    )
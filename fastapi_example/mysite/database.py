@@ -1,25 +1,116 @@
+import itertools
 import time
+from collections import OrderedDict
+from typing import Any
+from typing import AsyncIterator
+from typing import Sequence
 
+import asyncpg
+import numpy as np
 import pandas as pd
+from fastapi import Request
 from pandas import DataFrame
 from sqlalchemy import Engine
+from sqlalchemy import Executable
 from sqlalchemy import Select
 from sqlalchemy import event
-from sqlalchemy import text
-from sqlalchemy.dialects import postgresql
+from sqlalchemy import types
+from sqlalchemy.engine import Compiled
+from sqlalchemy.engine import Dialect
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.engine.default import CACHE_MISS
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.types import TypeEngine
 
 from mysite import settings
+from mysite.utils.plan_capture import PlanCapture
+from mysite.utils.query_metrics import QueryMetrics
+from mysite.utils.query_metrics import QueryTimer
 
-engine = create_async_engine(
+# the writes of the client are read from the primary until the time in the cookie
+READ_YOUR_WRITES_COOKIE = "read_your_writes_until"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def create_engine(
+    url: str, pool_size: int, max_overflow: int, pool_timeout_seconds: float, server_settings: dict | None = None
+) -> AsyncEngine:
+    """
+    The server settings are set on each connection of the pool, eg: {"work_mem": "64MB"}.
+    """
+    return create_async_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout_seconds,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+        connect_args={
+            "timeout": settings.DATABASE_CONNECT_TIMEOUT_SECONDS,
+            "server_settings": server_settings or {},
+            "prepared_statement_cache_size": settings.DATABASE_PREPARED_STATEMENT_CACHE_SIZE,
+        },
+        # echo=True,
+    )
+
+
+engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    # echo=True,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_timeout_seconds=settings.DATABASE_POOL_TIMEOUT_SECONDS,
 )
 SessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engines = [
+    create_engine(
+        url,
+        pool_size=settings.DATABASE_REPLICA_POOL_SIZE,
+        max_overflow=settings.DATABASE_REPLICA_MAX_OVERFLOW,
+        pool_timeout_seconds=settings.DATABASE_REPLICA_POOL_TIMEOUT_SECONDS,
+    )
+    for url in settings.DATABASE_REPLICA_URLS
+]
+replica_session_makers = [
+    async_sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) for replica_engine in replica_engines
+]
+_next_replica = itertools.count()
+
+analytics_engine = create_engine(
+    settings.ANALYTICS_DATABASE_URL,
+    pool_size=settings.ANALYTICS_POOL_SIZE,
+    max_overflow=settings.ANALYTICS_MAX_OVERFLOW,
+    pool_timeout_seconds=settings.ANALYTICS_POOL_TIMEOUT_SECONDS,
+    server_settings={
+        "work_mem": settings.ANALYTICS_WORK_MEM,
+        "statement_timeout": str(settings.ANALYTICS_STATEMENT_TIMEOUT_MS),
+        "max_parallel_workers_per_gather": str(settings.ANALYTICS_MAX_PARALLEL_WORKERS_PER_GATHER),
+    },
+)
+AnalyticsSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=analytics_engine)
+
+query_metrics = QueryMetrics(
+    slow_query_ms=settings.QUERY_METRICS_SLOW_QUERY_MS,
+    sample_rate=settings.QUERY_METRICS_SAMPLE_RATE,
+    max_slow_queries=settings.QUERY_METRICS_MAX_SLOW_QUERIES,
+    max_fingerprints=settings.QUERY_METRICS_MAX_FINGERPRINTS,
+    max_parameters_length=settings.QUERY_METRICS_MAX_PARAMETERS_LENGTH,
+)
+plan_capture = PlanCapture(
+    engines=[engine, *replica_engines, analytics_engine],
+    enabled=settings.QUERY_PLAN_CAPTURE_ENABLED,
+    threshold_ms=settings.QUERY_PLAN_CAPTURE_THRESHOLD_MS,
+    sample_rate=settings.QUERY_PLAN_CAPTURE_SAMPLE_RATE,
+    interval_seconds=settings.QUERY_PLAN_CAPTURE_INTERVAL_SECONDS,
+    statement_timeout_ms=settings.QUERY_PLAN_CAPTURE_STATEMENT_TIMEOUT_MS,
+    max_plans=settings.QUERY_PLAN_CAPTURE_MAX_PLANS,
+)
+query_metrics.add_listener(plan_capture.observe)
+
 
 async def get_db():
     db = SessionLocal()
@@ -32,22 +123,292 @@ async def get_db():
         await db.close()
 
 
-def query_to_pandas_df(session: AsyncSession, query: Select) -> DataFrame:
-    conn = session.connection()
-    return pd.read_sql_query(query, conn)
+def is_pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def read_session_maker(pinned_to_primary: bool = False) -> async_sessionmaker:
+    """
+    The session maker of the next replica, round robin, or of the primary if pinned or if there is no replica.
+    """
+    if pinned_to_primary or not replica_session_makers:
+        return SessionLocal
+    return replica_session_makers[next(_next_replica) % len(replica_session_makers)]
+
+
+async def get_read_db(request: Request):
+    """
+    A session on a replica, for the read only routes, on the primary after a write of the client.
+    """
+    db = read_session_maker(is_pinned_to_primary(request))()
+    try:
+        yield db
+    except Exception as error:
+        await db.rollback()
+        raise error
+    finally:
+        await db.close()
+
+
+async def get_analytics_db():
+    """
+    A session on the analytics pool, for the text analytics routes.
+    """
+    db = AnalyticsSessionLocal()
+    try:
+        yield db
+    except Exception as error:
+        await db.rollback()
+        raise error
+    finally:
+        await db.close()
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """
+    Pins the reads of the client to the primary after a successful write, through a cookie.
+    """
+    response = await call_next(request)
+    if replica_session_makers and request.method in WRITE_METHODS and response.status_code < 400:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            str(time.time() + settings.READ_YOUR_WRITES_SECONDS),
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
+# numpy dtypes of the postgres types, the other types are kept as python objects
+POSTGRES_TYPE_DTYPES = {
+    "bool": "bool",
+    "int2": "int16",
+    "int4": "int32",
+    "int8": "int64",
+    "float4": "float32",
+    "float8": "float64",
+    "numeric": "float64",
+}
+# pandas extension dtypes of the numpy dtypes, for the columns with nulls
+NULLABLE_DTYPES = {
+    "bool": "boolean",
+    "int16": "Int16",
+    "int32": "Int32",
+    "int64": "Int64",
+    "float32": "Float32",
+    "float64": "Float64",
+}
+# numpy dtypes of the sqlalchemy types, in order as the big and small integers are integers,
+# the integer expressions such as count() are bigint in postgres
+SQLALCHEMY_TYPE_DTYPES = (
+    (types.Boolean, "bool"),
+    (types.SmallInteger, "int16"),
+    (types.Integer, "int64"),
+    (types.Float, "float64"),
+    (types.Numeric, "float64"),
+)
+CATEGORICAL_COLUMNS = ("word", "article_name")
+
+
+def rows_to_df(
+    rows: Sequence[Sequence[Any]],
+    columns: Sequence[tuple[str, str | None]],
+    categorical_columns: Sequence[str] = CATEGORICAL_COLUMNS,
+) -> DataFrame:
+    """
+    Builds the dataframe column by column from the rows, with the numpy dtype of each column, None for the python
+    objects, and a categorical dtype for the repeated text columns.
+    """
+    values_by_column = list(zip(*rows)) if rows else [()] * len(columns)
+    df_columns = {}
+    for (name, dtype), values in zip(columns, values_by_column):
+        if name in categorical_columns:
+            df_columns[name] = pd.Categorical(values)
+        elif dtype and None not in values:
+            df_columns[name] = np.fromiter(values, dtype=dtype, count=len(values))
+        elif dtype:
+            df_columns[name] = pd.array(values, dtype=NULLABLE_DTYPES[dtype])
+        else:
+            df_columns[name] = np.array(values, dtype=object)
+    return DataFrame(df_columns, copy=False)
+
+
+def records_to_df(
+    records: list[asyncpg.Record],
+    attributes: tuple[asyncpg.types.Attribute, ...],
+    categorical_columns: Sequence[str] = CATEGORICAL_COLUMNS,
+) -> DataFrame:
+    columns = [(attribute.name, POSTGRES_TYPE_DTYPES.get(attribute.type.name)) for attribute in attributes]
+    return rows_to_df(records, columns, categorical_columns)
+
+
+def sqlalchemy_type_dtype(type_: TypeEngine) -> str | None:
+    for sqlalchemy_type, dtype in SQLALCHEMY_TYPE_DTYPES:
+        if isinstance(type_, sqlalchemy_type):
+            return dtype
+    return None
+
+
+# the compiled statements of query_to_df by the cache key of the query, least recently used first
+_compiled_statements: OrderedDict[tuple, Compiled] = OrderedDict()
+# the prepared statements of query_to_df are kept in the info of each connection, reset with the connection
+PREPARED_STATEMENTS_INFO_KEY = "query_to_df_prepared_statements"
+
+
+def _compile(dialect: Dialect, query: Executable) -> tuple[str, list[Any], bool | None]:
+    """
+    Compiles the query with the dialect, or reuses its compiled statement with the values of its own cache key,
+    and returns the statement with its positional arguments and whether the compiled statement was cached.
+
+    The queries without cache key and the queries with expanding parameters, eg: in_(), are compiled at each call
+    as their values are rendered into the statement.
+    """
+    cache_key = query._generate_cache_key()
+    key = (dialect, cache_key.key) if cache_key is not None else None
+    compiled = _compiled_statements.get(key) if key is not None else None
+    if compiled is not None:
+        _compiled_statements.move_to_end(key)
+        parameters = compiled.construct_params(extracted_parameters=cache_key.bindparams)
+        return compiled.string, [parameters[name] for name in compiled.positiontup or []], True
+
+    if key is not None:
+        compiled = query.compile(dialect=dialect, cache_key=cache_key)
+        if not compiled.post_compile_params:
+            _compiled_statements[key] = compiled
+            while len(_compiled_statements) > settings.DATABASE_QUERY_CACHE_SIZE:
+                _compiled_statements.popitem(last=False)
+            parameters = compiled.construct_params(extracted_parameters=cache_key.bindparams)
+            return compiled.string, [parameters[name] for name in compiled.positiontup or []], False
+
+    compiled = query.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    parameters = compiled.construct_params()
+    return compiled.string, [parameters[name] for name in compiled.positiontup or []], None
+
+
+async def _prepared_statement(
+    info: dict, asyncpg_connection: asyncpg.Connection, statement: str
+) -> tuple[asyncpg.prepared_stmt.PreparedStatement, bool]:
+    """
+    The prepared statement of the statement on the connection, prepared once per connection and kept in an LRU
+    of DATABASE_PREPARED_STATEMENT_CACHE_SIZE statements, and whether it was cached.
+    """
+    prepared_statements = info.setdefault(PREPARED_STATEMENTS_INFO_KEY, OrderedDict())
+    prepared_statement = prepared_statements.get(statement)
+    if prepared_statement is not None:
+        prepared_statements.move_to_end(statement)
+        return prepared_statement, True
+
+    prepared_statement = await asyncpg_connection.prepare(statement)
+    prepared_statements[statement] = prepared_statement
+    # the evicted statements are closed by asyncpg once garbage collected
+    while len(prepared_statements) > settings.DATABASE_PREPARED_STATEMENT_CACHE_SIZE:
+        prepared_statements.popitem(last=False)
+    return prepared_statement, False
+
+
+async def query_to_df(
+    session: AsyncSession, query: Executable, categorical_columns: Sequence[str] = CATEGORICAL_COLUMNS
+) -> DataFrame:
+    """
+    Fetches the result of the query straight from asyncpg, without the sync connection adapter
+    and the row by row construction of pd.read_sql_query.
+
+    The compiled statement is cached per query and the prepared statement per connection, such that a repeated query
+    is neither compiled nor parsed again.
+    """
+    connection = await session.connection()
+    statement, arguments, compiled_hit = _compile(connection.dialect, query)
+    asyncpg_connection = (await connection.get_raw_connection()).driver_connection
+    with QueryTimer(
+        query_metrics, statement, arguments, engine=session.get_bind(), compiled_cache_hit=compiled_hit
+    ) as query_timer:
+        prepared_statement, query_timer.prepared_statement_cache_hit = await _prepared_statement(
+            connection.info, asyncpg_connection, statement
+        )
+        try:
+            records = await prepared_statement.fetch(*arguments)
+        except (asyncpg.exceptions.InvalidCachedStatementError, asyncpg.exceptions.OutdatedSchemaCacheError):
+            # the plan is invalid after a change of the schema, the statement is prepared again at the next call
+            connection.info[PREPARED_STATEMENTS_INFO_KEY].pop(statement, None)
+            raise
+        query_timer.rows = len(records)
+    return records_to_df(records, prepared_statement.get_attributes(), categorical_columns)
+
+
+async def query_to_df_chunks(
+    session: AsyncSession,
+    query: Select,
+    chunk_size: int = 10_000,
+    categorical_columns: Sequence[str] = CATEGORICAL_COLUMNS,
+) -> AsyncIterator[DataFrame]:
+    """
+    Streams the result of the query as dataframes of at most chunk_size rows, using a server side cursor
+    in the transaction of the session.
+
+    The cursor is closed when the generator is closed, the consumers iterate it within aclosing such that
+    a consumer stopping early does not leave the cursor open until the generator is garbage collected.
+    """
+    columns = [(name, sqlalchemy_type_dtype(column.type)) for name, column in query.selected_columns.items()]
+    result = await session.stream(query.execution_options(yield_per=chunk_size))
+    try:
+        async for rows in result.partitions():
+            yield rows_to_df(rows, columns, categorical_columns)
+    finally:
+        await result.close()
+
+
+def compiled_cache_hit(context: Any) -> bool | None:
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is CACHE_HIT:
+        return True
+    if cache_hit is CACHE_MISS:
+        return False
+    return None
+
+
+def prepared_statement_cache_hit(conn: Any, statement: str, executemany: bool) -> bool | None:
+    """
+    Whether the statement is in the prepared statement cache of the asyncpg connection adapter, before its execution,
+    the executemany are not prepared through the cache.
+    """
+    prepared_statement_cache = getattr(conn.connection.dbapi_connection, "_prepared_statement_cache", None)
+    if prepared_statement_cache is None or executemany:
+        return None
+    return statement in prepared_statement_cache
 
 
 @event.listens_for(Engine, "before_cursor_execute")
 def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    conn.info.setdefault("query_start_time", []).append(time.time())
-    print("Start Query")
-    for idx, val in enumerate(parameters):
-        statement = statement.replace(f"${idx+1}", f"'{val}'")
-    print(text(statement).compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True}))
+    conn.info.setdefault("query_start", []).append(
+        (time.perf_counter(), prepared_statement_cache_hit(conn, statement, executemany))
+    )
 
 
 @event.listens_for(Engine, "after_cursor_execute")
 def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    total = time.time() - conn.info["query_start_time"].pop(-1)
-    print("Query Complete!")
-    print(f"Total Time (ms): {total*1000: .2f}")
+    start, prepared_hit = conn.info["query_start"].pop()
+    query_metrics.record(
+        statement,
+        (time.perf_counter() - start) * 1000,
+        cursor.rowcount,
+        # the parameters of an executemany are a list of sets of parameters, not explainable as is
+        None if executemany else parameters,
+        compiled_cache_hit=compiled_cache_hit(context),
+        prepared_statement_cache_hit=prepared_hit,
+        engine=conn.engine,
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is None or not conn.info.get("query_start") or not exception_context.statement:
+        return
+
+    start, _ = conn.info["query_start"].pop()
+    duration_ms = (time.perf_counter() - start) * 1000
+    query_metrics.record(exception_context.statement, duration_ms, -1, exception_context.parameters, error=True)
@@ -1,20 +1,44 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 
+from mysite.admin.api import admin_router
 from mysite.articles.api import articles_router
+from mysite.database import plan_capture
+from mysite.database import read_your_writes_middleware
 from mysite.text_analytics.api import text_analytics_router
+from mysite.text_analytics.api import text_analytics_stream_router
+from mysite.text_analytics.duckdb_engine import duckdb_engine
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.rendering import wordcloud_render_pool
 from mysite.writers.api import writers_router
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s | %(message)s | %(filename)s:%(lineno)d")
 logger = logging.getLogger(__name__)
 
-app = FastAPI(swagger_ui_parameters={"displayRequestDuration": True})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    wordcloud_render_pool.start()
+    analytics_refresher.start()
+    duckdb_engine.start()
+    yield
+    await analytics_refresher.stop()
+    duckdb_engine.stop()
+    await plan_capture.stop()
+    wordcloud_render_pool.stop()
+
+
+app = FastAPI(lifespan=lifespan, swagger_ui_parameters={"displayRequestDuration": True})
+app.middleware("http")(read_your_writes_middleware)
 
 app.include_router(writers_router, prefix="/api/v1/fastapi")
 app.include_router(articles_router, prefix="/api/v1/fastapi")
 app.include_router(text_analytics_router, prefix="/api/v1/fastapi")
+app.include_router(text_analytics_stream_router, prefix="/api/v1/fastapi")
+app.include_router(admin_router, prefix="/api/v1/fastapi")
 
 
 @app.get("/", include_in_schema=False)
@@ -1,7 +1,115 @@
 import os
+import tempfile
 
 from starlette.templating import Jinja2Templates
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# pool of the primary, which serves the writes, the read your writes and the background jobs
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+DATABASE_POOL_TIMEOUT_SECONDS = float(os.getenv("DATABASE_POOL_TIMEOUT_SECONDS", "30"))
+DATABASE_POOL_RECYCLE_SECONDS = int(os.getenv("DATABASE_POOL_RECYCLE_SECONDS", "1800"))
+DATABASE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DATABASE_CONNECT_TIMEOUT_SECONDS", "10"))
+# the number of compiled statements cached per engine, and of prepared statements cached per connection,
+# by their SQL text, the statements beyond are compiled or prepared again at each execution
+DATABASE_QUERY_CACHE_SIZE = int(os.getenv("DATABASE_QUERY_CACHE_SIZE", "1000"))
+DATABASE_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DATABASE_PREPARED_STATEMENT_CACHE_SIZE", "500"))
+# comma separated urls of the read replicas, the read only routes are spread over them, with a pool per replica,
+# without replicas they run on the primary
+DATABASE_REPLICA_URLS = [url for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url]
+DATABASE_REPLICA_POOL_SIZE = int(os.getenv("DATABASE_REPLICA_POOL_SIZE", "10"))
+DATABASE_REPLICA_MAX_OVERFLOW = int(os.getenv("DATABASE_REPLICA_MAX_OVERFLOW", "10"))
+DATABASE_REPLICA_POOL_TIMEOUT_SECONDS = float(os.getenv("DATABASE_REPLICA_POOL_TIMEOUT_SECONDS", "30"))
+# after a write, the reads of the client are pinned to the primary through a cookie for this long,
+# such that the client reads its writes whatever the replication lag
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# the text analytics routes run on a pool of their own, on the first replica if any, such that the analytics queries
+# do not take the connections of the transactional routes, with the session settings of the analytics queries
+ANALYTICS_DATABASE_URL = os.getenv(
+    "ANALYTICS_DATABASE_URL", DATABASE_REPLICA_URLS[0] if DATABASE_REPLICA_URLS else DATABASE_URL
+)
+ANALYTICS_POOL_SIZE = int(os.getenv("ANALYTICS_POOL_SIZE", "5"))
+ANALYTICS_MAX_OVERFLOW = int(os.getenv("ANALYTICS_MAX_OVERFLOW", "0"))
+ANALYTICS_POOL_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_POOL_TIMEOUT_SECONDS", "10"))
+ANALYTICS_WORK_MEM = os.getenv("ANALYTICS_WORK_MEM", "64MB")
+ANALYTICS_STATEMENT_TIMEOUT_MS = int(os.getenv("ANALYTICS_STATEMENT_TIMEOUT_MS", "30000"))
+ANALYTICS_MAX_PARALLEL_WORKERS_PER_GATHER = int(os.getenv("ANALYTICS_MAX_PARALLEL_WORKERS_PER_GATHER", "2"))
+# the text analytics requests running at once, by default one per connection of the analytics pool but one, left to
+# the refresh of the analytics data, the requests above the queue size are rejected with a 429, the requests queued
+# longer than the timeout with a 503
+ANALYTICS_MAX_RUNNING_REQUESTS = int(
+    os.getenv("ANALYTICS_MAX_RUNNING_REQUESTS", str(max(ANALYTICS_POOL_SIZE + ANALYTICS_MAX_OVERFLOW - 1, 1)))
+)
+ANALYTICS_MAX_QUEUED_REQUESTS = int(os.getenv("ANALYTICS_MAX_QUEUED_REQUESTS", "20"))
+ANALYTICS_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_QUEUE_TIMEOUT_SECONDS", "5"))
+ANALYTICS_RETRY_AFTER_SECONDS = int(os.getenv("ANALYTICS_RETRY_AFTER_SECONDS", "2"))
 
 templates = Jinja2Templates(directory="mysite/templates")
+
+# refreshes requested by article writes within the debounce window are coalesced into one
+ANALYTICS_REFRESH_DEBOUNCE_SECONDS = float(os.getenv("ANALYTICS_REFRESH_DEBOUNCE_SECONDS", "2"))
+# picks up changes made outside of the app, eg: load_medium_articles.py, 0 disables it
+ANALYTICS_REFRESH_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_REFRESH_INTERVAL_SECONDS", "600"))
+# the in memory indexes and the snapshots are rebuilt from the analytics database, eg: a replica, once it replayed the
+# refresh, or after this timeout whatever its lag
+ANALYTICS_REFRESH_CATCH_UP_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_REFRESH_CATCH_UP_TIMEOUT_SECONDS", "10"))
+# comma separated, each view must have a unique index to be refreshed concurrently
+ANALYTICS_MATERIALIZED_VIEWS = [view for view in os.getenv("ANALYTICS_MATERIALIZED_VIEWS", "").split(",") if view]
+
+# rendered analytics responses are cached per generation of the analytics data
+ANALYTICS_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("ANALYTICS_RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# wordclouds are rendered in worker processes, renders above workers + queue size are rejected with a 503
+WORDCLOUD_RENDER_WORKERS = int(os.getenv("WORDCLOUD_RENDER_WORKERS", "2"))
+WORDCLOUD_RENDER_QUEUE_SIZE = int(os.getenv("WORDCLOUD_RENDER_QUEUE_SIZE", "8"))
+
+# rendered wordcloud images, served with an ETag and cached by clients for the max age
+WORDCLOUD_DIRECTORY = os.getenv("WORDCLOUD_DIRECTORY", os.path.join(tempfile.gettempdir(), "mysite_wordcloud"))
+WORDCLOUD_MAX_AGE_SECONDS = int(os.getenv("WORDCLOUD_MAX_AGE_SECONDS", "3600"))
+
+# similar articles are read from a table of the nearest neighbours of each article by TF-IDF cosine similarity,
+# the candidates are searched through the max query terms of highest weight of the article,
+# the table is rebuilt from scratch once the articles changed since the last full build exceed the rebuild ratio
+SIMILAR_ARTICLES_NUMBER_OF_NEIGHBOURS = int(os.getenv("SIMILAR_ARTICLES_NUMBER_OF_NEIGHBOURS", "20"))
+SIMILAR_ARTICLES_MAX_QUERY_TERMS = int(os.getenv("SIMILAR_ARTICLES_MAX_QUERY_TERMS", "32"))
+SIMILAR_ARTICLES_REBUILD_RATIO = float(os.getenv("SIMILAR_ARTICLES_REBUILD_RATIO", "0.2"))
+
+# text analytics queries served by an embedded DuckDB over Parquet snapshots of the analytics tables, exported after
+# each analytics refresh, comma separated among writer-content-length, writer-most-used-words, wordcloud, tf-idf and
+# order-by, the others and all of them while a snapshot is behind run on Postgres, requires duckdb to be installed
+ANALYTICS_DUCKDB_QUERIES = [query for query in os.getenv("ANALYTICS_DUCKDB_QUERIES", "").split(",") if query]
+ANALYTICS_DUCKDB_DIRECTORY = os.getenv(
+    "ANALYTICS_DUCKDB_DIRECTORY", os.path.join(tempfile.gettempdir(), "mysite_duckdb")
+)
+ANALYTICS_DUCKDB_THREADS = int(os.getenv("ANALYTICS_DUCKDB_THREADS", "2"))
+# the number of rows fetched per server side cursor fetch and written per Parquet file
+ANALYTICS_DUCKDB_CHUNK_SIZE = int(os.getenv("ANALYTICS_DUCKDB_CHUNK_SIZE", "100000"))
+
+# the exports are streamed by chunks of rows fetched from a server side cursor, one parquet row group per chunk
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "10000"))
+
+# the admin routes require this key in the key header, they are unreachable while it is not set
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+# latency histograms and row counts per statement fingerprint, the types of the bind parameters of the statements
+# slower than the threshold are kept, not their values, which may be credentials or personal data, eg: the writer ids
+# of the bearer tokens, the full text of a statement is kept for the first execution and a sample of the others
+QUERY_METRICS_SLOW_QUERY_MS = float(os.getenv("QUERY_METRICS_SLOW_QUERY_MS", "500"))
+QUERY_METRICS_SAMPLE_RATE = float(os.getenv("QUERY_METRICS_SAMPLE_RATE", "0.01"))
+QUERY_METRICS_MAX_SLOW_QUERIES = int(os.getenv("QUERY_METRICS_MAX_SLOW_QUERIES", "100"))
+QUERY_METRICS_MAX_FINGERPRINTS = int(os.getenv("QUERY_METRICS_MAX_FINGERPRINTS", "1000"))
+QUERY_METRICS_MAX_PARAMETERS_LENGTH = int(os.getenv("QUERY_METRICS_MAX_PARAMETERS_LENGTH", "1000"))
+
+# opt-in capture of EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) of a sample of the read only statements slower than the
+# threshold, explained again in the background, at most one at a time and once per interval per fingerprint
+QUERY_PLAN_CAPTURE_ENABLED = os.getenv("QUERY_PLAN_CAPTURE_ENABLED", "false").lower() == "true"
+QUERY_PLAN_CAPTURE_THRESHOLD_MS = float(os.getenv("QUERY_PLAN_CAPTURE_THRESHOLD_MS", "1000"))
+QUERY_PLAN_CAPTURE_SAMPLE_RATE = float(os.getenv("QUERY_PLAN_CAPTURE_SAMPLE_RATE", "0.1"))
+QUERY_PLAN_CAPTURE_INTERVAL_SECONDS = float(os.getenv("QUERY_PLAN_CAPTURE_INTERVAL_SECONDS", "600"))
+QUERY_PLAN_CAPTURE_STATEMENT_TIMEOUT_MS = int(os.getenv("QUERY_PLAN_CAPTURE_STATEMENT_TIMEOUT_MS", "30000"))
+QUERY_PLAN_CAPTURE_MAX_PLANS = int(os.getenv("QUERY_PLAN_CAPTURE_MAX_PLANS", "50"))
+
+# the writers authenticated by bearer token are cached for the ttl, the entries of a writer are invalidated by its
+# updates in this process, the other processes see them once the ttl expired
+WRITER_PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("WRITER_PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+WRITER_PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("WRITER_PRINCIPAL_CACHE_TTL_SECONDS", "60"))
@@ -1,76 +1,152 @@
-import datetime
-from io import BytesIO
+import asyncio
+import logging
+from datetime import date
+from datetime import datetime
 from pathlib import Path
+from typing import Callable
 
-import matplotlib.pyplot as plt
-import numpy as np
+import plotly
 import plotly.express as px
-from PIL import Image
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
+from pandas import DataFrame
 from pydantic import UUID4
-from sqlalchemy import case
-from sqlalchemy import desc
-from sqlalchemy import func
-from sqlalchemy import literal
 from sqlalchemy import select
-from sqlalchemy import text
-from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import FileResponse
 from starlette.responses import HTMLResponse
 from starlette.responses import Response
-from wordcloud import WordCloud
-
-from mysite.articles.models import Article
-from mysite.database import get_db
-from mysite.database import query_to_pandas_df
-from mysite.text_analytics.models import ArticleTermOccurrenceMV
-from mysite.text_analytics.models import CorpusTermOccurrenceMV
+from starlette.responses import StreamingResponse
+
+from mysite import settings
+from mysite.database import AnalyticsSessionLocal
+from mysite.database import get_analytics_db
+from mysite.text_analytics.columnar import DATA_FORMAT_RESPONSES
+from mysite.text_analytics.columnar import dataframe_response
+from mysite.text_analytics.constants import IMAGE_FORMAT_MEDIA_TYPES
+from mysite.text_analytics.constants import AnalyticsQueryEnum
+from mysite.text_analytics.constants import DataFormatEnum
+from mysite.text_analytics.constants import ExportDatasetEnum
+from mysite.text_analytics.constants import ExportFormatEnum
+from mysite.text_analytics.constants import ImageFormatEnum
+from mysite.text_analytics.duckdb_engine import run_analytics_query
+from mysite.text_analytics.export import EXPORT_MEDIA_TYPES
+from mysite.text_analytics.export import InvalidExportFilter
+from mysite.text_analytics.export import export_chunks
+from mysite.text_analytics.export import export_query
+from mysite.text_analytics.export import pyarrow
+from mysite.text_analytics.queries import get_trends
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.rendering import WORDCLOUD_DEFAULT_HEIGHT
+from mysite.text_analytics.rendering import WORDCLOUD_DEFAULT_WIDTH
+from mysite.text_analytics.rendering import RenderPoolSaturated
+from mysite.text_analytics.schemas import ArticleTopTermsOutSchema
+from mysite.text_analytics.schemas import ColumnarOutSchema
+from mysite.text_analytics.schemas import MonthTrendsOutSchema
+from mysite.text_analytics.schemas import SimilarArticleOutSchema
+from mysite.text_analytics.tfidf_engine import tfidf_engine
+from mysite.text_analytics.wordcloud_store import wordcloud_store
+from mysite.utils.admission import AdmissionLimiter
+from mysite.utils.response_cache import ResponseCache
+from mysite.utils.response_cache import cached_route_class
+from mysite.utils.response_cache import etag_matches
+from mysite.utils.single_flight import SingleFlight
 from mysite.writers.models import Writer
 
-text_analytics_router = APIRouter(prefix="/text-analytics")
+logger = logging.getLogger(__name__)
 
+PLOTLY_JS_PATH = Path(plotly.__file__).parent / "package_data" / "plotly.min.js"
 
-@text_analytics_router.get("/writer-content-length/{writer_id}", response_class=HTMLResponse)
-async def get_writer_content_length(writer_id: UUID4, db: AsyncSession = Depends(get_db)):
-    writer_obj = await db.scalar(select(Writer).where(Writer.writer_id == writer_id))
+analytics_response_cache = ResponseCache(max_bytes=settings.ANALYTICS_RESPONSE_CACHE_MAX_BYTES)
+analytics_single_flight = SingleFlight()
+analytics_admission_limiter = AdmissionLimiter(
+    max_running=settings.ANALYTICS_MAX_RUNNING_REQUESTS,
+    max_queued=settings.ANALYTICS_MAX_QUEUED_REQUESTS,
+    queue_timeout_seconds=settings.ANALYTICS_QUEUE_TIMEOUT_SECONDS,
+    retry_after_seconds=settings.ANALYTICS_RETRY_AFTER_SECONDS,
+)
+
+
+async def admit_analytics_request():
+    async with analytics_admission_limiter.admit():
+        yield
+
+
+# the dependencies run on the cache misses only, once per coalesced requests, the cached responses are served
+# whatever the load, the responses read from an analytics replica behind the generation are not cached
+text_analytics_router = APIRouter(
+    prefix="/text-analytics",
+    route_class=cached_route_class(
+        analytics_response_cache,
+        get_version=lambda: analytics_refresher.generation,
+        single_flight=analytics_single_flight,
+        is_cacheable=lambda: analytics_refresher.analytics_caught_up(),
+    ),
+    dependencies=[Depends(admit_analytics_request)],
+)
+# the routes neither cached nor coalesced, plotly.js served whatever the load, and the exports, which are streamed
+# and hold their admission permit until the last chunk is sent rather than until the route returns
+text_analytics_stream_router = APIRouter(prefix="/text-analytics")
+
+
+async def clear_analytics_response_cache(generation: int):
+    analytics_response_cache.clear()
+
+
+analytics_refresher.add_listener(clear_analytics_response_cache)
+
+
+def plotly_js_url(request: Request) -> str:
+    """
+    The charts reference plotly.js as a separately cached asset, instead of embedding it in each response.
+    """
+    return request.url_for("get_plotly_js").path
 
-    query = (
-        select(Article.article_name, func.length(Article.article_content).label("number_of_words"))
-        .where(Article.writer_id == writer_id)
-        .order_by(func.length(Article.article_content))
+
+@text_analytics_stream_router.get(f"/static/plotly-{plotly.__version__}.min.js", include_in_schema=False)
+async def get_plotly_js():
+    return FileResponse(
+        PLOTLY_JS_PATH,
+        media_type="text/javascript",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
     )
 
-    article_df = await db.run_sync(query_to_pandas_df, query)
+
+@text_analytics_router.get("/writer-content-length/{writer_id}", response_class=HTMLResponse)
+async def get_writer_content_length(writer_id: UUID4, request: Request, db: AsyncSession = Depends(get_analytics_db)):
+    writer_obj = await db.scalar(select(Writer).where(Writer.writer_id == writer_id))
+
+    article_df = await run_analytics_query(AnalyticsQueryEnum.writer_content_length, db, writer_id)
 
     fig = px.bar(
         article_df,
         y="article_name",
-        x="number_of_words",
+        x="word_count",
         orientation="h",
+        hover_data=["character_count", "reading_time_minutes"],
+        labels={
+            "word_count": "Number of words",
+            "character_count": "Number of characters",
+            "reading_time_minutes": "Reading time (minutes)",
+        },
         title=f"Content length for {writer_obj.first_name} {writer_obj.last_name}'s articles",
     )
 
-    return fig.to_html()
+    return fig.to_html(include_plotlyjs=plotly_js_url(request))
 
 
 @text_analytics_router.get("/writer-stats-most-user-words/{writer_id}", response_class=HTMLResponse)
 async def get_writer_most_used_words(
     writer_id: UUID4,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_analytics_db),
 ):
     writer_obj = await db.scalar(select(Writer).where(Writer.writer_id == writer_id))
 
-    query = select(Article.article_content_simple_with_no_stop_words).where(Article.writer_id == writer_id)
-
-    ts_stat = text(
-        f"""select word, ndoc as number_of_articles, nentry number_of_occurrences
-            from ts_stat($${query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})}$$)
-            order by number_of_occurrences desc
-            limit 20
-            """
-    )
-    article_df = await db.run_sync(query_to_pandas_df, ts_stat)
+    article_df = await run_analytics_query(AnalyticsQueryEnum.writer_most_used_words, db, writer_id)
 
     fig = px.bar(
         article_df,
@@ -81,162 +157,53 @@ async def get_writer_most_used_words(
         labels={"number_of_articles": "Number of documents", "number_of_occurrences": "Number of occurrences"},
     )
 
-    return fig.to_html()
-
-
-@text_analytics_router.get("/wordcloud", response_class=Response, responses={200: {"content": {"image/png": {}}}})
-async def get_wordcloud(db: AsyncSession = Depends(get_db)):
-    word_occurrences_subquery = select(
-        ArticleTermOccurrenceMV.word,
-        ArticleTermOccurrenceMV.number_of_occurrences,
-        func.row_number()
-        .over(
-            partition_by=ArticleTermOccurrenceMV.article_id,
-            order_by=desc(ArticleTermOccurrenceMV.number_of_occurrences),
-        )
-        .label("rank"),
-    ).subquery("word_occurrences_subquery")
-
-    top_word_occurrences_subquery = (
-        select(
-            word_occurrences_subquery.c.word,
-            func.sum(word_occurrences_subquery.c.number_of_occurrences).label("number_of_occurrences"),
-        )
-        .where(word_occurrences_subquery.c.rank <= 20)
-        .group_by(word_occurrences_subquery.c.word)
-    ).subquery("top_word_occurrences_subquery")
-
-    # words_with_frequencies = {
-    #     db_record[0]: db_record[1] for db_record in await db.execute(select(top_word_occurrences_subquery))
-    # }
-
-    words_with_frequencies = await db.scalar(
-        select(
-            func.json_object_agg(
-                top_word_occurrences_subquery.c.word, top_word_occurrences_subquery.c.number_of_occurrences
-            )
-        )
-    )
+    return fig.to_html(include_plotlyjs=plotly_js_url(request))
 
-    if not words_with_frequencies:
-        raise HTTPException(status_code=404, detail="No data found")
 
+@text_analytics_router.get(
+    "/wordcloud",
+    response_class=Response,
+    responses={200: {"content": {media_type: {} for media_type in IMAGE_FORMAT_MEDIA_TYPES.values()}}},
+)
+async def get_wordcloud(
+    request: Request,
+    width: int = Query(WORDCLOUD_DEFAULT_WIDTH, ge=100, le=4000, description="the width in pixels"),
+    height: int = Query(WORDCLOUD_DEFAULT_HEIGHT, ge=100, le=4000, description="the height in pixels"),
+    image_format: ImageFormatEnum = Query(ImageFormatEnum.png, description="the format of the image"),
+    db: AsyncSession = Depends(get_analytics_db),
+):
     try:
-
-        picture_np = np.asarray(
-            Image.open(f"{Path(__file__).parent.parent.parent}/medium_data/100_1.png"), dtype="int32"
-        )
-
-        wc = WordCloud(
-            background_color="white",
-            mask=picture_np,
-            contour_width=3,
-            contour_color="gold",
-            colormap="autumn",
-            collocations=False,
-            stopwords=["ve"],
+        wordcloud_file = await wordcloud_store.get_file(db, width=width, height=height, image_format=image_format)
+    except RenderPoolSaturated:
+        raise HTTPException(
+            status_code=503, detail="Too many wordclouds are being rendered", headers={"Retry-After": "1"}
         )
-        wc.generate_from_frequencies(words_with_frequencies)
-
-        fig = plt.figure(figsize=(20, 5))
-        plt.imshow(wc, interpolation="bilinear")
-        plt.axis("off")
+    except Exception:
+        logger.exception("Rendering the wordcloud failed")
+        raise HTTPException(status_code=500, detail="Something went wrong")
 
-        with BytesIO() as buf:
-            fig.savefig(buf, format="png")
-            plt.close()
+    if not wordcloud_file:
+        raise HTTPException(status_code=404, detail="No data found")
 
-            return Response(
-                content=buf.getvalue(),
-                headers={
-                    "Content-Disposition": f'inline; filename="wordcloud-{datetime.datetime.now().isoformat()}.png"'  # NOQA
-                },
-                media_type="image/png",
-            )
+    headers = {"ETag": wordcloud_file.etag, "Cache-Control": f"public, max-age={settings.WORDCLOUD_MAX_AGE_SECONDS}"}
+    if etag_matches(request, wordcloud_file.etag):
+        return Response(status_code=304, headers=headers)
 
-    except Exception:
-        # log error
-        raise HTTPException(status_code=500, detail="Something went wrong")
+    # sent as bytes rather than a FileResponse, such that the response is shared by the coalesced requests and cached
+    return Response(
+        await asyncio.to_thread(wordcloud_file.path.read_bytes),
+        media_type=wordcloud_file.media_type,
+        headers=headers | {"Content-Disposition": f'inline; filename="{wordcloud_file.path.name}"'},
+    )
 
 
 @text_analytics_router.get("/tf-idf-most-user-word", response_class=HTMLResponse)
 async def get_term_frequency_corpus(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_analytics_db),
 ):
-    writer_id = await db.scalar(select(Writer.writer_id).where(Writer.email == "user+medium_data@example.com"))
-
-    number_of_articles, limit_words = (
-        await db.execute(
-            select(
-                func.count(Article.article_id),
-                func.sum(
-                    case(
-                        (func.length(Article.article_content_simple_with_no_stop_words) >= 5, 5),
-                        else_=func.length(Article.article_content_simple_with_no_stop_words),
-                    )
-                ),
-            ).where(Article.writer_id == writer_id)
-        )
-    ).first()
-
-    tf_cte = (
-        select(
-            ArticleTermOccurrenceMV.article_id,
-            Article.article_name,
-            ArticleTermOccurrenceMV.word,
-            (
-                ArticleTermOccurrenceMV.number_of_occurrences
-                / func.length(Article.article_content_simple_with_no_stop_words)
-            ).label("tf"),
-        )
-        .join(Article, ArticleTermOccurrenceMV.article_id == Article.article_id)
-        .where(Article.writer_id == writer_id)
-    ).cte("tf_cte")
-
-    idf_cte = (
-        (
-            select(
-                CorpusTermOccurrenceMV.word,
-                func.log((number_of_articles / CorpusTermOccurrenceMV.number_of_articles)).label("idf"),
-            )
-        )
-        .cte("idf_cte")
-        .prefix_with("MATERIALIZED")
-    )
-
-    tf_idf_count_query = (
-        select(
-            tf_cte.c.article_name,
-            tf_cte.c.word,
-            (tf_cte.c.tf * idf_cte.c.idf * 100).label("score"),
-            literal("TF-IDF").label("rank_type"),
-        )
-        .join(idf_cte, tf_cte.c.word == idf_cte.c.word)
-        .order_by(
-            func.row_number().over(partition_by=tf_cte.c.article_id, order_by=desc(tf_cte.c.tf * idf_cte.c.idf * 100))
-        )
-        .limit(limit_words)
-        .union_all(
-            select(
-                Article.article_name,
-                ArticleTermOccurrenceMV.word,
-                ArticleTermOccurrenceMV.number_of_occurrences.label("score"),
-                literal("COUNT").label("rank_type"),
-            )
-            .join(Article, ArticleTermOccurrenceMV.article_id == Article.article_id)
-            .where(Article.writer_id == writer_id)
-            .where(ArticleTermOccurrenceMV.word != "data")
-            .order_by(
-                func.row_number().over(
-                    partition_by=ArticleTermOccurrenceMV.article_id,
-                    order_by=desc(ArticleTermOccurrenceMV.number_of_occurrences),
-                )
-            )
-            .limit(limit_words)
-        )
-    )
+    df, number_of_articles = await run_analytics_query(AnalyticsQueryEnum.tf_idf, db)
 
-    df = await db.run_sync(query_to_pandas_df, tf_idf_count_query)
     fig = px.bar(
         df,
         x="score",
@@ -270,7 +237,7 @@ async def get_term_frequency_corpus(
         if fig_annotation.text == "rank_type=COUNT":
             col_count = 1 if fig_annotation.x < 0.5 else 2
 
-    fig.update_layout(annotations=annotations, height=20000, width=1800)
+    fig.update_layout(annotations=annotations, height=max(600, 200 * number_of_articles), width=1800)
 
     for row in range(1, number_of_articles + 1):
         fig.add_annotation(
@@ -305,44 +272,36 @@ async def get_term_frequency_corpus(
             col=col_tf_idf,
         )
 
-    return fig.to_html()
+    return fig.to_html(include_plotlyjs=plotly_js_url(request))
 
 
 @text_analytics_router.get("/order-by-postgres", response_class=HTMLResponse)
 async def get_order_by_plot(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_analytics_db),
 ):
-    writer_id = await db.scalar(select(Writer.writer_id).where(Writer.email == "user+medium_data@example.com"))
-
-    df = await db.run_sync(
-        query_to_pandas_df,
-        select(Article.article_id, Article.article_name, ArticleTermOccurrenceMV.word)
-        .distinct(Article.article_id)
-        .join(Article, ArticleTermOccurrenceMV.article_id == Article.article_id)
-        .where(Article.writer_id == writer_id)
-        .order_by(Article.article_id, desc(ArticleTermOccurrenceMV.number_of_occurrences)),
-    )
+    df = await run_analytics_query(AnalyticsQueryEnum.order_by, db)
 
     fig = px.bar(
-        df, y="word", color="article_name", title="""Most used word per article - Distinct On""", orientation="h"
+        df, y="word", color="article_name", title="""Most used word per article - Term Rank""", orientation="h"
     )
     fig.update_yaxes(categoryorder="category descending")
-    return fig.to_html()
+    return fig.to_html(include_plotlyjs=plotly_js_url(request))
 
     # using row_number with filter
     # article_word_subquery = (
     #     select(
     #         Article.article_name,
-    #         ArticleTermOccurrenceMV.word,
-    #         func.row_number().over(partition_by=[ArticleTermOccurrenceMV.article_id],
-    #                                order_by=desc(ArticleTermOccurrenceMV.number_of_occurrences)).label("row_number")
+    #         ArticleTermOccurrence.word,
+    #         func.row_number().over(partition_by=[ArticleTermOccurrence.article_id],
+    #                                order_by=desc(ArticleTermOccurrence.number_of_occurrences)).label("row_number")
     #     )
-    #     .join(Article, ArticleTermOccurrenceMV.article_id == Article.article_id)
+    #     .join(Article, ArticleTermOccurrence.article_id == Article.article_id)
     #     .where(Article.writer_id == writer_id)
     # ).subquery("article_word_subquery")
     #
-    # df = await db.run_sync(
-    #     query_to_pandas_df,
+    # df = await query_to_df(
+    #     db,
     #     select(article_word_subquery).where(article_word_subquery.c.row_number==1))
     # fig = px.bar(
     #     df,
@@ -355,15 +314,15 @@ async def get_order_by_plot(
     # return fig.to_html()
 
     # using row_number with limit
-    # df = await db.run_sync(
-    #     query_to_pandas_df,
-    #     select(Article.article_name, ArticleTermOccurrenceMV.word, ArticleTermOccurrenceMV.number_of_occurrences)
-    #     .join(Article, ArticleTermOccurrenceMV.article_id == Article.article_id)
+    # df = await query_to_df(
+    #     db,
+    #     select(Article.article_name, ArticleTermOccurrence.word, ArticleTermOccurrence.number_of_occurrences)
+    #     .join(Article, ArticleTermOccurrence.article_id == Article.article_id)
     #     .where(Article.writer_id == writer_id)
     #     .order_by(
     #         func.row_number().over(
-    #             partition_by=ArticleTermOccurrenceMV.article_id,
-    #             order_by=desc(ArticleTermOccurrenceMV.number_of_occurrences),
+    #             partition_by=ArticleTermOccurrence.article_id,
+    #             order_by=desc(ArticleTermOccurrence.number_of_occurrences),
     #         )
     #     )
     #     .limit(96),
@@ -374,32 +333,143 @@ async def get_order_by_plot(
     # fig.update_yaxes(categoryorder="category descending")
     # return fig.to_html()
 
-    # Not working (see https://github.com/duckdb/pg_duckdb/discussions/155)
-    # await db.execute(text("SET duckdb.execution TO true"))
-    #
-    # query = text(
-    #     """select * from duckdb.query('SELECT fastapi_article.article_name,
-    #    term_occurrence_per_article_mv.word,
-    #    term_occurrence_per_article_mv.number_of_occurrences
-    #     FROM term_occurrence_per_article_mv
-    #              JOIN fastapi_article
-    #                  ON term_occurrence_per_article_mv.article_id = fastapi_article.article_id
-    #     QUALIFY row_number()
-    #              OVER (
-    #                     PARTITION BY term_occurrence_per_article_mv.article_id
-    #                     ORDER BY term_occurrence_per_article_mv.number_of_occurrences DESC
-    #              ) = 1') as (article_name text, word text, number_of_occurrences integer)"""
-    # )
-    #
-    # df = await db.run_sync(
-    #     query_to_pandas_df,
-    #     query)
-    #
-    # fig = px.bar(
-    #     df,
-    #     y="word",
-    #     color="article_name",
-    #     title=f"""Most used word per article - Order By""",
-    #     orientation="h"
-    # )
-    # fig.update_yaxes(categoryorder='category descending')
+    # using qualify, see the order-by query of the DuckDB engine (ANALYTICS_DUCKDB_QUERIES)
+
+
+@text_analytics_router.get(
+    "/data/writer-content-length/{writer_id}", response_model=ColumnarOutSchema, responses=DATA_FORMAT_RESPONSES
+)
+async def get_writer_content_length_data(
+    writer_id: UUID4, data_format: DataFormatEnum = DataFormatEnum.json, db: AsyncSession = Depends(get_analytics_db)
+):
+    return dataframe_response(
+        await run_analytics_query(AnalyticsQueryEnum.writer_content_length, db, writer_id), data_format
+    )
+
+
+@text_analytics_router.get(
+    "/data/writer-stats-most-user-words/{writer_id}",
+    response_model=ColumnarOutSchema,
+    responses=DATA_FORMAT_RESPONSES,
+)
+async def get_writer_most_used_words_data(
+    writer_id: UUID4, data_format: DataFormatEnum = DataFormatEnum.json, db: AsyncSession = Depends(get_analytics_db)
+):
+    return dataframe_response(
+        await run_analytics_query(AnalyticsQueryEnum.writer_most_used_words, db, writer_id), data_format
+    )
+
+
+@text_analytics_router.get("/data/wordcloud", response_model=ColumnarOutSchema, responses=DATA_FORMAT_RESPONSES)
+async def get_wordcloud_data(
+    data_format: DataFormatEnum = DataFormatEnum.json, db: AsyncSession = Depends(get_analytics_db)
+):
+    words_with_frequencies = await run_analytics_query(AnalyticsQueryEnum.wordcloud, db)
+    df = DataFrame(
+        {"word": list(words_with_frequencies.keys()), "number_of_occurrences": list(words_with_frequencies.values())}
+    )
+    return dataframe_response(df, data_format)
+
+
+@text_analytics_router.get(
+    "/data/tf-idf-most-user-word", response_model=ColumnarOutSchema, responses=DATA_FORMAT_RESPONSES
+)
+async def get_term_frequency_corpus_data(
+    data_format: DataFormatEnum = DataFormatEnum.json, db: AsyncSession = Depends(get_analytics_db)
+):
+    df, _ = await run_analytics_query(AnalyticsQueryEnum.tf_idf, db)
+    return dataframe_response(df, data_format)
+
+
+@text_analytics_router.get("/data/order-by-postgres", response_model=ColumnarOutSchema, responses=DATA_FORMAT_RESPONSES)
+async def get_order_by_data(
+    data_format: DataFormatEnum = DataFormatEnum.json, db: AsyncSession = Depends(get_analytics_db)
+):
+    return dataframe_response(await run_analytics_query(AnalyticsQueryEnum.order_by, db), data_format)
+
+
+@text_analytics_router.get("/articles/{article_id}/top-terms", response_model=ArticleTopTermsOutSchema)
+async def get_article_top_terms(
+    article_id: UUID4,
+    k: int = Query(10, ge=1, le=100, description="the number of terms"),
+    db: AsyncSession = Depends(get_analytics_db),
+):
+    article_top_terms = await tfidf_engine.get_article_top_terms(db, article_id, k)
+    if article_top_terms is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return article_top_terms
+
+
+@text_analytics_router.get("/writers/{writer_id}/top-terms", response_model=list[ArticleTopTermsOutSchema])
+async def get_writer_top_terms(
+    writer_id: UUID4,
+    k: int = Query(10, ge=1, le=100, description="the number of terms per article"),
+    db: AsyncSession = Depends(get_analytics_db),
+):
+    return await tfidf_engine.get_writer_top_terms(db, writer_id, k)
+
+
+@text_analytics_router.get("/articles/{article_id}/similar", response_model=list[SimilarArticleOutSchema])
+async def get_similar_articles(
+    article_id: UUID4,
+    k: int = Query(10, ge=1, le=settings.SIMILAR_ARTICLES_NUMBER_OF_NEIGHBOURS, description="the number of articles"),
+    db: AsyncSession = Depends(get_analytics_db),
+):
+    similar_articles = await tfidf_engine.get_similar_articles(db, article_id, k)
+    if similar_articles is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return similar_articles
+
+
+@text_analytics_router.get("/trends", response_model=list[MonthTrendsOutSchema])
+async def get_term_trends(
+    end_month: date | None = Query(None, description="a day of the last month, the latest month with articles if none"),
+    months: int = Query(12, ge=1, le=120, description="the number of months"),
+    k: int = Query(10, ge=1, le=100, description="the number of terms per month"),
+    min_articles: int = Query(2, ge=1, description="the minimum number of articles of the month using a rising term"),
+    db: AsyncSession = Depends(get_analytics_db),
+):
+    return await get_trends(db, end_month=end_month, number_of_months=months, limit=k, min_articles=min_articles)
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Releases the admission permit of the request once the response was sent or the client went away.
+    """
+
+    def __init__(self, *args, release: Callable[[], None], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+@text_analytics_stream_router.get("/export/{dataset}", response_class=StreamingResponse)
+async def export_dataset(
+    dataset: ExportDatasetEnum,
+    export_format: ExportFormatEnum = Query(ExportFormatEnum.csv, description="the format of the file"),
+    writer_id: UUID4 | None = Query(None, description="only the articles of the writer"),
+    published_from: datetime | None = Query(None, description="only the articles first published from this date"),
+    published_to: datetime | None = Query(None, description="only the articles first published before this date"),
+):
+    if export_format == ExportFormatEnum.parquet and not pyarrow:
+        raise HTTPException(status_code=501, detail="The parquet format requires pyarrow to be installed")
+
+    try:
+        query = export_query(dataset, writer_id, published_from, published_to)
+    except InvalidExportFilter as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+    # the chunks are fetched while streaming, the permit is held until then
+    admission_limiter = analytics_admission_limiter
+    await admission_limiter.acquire()
+    return AdmittedStreamingResponse(
+        export_chunks(query, export_format, settings.EXPORT_CHUNK_SIZE, AnalyticsSessionLocal),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"content-disposition": f'attachment; filename="{dataset.value}.{export_format.value}"'},
+        release=admission_limiter.release,
+    )
@@ -0,0 +1,51 @@
+import json
+
+import pandas as pd
+from fastapi import HTTPException
+from fastapi import Response
+from pandas import DataFrame
+
+from mysite.text_analytics.constants import DataFormatEnum
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional, only needed for the arrow data format
+    pyarrow = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+DATA_FORMAT_RESPONSES = {200: {"content": {"application/json": {}, ARROW_STREAM_MEDIA_TYPE: {}}}}
+
+
+def json_default(value):
+    # missing values of the nullable dtypes
+    return None if value is pd.NA else str(value)
+
+
+def dataframe_to_columnar_json(df: DataFrame) -> bytes:
+    return json.dumps(
+        {"number_of_rows": len(df), "columns": {column: df[column].tolist() for column in df.columns}},
+        default=json_default,
+        separators=(",", ":"),
+    ).encode()
+
+
+def dataframe_to_arrow_stream(df: DataFrame) -> bytes:
+    # object columns might hold uuids, which arrow does not convert
+    object_columns = df.select_dtypes(include="object").columns
+    table = pyarrow.Table.from_pandas(df.astype({column: "string" for column in object_columns}), preserve_index=False)
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def dataframe_response(df: DataFrame, data_format: DataFormatEnum) -> Response:
+    if data_format == DataFormatEnum.arrow:
+        if not pyarrow:
+            raise HTTPException(status_code=501, detail="The arrow format requires pyarrow to be installed")
+        return Response(content=dataframe_to_arrow_stream(df), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    return Response(content=dataframe_to_columnar_json(df), media_type="application/json")
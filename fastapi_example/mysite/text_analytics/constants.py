@@ -5,3 +5,44 @@ class DictionaryEnum(Enum):
     english = "english"
     simple = "simple"
     simple_with_stop_words = "simple_with_stop_words"
+
+
+class ImageFormatEnum(Enum):
+    png = "png"
+    webp = "webp"
+    svg = "svg"
+
+
+IMAGE_FORMAT_MEDIA_TYPES = {
+    ImageFormatEnum.png: "image/png",
+    ImageFormatEnum.webp: "image/webp",
+    ImageFormatEnum.svg: "image/svg+xml",
+}
+
+
+class DataFormatEnum(Enum):
+    json = "json"
+    arrow = "arrow"
+
+
+# the terms of each article ranked up to this rank are covered by the partial index on term_rank
+TOP_TERMS_PER_ARTICLE = 20
+
+
+class AnalyticsQueryEnum(Enum):
+    writer_content_length = "writer-content-length"
+    writer_most_used_words = "writer-most-used-words"
+    wordcloud = "wordcloud"
+    tf_idf = "tf-idf"
+    order_by = "order-by"
+
+
+class ExportDatasetEnum(Enum):
+    articles = "articles"
+    article_term_occurrences = "article-term-occurrences"
+    corpus_term_occurrences = "corpus-term-occurrences"
+
+
+class ExportFormatEnum(Enum):
+    csv = "csv"
+    parquet = "parquet"
@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import shutil
+import threading
+import time
+import uuid
+from contextlib import aclosing
+from pathlib import Path
+from typing import NamedTuple
+
+from pandas import DataFrame
+from sqlalchemy import Integer
+from sqlalchemy import Select
+from sqlalchemy import String
+from sqlalchemy import cast
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mysite import settings
+from mysite.articles.models import Article
+from mysite.database import AnalyticsSessionLocal
+from mysite.database import query_to_df
+from mysite.database import query_to_df_chunks
+from mysite.text_analytics.constants import TOP_TERMS_PER_ARTICLE
+from mysite.text_analytics.constants import AnalyticsQueryEnum
+from mysite.text_analytics.models import ArticleTermOccurrence
+from mysite.text_analytics.models import CorpusTermOccurrence
+from mysite.text_analytics.models import WriterTermOccurrence
+from mysite.text_analytics.queries import get_order_by_df
+from mysite.text_analytics.queries import get_term_frequency_corpus_df
+from mysite.text_analytics.queries import get_words_with_frequencies
+from mysite.text_analytics.queries import get_writer_content_length_df
+from mysite.text_analytics.queries import get_writer_most_used_words_df
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.writers.models import Writer
+
+try:
+    import duckdb
+except ImportError:  # optional, only needed for the queries served by DuckDB
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# the uuids are exported as text, the identifiers are compared as text in DuckDB
+SNAPSHOT_QUERIES: dict[str, Select] = {
+    "article": select(
+        cast(Article.article_id, String).label("article_id"),
+        cast(Article.writer_id, String).label("writer_id"),
+        Article.article_name,
+        Article.word_count,
+        Article.character_count,
+        Article.reading_time_minutes,
+        func.length(Article.article_content_simple_with_no_stop_words, type_=Integer).label("number_of_terms"),
+    ),
+    "writer": select(cast(Writer.writer_id, String).label("writer_id"), Writer.email),
+    "article_term": select(
+        cast(ArticleTermOccurrence.article_id, String).label("article_id"),
+        ArticleTermOccurrence.word,
+        ArticleTermOccurrence.number_of_occurrences,
+        ArticleTermOccurrence.term_rank,
+    ),
+    "corpus_term": select(
+        CorpusTermOccurrence.word, CorpusTermOccurrence.number_of_articles, CorpusTermOccurrence.number_of_occurrences
+    ),
+    "writer_term": select(
+        cast(WriterTermOccurrence.writer_id, String).label("writer_id"),
+        WriterTermOccurrence.word,
+        WriterTermOccurrence.number_of_articles,
+        WriterTermOccurrence.number_of_occurrences,
+    ),
+}
+
+MEDIUM_WRITER_EMAIL = "user+medium_data@example.com"
+
+WRITER_CONTENT_LENGTH_SQL = """
+    select article_name, word_count, character_count, reading_time_minutes
+    from article
+    where writer_id = $writer_id
+    order by word_count
+"""
+
+WRITER_MOST_USED_WORDS_SQL = """
+    select word, number_of_articles, number_of_occurrences
+    from writer_term
+    where writer_id = $writer_id
+    order by number_of_occurrences desc
+    limit 20
+"""
+
+WORDS_WITH_FREQUENCIES_SQL = """
+    select word, sum(number_of_occurrences) as number_of_occurrences
+    from article_term
+    where term_rank <= $top_terms_per_article
+    group by word
+"""
+
+WRITER_ARTICLE_COUNT_SQL = """
+    select count(*) as number_of_articles, coalesce(sum(least(number_of_terms, 5)), 0) as limit_words
+    from article
+    where writer_id = (select writer_id from writer where email = $email)
+"""
+
+TERM_FREQUENCY_CORPUS_SQL = """
+    with writer_article as (
+        select article_id, article_name, number_of_terms
+        from article
+        where writer_id = (select writer_id from writer where email = $email)
+    ),
+    tf as (
+        select article_term.article_id, writer_article.article_name, article_term.word,
+            article_term.number_of_occurrences / writer_article.number_of_terms as tf
+        from article_term
+        join writer_article on article_term.article_id = writer_article.article_id
+    ),
+    idf as (
+        select word, log10($number_of_articles / number_of_articles) as idf
+        from corpus_term
+    )
+    (
+        select tf.article_name, tf.word, tf.tf * idf.idf * 100 as score, 'TF-IDF' as rank_type
+        from tf
+        join idf on tf.word = idf.word
+        order by row_number() over (partition by tf.article_id order by tf.tf * idf.idf * 100 desc)
+        limit $limit_words
+    )
+    union all
+    (
+        select writer_article.article_name, article_term.word, article_term.number_of_occurrences as score,
+            'COUNT' as rank_type
+        from article_term
+        join writer_article on article_term.article_id = writer_article.article_id
+        where article_term.word != 'data'
+        order by article_term.term_rank
+        limit $limit_words
+    )
+"""
+
+ORDER_BY_SQL = """
+    select article.article_id, article.article_name, article_term.word
+    from article_term
+    join article on article_term.article_id = article.article_id
+    where article.writer_id = (select writer_id from writer where email = $email)
+    qualify row_number() over (
+        partition by article_term.article_id
+        order by article_term.number_of_occurrences desc, article_term.word
+    ) = 1
+    order by article.article_id
+"""
+
+
+class Snapshot(NamedTuple):
+    generation: int
+    directory: Path
+    connection: "duckdb.DuckDBPyConnection"
+    number_of_rows: dict[str, int]
+    size_bytes: int
+    export_ms: float
+
+
+def close_snapshot(snapshot: Snapshot):
+    snapshot.connection.close()
+    shutil.rmtree(snapshot.directory, ignore_errors=True)
+
+
+def write_parquet(connection: "duckdb.DuckDBPyConnection", df: DataFrame, path: Path):
+    # the type of an object column is inferred from its values, which an empty or all null chunk does not have
+    object_columns = df.select_dtypes(include="object").columns
+    connection.register("chunk_df", df.astype({column: "string" for column in object_columns}))
+    try:
+        connection.execute(f"copy chunk_df to '{path}' (format parquet)")
+    finally:
+        connection.unregister("chunk_df")
+
+
+class DuckdbEngine:
+    """
+    Runs the text analytics queries in an embedded DuckDB over Parquet snapshots of the analytics tables,
+    such that the heavy analytics do not compete with the transactional queries on Postgres.
+
+    A snapshot is exported after each analytics refresh, a query is only served by DuckDB when it is enabled
+    for it and the snapshot is of the current generation, otherwise it runs on Postgres.
+
+    The queries running on a snapshot are counted, by the query and by the thread running it, as the thread
+    outlives a cancelled query. A replaced snapshot is closed once its last query finished.
+    """
+
+    def __init__(self, directory: Path, queries: list[str], threads: int, chunk_size: int):
+        self.directory = directory
+        self.queries = {AnalyticsQueryEnum(query) for query in queries}
+        self.threads = threads
+        self.chunk_size = chunk_size
+
+        self.snapshot: Snapshot | None = None
+        self.number_of_queries = 0
+        self.number_of_fallbacks = 0
+        self.last_error: str | None = None
+
+        self._export_lock = asyncio.Lock()
+        self._local = threading.local()
+        # the users are counted from the event loop and from the threads running the queries
+        self._users_lock = threading.Lock()
+        self._number_of_users: dict[Path, int] = {}
+        self._retired_snapshots: dict[Path, Snapshot] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.queries) and duckdb is not None
+
+    def serves(self, query: AnalyticsQueryEnum) -> bool:
+        snapshot = self.snapshot
+        return query in self.queries and snapshot is not None and snapshot.generation == analytics_refresher.generation
+
+    async def export(self, db: AsyncSession, generation: int) -> Snapshot:
+        """
+        Exports the analytics tables to a new directory of Parquet files, chunk by chunk through
+        server side cursors, and opens a DuckDB connection with a view per table.
+        """
+        start = time.perf_counter()
+        directory = self.directory / f"{generation}-{uuid.uuid4().hex}"
+        directory.mkdir(parents=True)
+        connection = duckdb.connect(config={"threads": self.threads})
+
+        number_of_rows = {}
+        for table_name, query in SNAPSHOT_QUERIES.items():
+            table_directory = directory / table_name
+            table_directory.mkdir()
+            number_of_rows[table_name] = 0
+            number_of_chunks = 0
+            chunks = query_to_df_chunks(db, query, chunk_size=self.chunk_size, categorical_columns=())
+            async with aclosing(chunks):
+                async for chunk_df in chunks:
+                    path = table_directory / f"{number_of_chunks:05d}.parquet"
+                    await asyncio.to_thread(write_parquet, connection, chunk_df, path)
+                    number_of_rows[table_name] += len(chunk_df)
+                    number_of_chunks += 1
+
+            if not number_of_chunks:
+                # an empty file keeps the columns of the view
+                empty_df = await query_to_df(db, query.limit(0), categorical_columns=())
+                await asyncio.to_thread(write_parquet, connection, empty_df, table_directory / "00000.parquet")
+
+            connection.execute(f"create view {table_name} as select * from read_parquet('{table_directory}/*.parquet')")
+
+        return Snapshot(
+            generation=generation,
+            directory=directory,
+            connection=connection,
+            number_of_rows=number_of_rows,
+            size_bytes=sum(path.stat().st_size for path in directory.glob("*/*.parquet")),
+            export_ms=(time.perf_counter() - start) * 1000,
+        )
+
+    async def refresh(self, generation: int):
+        if not self.enabled:
+            return
+
+        async with self._export_lock:
+            try:
+                async with AnalyticsSessionLocal() as db:
+                    snapshot = await self.export(db, generation)
+            except Exception as error:
+                self.last_error = repr(error)
+                raise
+            self.last_error = None
+
+            previous_snapshot, self.snapshot = self.snapshot, snapshot
+            if previous_snapshot:
+                self._retire(previous_snapshot)
+
+    def start(self):
+        if self.enabled:
+            asyncio.get_running_loop().create_task(self.refresh(analytics_refresher.generation))
+        elif self.queries:
+            logger.warning("DuckDB is not installed, the analytics queries run on Postgres")
+
+    def stop(self):
+        if self.snapshot:
+            self._retire(self.snapshot)
+        self.snapshot = None
+
+    def _acquire(self, snapshot: Snapshot) -> Snapshot:
+        with self._users_lock:
+            self._number_of_users[snapshot.directory] = self._number_of_users.get(snapshot.directory, 0) + 1
+        return snapshot
+
+    def _release(self, snapshot: Snapshot):
+        with self._users_lock:
+            self._number_of_users[snapshot.directory] -= 1
+            if self._number_of_users[snapshot.directory]:
+                return
+            del self._number_of_users[snapshot.directory]
+            retired_snapshot = self._retired_snapshots.pop(snapshot.directory, None)
+        if retired_snapshot:
+            close_snapshot(retired_snapshot)
+
+    def _retire(self, snapshot: Snapshot):
+        with self._users_lock:
+            if snapshot.directory in self._number_of_users:
+                # closed by its last user
+                self._retired_snapshots[snapshot.directory] = snapshot
+                return
+        close_snapshot(snapshot)
+
+    def _execute(self, snapshot: Snapshot, sql: str, parameters: dict) -> DataFrame:
+        try:
+            # a DuckDB connection is not thread safe, each thread queries through its own cursor
+            cursors = getattr(self._local, "cursors", None)
+            if cursors is None or cursors[0] is not snapshot.connection:
+                cursors = self._local.cursors = (snapshot.connection, snapshot.connection.cursor())
+            return cursors[1].execute(sql, parameters).df()
+        finally:
+            self._release(snapshot)
+
+    async def query_df(self, snapshot: Snapshot, sql: str, **parameters) -> DataFrame:
+        self.number_of_queries += 1
+        future = asyncio.get_running_loop().run_in_executor(
+            None, self._execute, self._acquire(snapshot), sql, parameters
+        )
+        # the query is not cancelled with the request, the thread releases the snapshot once the query finished
+        future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        return await asyncio.shield(future)
+
+    async def run(self, query: AnalyticsQueryEnum, *args):
+        snapshot = self._acquire(self.snapshot)
+        try:
+            return await self._run(snapshot, query, *args)
+        finally:
+            self._release(snapshot)
+
+    async def _run(self, snapshot: Snapshot, query: AnalyticsQueryEnum, *args):
+        if query == AnalyticsQueryEnum.writer_content_length:
+            (writer_id,) = args
+            return await self.query_df(snapshot, WRITER_CONTENT_LENGTH_SQL, writer_id=str(writer_id))
+        if query == AnalyticsQueryEnum.writer_most_used_words:
+            (writer_id,) = args
+            return await self.query_df(snapshot, WRITER_MOST_USED_WORDS_SQL, writer_id=str(writer_id))
+        if query == AnalyticsQueryEnum.wordcloud:
+            df = await self.query_df(snapshot, WORDS_WITH_FREQUENCIES_SQL, top_terms_per_article=TOP_TERMS_PER_ARTICLE)
+            return dict(zip(df["word"], df["number_of_occurrences"].astype(int)))
+        if query == AnalyticsQueryEnum.tf_idf:
+            count_df = await self.query_df(snapshot, WRITER_ARTICLE_COUNT_SQL, email=MEDIUM_WRITER_EMAIL)
+            number_of_articles = int(count_df["number_of_articles"].iloc[0])
+            df = await self.query_df(
+                snapshot,
+                TERM_FREQUENCY_CORPUS_SQL,
+                email=MEDIUM_WRITER_EMAIL,
+                number_of_articles=number_of_articles,
+                limit_words=int(count_df["limit_words"].iloc[0]),
+            )
+            return df, number_of_articles
+        if query == AnalyticsQueryEnum.order_by:
+            return await self.query_df(snapshot, ORDER_BY_SQL, email=MEDIUM_WRITER_EMAIL)
+        raise ValueError(f"Unknown analytics query {query}")
+
+    def status(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "installed": duckdb is not None,
+            "queries": sorted(query.value for query in self.queries),
+            "generation": snapshot.generation if snapshot else None,
+            "up_to_date": snapshot is not None and snapshot.generation == analytics_refresher.generation,
+            "number_of_rows": snapshot.number_of_rows if snapshot else {},
+            "size_bytes": snapshot.size_bytes if snapshot else 0,
+            "last_export_ms": snapshot.export_ms if snapshot else None,
+            "last_error": self.last_error,
+            "number_of_queries": self.number_of_queries,
+            "number_of_fallbacks": self.number_of_fallbacks,
+        }
+
+
+POSTGRES_QUERIES = {
+    AnalyticsQueryEnum.writer_content_length: get_writer_content_length_df,
+    AnalyticsQueryEnum.writer_most_used_words: get_writer_most_used_words_df,
+    AnalyticsQueryEnum.wordcloud: get_words_with_frequencies,
+    AnalyticsQueryEnum.tf_idf: get_term_frequency_corpus_df,
+    AnalyticsQueryEnum.order_by: get_order_by_df,
+}
+
+duckdb_engine = DuckdbEngine(
+    directory=Path(settings.ANALYTICS_DUCKDB_DIRECTORY),
+    queries=settings.ANALYTICS_DUCKDB_QUERIES,
+    threads=settings.ANALYTICS_DUCKDB_THREADS,
+    chunk_size=settings.ANALYTICS_DUCKDB_CHUNK_SIZE,
+)
+
+analytics_refresher.add_listener(duckdb_engine.refresh)
+
+
+async def run_analytics_query(query: AnalyticsQueryEnum, db: AsyncSession, *args):
+    """
+    Runs the analytics query on the DuckDB snapshot when it serves the query, otherwise on Postgres.
+    """
+    if duckdb_engine.serves(query):
+        return await duckdb_engine.run(query, *args)
+    if query in duckdb_engine.queries:
+        duckdb_engine.number_of_fallbacks += 1
+    return await POSTGRES_QUERIES[query](db, *args)
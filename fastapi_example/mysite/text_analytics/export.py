@@ -0,0 +1,166 @@
+import io
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator
+
+from pandas import DataFrame
+from pydantic import UUID4
+from sqlalchemy import Select
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from mysite.articles.constants import ArticleStatus
+from mysite.articles.models import Article
+from mysite.database import query_to_df_chunks
+from mysite.text_analytics.constants import ExportDatasetEnum
+from mysite.text_analytics.constants import ExportFormatEnum
+from mysite.text_analytics.models import ArticleTermOccurrence
+from mysite.text_analytics.models import CorpusTermOccurrence
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, only needed for the parquet export format
+    pyarrow = None
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatEnum.csv: "text/csv",
+    ExportFormatEnum.parquet: "application/vnd.apache.parquet",
+}
+
+
+class InvalidExportFilter(Exception):
+    pass
+
+
+def export_query(
+    dataset: ExportDatasetEnum,
+    writer_id: UUID4 | None,
+    published_from: datetime | None,
+    published_to: datetime | None,
+) -> Select:
+    """
+    The rows of the dataset, only the published articles and their term occurrences are exported, they can be
+    filtered by writer and by date of first publication, the corpus term occurrences cover all the articles.
+    """
+    if dataset == ExportDatasetEnum.corpus_term_occurrences:
+        if writer_id or published_from or published_to:
+            raise InvalidExportFilter("The corpus term occurrences are not filtered by writer or date")
+        return select(
+            CorpusTermOccurrence.word,
+            CorpusTermOccurrence.number_of_articles,
+            CorpusTermOccurrence.number_of_occurrences,
+        ).order_by(CorpusTermOccurrence.word)
+
+    if dataset == ExportDatasetEnum.articles:
+        query = select(
+            Article.article_id,
+            Article.writer_id,
+            Article.article_name,
+            Article.article_status,
+            Article.members_only_flag,
+            Article.date_created,
+            Article.date_first_published,
+            Article.word_count,
+            Article.character_count,
+            Article.reading_time_minutes,
+        ).order_by(Article.article_id)
+    else:
+        query = (
+            select(
+                ArticleTermOccurrence.article_id,
+                ArticleTermOccurrence.word,
+                ArticleTermOccurrence.number_of_occurrences,
+                ArticleTermOccurrence.term_rank,
+            )
+            .join(Article, ArticleTermOccurrence.article_id == Article.article_id)
+            .order_by(ArticleTermOccurrence.article_id, ArticleTermOccurrence.term_rank)
+        )
+
+    query = query.where(Article.article_status == ArticleStatus.published.value)
+    if writer_id:
+        query = query.where(Article.writer_id == writer_id)
+    if published_from:
+        query = query.where(Article.date_first_published >= published_from)
+    if published_to:
+        query = query.where(Article.date_first_published < published_to)
+    return query
+
+
+def chunk_to_text_columns(df: DataFrame) -> DataFrame:
+    # object columns hold uuids, datetimes or strings, whose type is not consistent between chunks
+    object_columns = df.select_dtypes(include="object").columns
+    return df.astype({column: "string" for column in object_columns})
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    File written by the parquet writer, the bytes written since the last drain are sent as the next chunk.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, content) -> int:
+        self._chunks.append(bytes(content))
+        return len(content)
+
+    def drain(self) -> bytes:
+        content = b"".join(self._chunks)
+        self._chunks = []
+        return content
+
+
+async def export_csv(query: Select, chunk_size: int, session_maker: async_sessionmaker) -> AsyncIterator[bytes]:
+    async with session_maker() as db:
+        header = True
+        chunks = query_to_df_chunks(db, query, chunk_size=chunk_size, categorical_columns=())
+        async with aclosing(chunks):
+            async for chunk_df in chunks:
+                yield chunk_df.to_csv(index=False, header=header).encode()
+                header = False
+
+        if header:
+            yield (",".join(query.selected_columns.keys()) + "\n").encode()
+
+
+async def export_parquet(query: Select, chunk_size: int, session_maker: async_sessionmaker) -> AsyncIterator[bytes]:
+    sink = ChunkSink()
+    writer = None
+    async with session_maker() as db:
+        # one row group per chunk, the schema is the schema of the first chunk
+        chunks = query_to_df_chunks(db, query, chunk_size=chunk_size, categorical_columns=())
+        async with aclosing(chunks):
+            async for chunk_df in chunks:
+                table = pyarrow.Table.from_pandas(chunk_to_text_columns(chunk_df), preserve_index=False)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(sink, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                yield sink.drain()
+
+    if writer is None:
+        writer = pyarrow.parquet.ParquetWriter(
+            sink, pyarrow.schema([(name, pyarrow.string()) for name in query.selected_columns.keys()])
+        )
+    # the footer is written at close
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(
+    query: Select, export_format: ExportFormatEnum, chunk_size: int, session_maker: async_sessionmaker
+) -> AsyncIterator[bytes]:
+    """
+    The export file by chunks of at most chunk_size rows, each chunk is sent once fetched from the server side
+    cursor, such that the memory does not depend on the number of rows.
+
+    The export opens its own session of the session maker, eg: of the analytics pool, the session of the request is
+    closed before a streamed response is sent.
+    """
+    if export_format == ExportFormatEnum.parquet:
+        return export_parquet(query, chunk_size, session_maker)
+    return export_csv(query, chunk_size, session_maker)
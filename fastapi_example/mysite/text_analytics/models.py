@@ -1,5 +1,6 @@
 from sqlalchemy import UUID
 from sqlalchemy import Column
+from sqlalchemy import Date
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import String
@@ -7,9 +8,12 @@ from sqlalchemy import String
 from mysite.models import Base
 
 
-class CorpusTermOccurrenceMV(Base):
-    __tablename__ = "term_occurrence_per_corpus_mv"
-    __table_args__ = {"info": {"is_view": True, "skip_autogenerate": True}}
+class CorpusTermOccurrence(Base):
+    __tablename__ = "term_occurrence_per_corpus"
+    __table_args__ = {
+        "comment": "number of articles and occurrences of each term in the corpus, maintained by a trigger",
+        "info": {"skip_autogenerate": True},
+    }
 
     word = Column(String, nullable=False, primary_key=True)
 
@@ -18,9 +22,12 @@ class CorpusTermOccurrenceMV(Base):
     number_of_occurrences = Column(Integer, nullable=False)
 
 
-class ArticleTermOccurrenceMV(Base):
-    __tablename__ = "term_occurrence_per_article_mv"
-    __table_args__ = {"info": {"is_view": True, "skip_autogenerate": True}}
+class ArticleTermOccurrence(Base):
+    __tablename__ = "term_occurrence_per_article"
+    __table_args__ = {
+        "comment": "number of occurrences of each term per article, maintained by a trigger",
+        "info": {"skip_autogenerate": True},
+    }
 
     article_id = Column(
         UUID(as_uuid=True),
@@ -31,3 +38,59 @@ class ArticleTermOccurrenceMV(Base):
     word = Column(String, nullable=False, primary_key=True)
 
     number_of_occurrences = Column(Integer, nullable=False)
+
+    # 1 for the most used term of the article, the ties are ordered by word
+    term_rank = Column(Integer, nullable=False)
+
+
+class WriterTermOccurrence(Base):
+    __tablename__ = "term_occurrence_per_writer"
+    __table_args__ = {
+        "comment": "number of articles and occurrences of each term per writer, maintained by a trigger",
+        "info": {"skip_autogenerate": True},
+    }
+
+    writer_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("fastapi_writer.writer_id"),  # information only
+        primary_key=True,
+    )
+
+    word = Column(String, nullable=False, primary_key=True)
+
+    number_of_articles = Column(Integer, nullable=False)
+
+    number_of_occurrences = Column(Integer, nullable=False)
+
+
+class MonthTermOccurrence(Base):
+    __tablename__ = "term_occurrence_per_month"
+    __table_args__ = {
+        "comment": "number of published articles and occurrences of each term per month of first publication, "
+        "maintained by a trigger",
+        "info": {"skip_autogenerate": True},
+    }
+
+    # the first day of the month of first publication of the articles, in UTC
+    month = Column(Date, nullable=False, primary_key=True)
+
+    word = Column(String, nullable=False, primary_key=True)
+
+    number_of_articles = Column(Integer, nullable=False)
+
+    number_of_occurrences = Column(Integer, nullable=False)
+
+
+class MonthArticleCount(Base):
+    __tablename__ = "article_count_per_month"
+    __table_args__ = {
+        "comment": "number of published articles and term occurrences per month of first publication, "
+        "maintained by a trigger",
+        "info": {"skip_autogenerate": True},
+    }
+
+    month = Column(Date, nullable=False, primary_key=True)
+
+    number_of_articles = Column(Integer, nullable=False)
+
+    number_of_occurrences = Column(Integer, nullable=False)
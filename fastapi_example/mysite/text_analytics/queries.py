@@ -0,0 +1,306 @@
+from datetime import date
+
+from pandas import DataFrame
+from pydantic import UUID4
+from sqlalchemy import Date
+from sqlalchemy import Float
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import cast
+from sqlalchemy import desc
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import literal_column
+from sqlalchemy import select
+from sqlalchemy import true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from mysite.articles.models import Article
+from mysite.database import query_to_df
+from mysite.text_analytics.constants import TOP_TERMS_PER_ARTICLE
+from mysite.text_analytics.models import ArticleTermOccurrence
+from mysite.text_analytics.models import CorpusTermOccurrence
+from mysite.text_analytics.models import MonthArticleCount
+from mysite.text_analytics.models import MonthTermOccurrence
+from mysite.text_analytics.models import WriterTermOccurrence
+from mysite.writers.models import Writer
+
+
+async def get_writer_content_length_df(db: AsyncSession, writer_id: UUID4) -> DataFrame:
+    query = (
+        select(Article.article_name, Article.word_count, Article.character_count, Article.reading_time_minutes)
+        .where(Article.writer_id == writer_id)
+        .order_by(Article.word_count)
+    )
+
+    return await query_to_df(db, query)
+
+
+async def get_writer_most_used_words_df(db: AsyncSession, writer_id: UUID4) -> DataFrame:
+    query = (
+        select(
+            WriterTermOccurrence.word,
+            WriterTermOccurrence.number_of_articles,
+            WriterTermOccurrence.number_of_occurrences,
+        )
+        .where(WriterTermOccurrence.writer_id == writer_id)
+        .order_by(desc(WriterTermOccurrence.number_of_occurrences))
+        .limit(20)
+    )
+    return await query_to_df(db, query)
+
+
+async def get_words_with_frequencies(db: AsyncSession) -> dict[str, int]:
+    """
+    The top 20 words of each article, with their number of occurrences summed over the articles.
+    """
+    top_word_occurrences_subquery = (
+        select(
+            ArticleTermOccurrence.word,
+            func.sum(ArticleTermOccurrence.number_of_occurrences).label("number_of_occurrences"),
+        )
+        .where(ArticleTermOccurrence.term_rank <= TOP_TERMS_PER_ARTICLE)
+        .group_by(ArticleTermOccurrence.word)
+    ).subquery("top_word_occurrences_subquery")
+
+    words_with_frequencies = await db.scalar(
+        select(
+            func.json_object_agg(
+                top_word_occurrences_subquery.c.word, top_word_occurrences_subquery.c.number_of_occurrences
+            )
+        )
+    )
+
+    return words_with_frequencies or {}
+
+
+async def get_term_frequency_corpus_df(db: AsyncSession) -> tuple[DataFrame, int]:
+    """
+    The top words per article of the medium writer by TF-IDF and by count, with the number of articles.
+    """
+    writer_id = await db.scalar(select(Writer.writer_id).where(Writer.email == "user+medium_data@example.com"))
+
+    number_of_articles, limit_words = (
+        await db.execute(
+            select(
+                func.count(Article.article_id),
+                func.sum(
+                    case(
+                        (func.length(Article.article_content_simple_with_no_stop_words) >= 5, 5),
+                        else_=func.length(Article.article_content_simple_with_no_stop_words),
+                    )
+                ),
+            ).where(Article.writer_id == writer_id)
+        )
+    ).first()
+
+    tf_cte = (
+        select(
+            ArticleTermOccurrence.article_id,
+            Article.article_name,
+            ArticleTermOccurrence.word,
+            (
+                ArticleTermOccurrence.number_of_occurrences
+                / func.length(Article.article_content_simple_with_no_stop_words)
+            ).label("tf"),
+        )
+        .join(Article, ArticleTermOccurrence.article_id == Article.article_id)
+        .where(Article.writer_id == writer_id)
+    ).cte("tf_cte")
+
+    idf_cte = (
+        (
+            select(
+                CorpusTermOccurrence.word,
+                func.log((number_of_articles / CorpusTermOccurrence.number_of_articles)).label("idf"),
+            )
+        )
+        .cte("idf_cte")
+        .prefix_with("MATERIALIZED")
+    )
+
+    # term_rank counts 'data', the terms are ranked again without it, their rank is at most one below term_rank
+    count_rank_subquery = (
+        select(
+            Article.article_name,
+            ArticleTermOccurrence.word,
+            ArticleTermOccurrence.number_of_occurrences,
+            func.row_number()
+            .over(partition_by=ArticleTermOccurrence.article_id, order_by=ArticleTermOccurrence.term_rank)
+            .label("count_rank"),
+        )
+        .join(Article, ArticleTermOccurrence.article_id == Article.article_id)
+        .where(Article.writer_id == writer_id)
+        .where(ArticleTermOccurrence.word != "data")
+        .where(ArticleTermOccurrence.term_rank <= (limit_words or 0) + 1)
+    ).subquery("count_rank_subquery")
+
+    tf_idf_count_query = (
+        select(
+            tf_cte.c.article_name,
+            tf_cte.c.word,
+            (tf_cte.c.tf * idf_cte.c.idf * 100).label("score"),
+            literal("TF-IDF").label("rank_type"),
+        )
+        .join(idf_cte, tf_cte.c.word == idf_cte.c.word)
+        .order_by(
+            func.row_number().over(partition_by=tf_cte.c.article_id, order_by=desc(tf_cte.c.tf * idf_cte.c.idf * 100))
+        )
+        .limit(limit_words)
+        .union_all(
+            select(
+                count_rank_subquery.c.article_name,
+                count_rank_subquery.c.word,
+                count_rank_subquery.c.number_of_occurrences.label("score"),
+                literal("COUNT").label("rank_type"),
+            )
+            .order_by(count_rank_subquery.c.count_rank)
+            .limit(limit_words)
+        )
+    )
+
+    return await query_to_df(db, tf_idf_count_query), number_of_articles
+
+
+async def get_order_by_df(db: AsyncSession) -> DataFrame:
+    """
+    The most used word per article of the medium writer, read from the precomputed rank of the terms.
+    """
+    writer_id = await db.scalar(select(Writer.writer_id).where(Writer.email == "user+medium_data@example.com"))
+
+    return await query_to_df(
+        db,
+        select(Article.article_id, Article.article_name, ArticleTermOccurrence.word)
+        .join(Article, ArticleTermOccurrence.article_id == Article.article_id)
+        .where(Article.writer_id == writer_id)
+        .where(ArticleTermOccurrence.term_rank == 1)
+        .order_by(Article.article_id),
+    )
+
+
+def shift_month(month: date, number_of_months: int) -> date:
+    """
+    The first day of the month number_of_months after the month of the date, before it when negative.
+    """
+    month_index = month.year * 12 + month.month - 1 + number_of_months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+async def get_trends(
+    db: AsyncSession, end_month: date | None, number_of_months: int, limit: int, min_articles: int
+) -> list[dict]:
+    """
+    The most used terms and the fastest rising terms of each month with published articles, latest month first.
+
+    Only the monthly rollups are read, the share of a term is its part of the occurrences of the month,
+    a term rises by the change of its share since the previous month, the months after a month with no
+    published articles have no rising terms.
+
+    The statements read one snapshot, in a repeatable read transaction started on the session, such that a month
+    written between them is not read by some of them only.
+    """
+    await db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+    if end_month is None:
+        end_month = await db.scalar(select(func.max(MonthArticleCount.month)))
+        if end_month is None:
+            return []
+    end_month = end_month.replace(day=1)
+    start_month = shift_month(end_month, 1 - number_of_months)
+
+    months = {
+        row.month: {**row._asdict(), "top_terms": [], "rising_terms": []}
+        for row in await db.execute(
+            select(
+                MonthArticleCount.month, MonthArticleCount.number_of_articles, MonthArticleCount.number_of_occurrences
+            )
+            .where(MonthArticleCount.month.between(start_month, end_month))
+            .order_by(desc(MonthArticleCount.month))
+        )
+    }
+
+    # the top terms of each month are read from the (month, number_of_occurrences desc) index
+    month_subquery = (
+        select(MonthArticleCount.month, MonthArticleCount.number_of_occurrences)
+        .where(MonthArticleCount.month.between(start_month, end_month))
+        .subquery("month_subquery")
+    )
+    top_terms_subquery = (
+        select(
+            MonthTermOccurrence.word, MonthTermOccurrence.number_of_articles, MonthTermOccurrence.number_of_occurrences
+        )
+        .where(MonthTermOccurrence.month == month_subquery.c.month)
+        .order_by(desc(MonthTermOccurrence.number_of_occurrences), MonthTermOccurrence.word)
+        .limit(limit)
+        .lateral("top_terms_subquery")
+    )
+    top_terms_query = (
+        select(
+            month_subquery.c.month,
+            top_terms_subquery.c.word,
+            top_terms_subquery.c.number_of_articles,
+            top_terms_subquery.c.number_of_occurrences,
+            (
+                cast(top_terms_subquery.c.number_of_occurrences, Float)
+                / cast(month_subquery.c.number_of_occurrences, Float)
+            ).label("share"),
+        )
+        .select_from(month_subquery.join(top_terms_subquery, true()))
+        .order_by(month_subquery.c.month, desc(top_terms_subquery.c.number_of_occurrences), top_terms_subquery.c.word)
+    )
+    for row in await db.execute(top_terms_query):
+        months[row.month]["top_terms"].append(row._asdict())
+
+    current_term = aliased(MonthTermOccurrence)
+    previous_term = aliased(MonthTermOccurrence)
+    current_count = aliased(MonthArticleCount)
+    previous_count = aliased(MonthArticleCount)
+
+    share = cast(current_term.number_of_occurrences, Float) / cast(current_count.number_of_occurrences, Float)
+    previous_share = func.coalesce(
+        cast(previous_term.number_of_occurrences, Float) / cast(previous_count.number_of_occurrences, Float), 0
+    )
+    share_change = share - previous_share
+    rising_terms_subquery = (
+        select(
+            current_term.month,
+            current_term.word,
+            current_term.number_of_articles,
+            current_term.number_of_occurrences,
+            share.label("share"),
+            previous_share.label("previous_share"),
+            share_change.label("share_change"),
+            func.row_number()
+            .over(partition_by=current_term.month, order_by=(desc(share_change), current_term.word))
+            .label("trend_rank"),
+        )
+        .join(current_count, current_count.month == current_term.month)
+        .join(
+            previous_count,
+            previous_count.month == cast(current_term.month - literal_column("interval '1 month'"), Date),
+        )
+        .outerjoin(
+            previous_term,
+            and_(previous_term.month == previous_count.month, previous_term.word == current_term.word),
+        )
+        .where(current_term.month.between(start_month, end_month))
+        .where(current_term.number_of_articles >= min_articles)
+    ).subquery("rising_terms_subquery")
+    rising_terms_query = (
+        select(
+            rising_terms_subquery.c.month,
+            rising_terms_subquery.c.word,
+            rising_terms_subquery.c.number_of_articles,
+            rising_terms_subquery.c.number_of_occurrences,
+            rising_terms_subquery.c.share,
+            rising_terms_subquery.c.previous_share,
+            rising_terms_subquery.c.share_change,
+        )
+        .where(rising_terms_subquery.c.trend_rank <= limit)
+        .where(rising_terms_subquery.c.share_change > 0)
+        .order_by(rising_terms_subquery.c.month, rising_terms_subquery.c.trend_rank)
+    )
+    for row in await db.execute(rising_terms_query):
+        months[row.month]["rising_terms"].append(row._asdict())
+
+    return list(months.values())
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Awaitable
+from typing import Callable
+
+from sqlalchemy import bindparam
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mysite import settings
+from mysite.database import AnalyticsSessionLocal
+from mysite.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+RefreshListener = Callable[[int], Awaitable[None]]
+
+# the tables the analytics data is read from, the term occurrence tables are written by the article triggers and by
+# their rebuild, eg: rebuild_term_occurrence.py
+ANALYTICS_SOURCE_TABLES = [
+    "fastapi_article",
+    "fastapi_writer",
+    "term_occurrence_per_corpus",
+    "term_occurrence_per_article",
+    "term_occurrence_per_writer",
+    "term_occurrence_per_month",
+    "article_count_per_month",
+]
+# the rows written to the tables since the statistics were reset, by all the processes, the counters of a transaction
+# are reported shortly after it ended
+NUMBER_OF_WRITES_QUERY = text(
+    "select coalesce(sum(n_tup_ins + n_tup_upd + n_tup_del), 0)::bigint "
+    "from pg_stat_user_tables where relname in :tables"
+).bindparams(bindparam("tables", ANALYTICS_SOURCE_TABLES, expanding=True))
+
+
+class AnalyticsRefreshScheduler:
+    """
+    Keeps the generation of the analytics data.
+
+    Article writes request a refresh, the requests within the debounce window are coalesced into one refresh,
+    which refreshes the configured materialized views concurrently, increments the generation and notifies
+    the listeners (caches, rendered images, in memory indexes) with the new generation.
+
+    The WAL location of the primary at the end of a refresh is kept, the analytics database, eg: a replica, has the
+    data of the generation once it replayed it, until then what is read from it may be older than the generation.
+    The listeners reading the analytics database are notified once it replayed it or after the catch up timeout.
+
+    The periodic refresh picks up the changes made outside of the app, it is skipped while no refresh is requested
+    and the number of rows written to the analytics tables did not change since the last refresh, such that an idle
+    system keeps its caches, snapshots and in memory indexes.
+    """
+
+    def __init__(
+        self,
+        materialized_views: list[str],
+        debounce_seconds: float,
+        interval_seconds: float,
+        catch_up_timeout_seconds: float,
+    ):
+        self.materialized_views = materialized_views
+        self.debounce_seconds = debounce_seconds
+        self.interval_seconds = interval_seconds
+        self.catch_up_timeout_seconds = catch_up_timeout_seconds
+
+        self.generation = 0
+        self.lsn: str | None = None
+        self.last_refreshed: datetime | None = None
+        self.last_duration_ms: float | None = None
+        self.last_error: str | None = None
+        self.number_of_requests = 0
+        self.number_of_refreshes = 0
+        self.number_of_skipped = 0
+
+        self._pending_since: float | None = None
+        self._pending_task: asyncio.Task | None = None
+        self._periodic_task: asyncio.Task | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._caught_up_generation: int | None = None
+        self._number_of_writes: int | None = None
+        self._listeners: list[RefreshListener] = []
+
+    def add_listener(self, listener: RefreshListener):
+        self._listeners.append(listener)
+
+    def request_refresh(self):
+        self.number_of_requests += 1
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+
+        if not self._pending_task or self._pending_task.done():
+            self._pending_task = asyncio.get_running_loop().create_task(self._debounced_refresh())
+
+    async def _debounced_refresh(self):
+        await asyncio.sleep(self.debounce_seconds)
+        # requests arriving from now on schedule a new refresh
+        self._pending_task = None
+        await self.refresh()
+
+    async def _periodic_refresh(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.refresh(only_if_changed=True)
+
+    async def number_of_writes(self, db: AsyncSession) -> int:
+        return await db.scalar(NUMBER_OF_WRITES_QUERY)
+
+    async def refresh(self, only_if_changed: bool = False):
+        async with self._refresh_lock:
+            number_of_requests = self.number_of_requests
+            start_monotonic = time.monotonic()
+            start = time.perf_counter()
+
+            try:
+                async with SessionLocal() as db:
+                    number_of_writes = await self.number_of_writes(db)
+                    if only_if_changed and self._pending_since is None and number_of_writes == self._number_of_writes:
+                        self.number_of_skipped += 1
+                        return
+
+                    for materialized_view in self.materialized_views:
+                        await db.execute(text(f"refresh materialized view concurrently {materialized_view}"))
+                        await db.commit()
+                    lsn = await db.scalar(text("select pg_current_wal_lsn()::text"))
+            except Exception as error:
+                self.last_error = repr(error)
+                logger.exception("Refreshing the analytics materialized views failed")
+                # nothing was refreshed, the requests stay pending since they were made
+                return
+
+            # the requests made while refreshing are pending since the refresh started, they may not be included
+            self._pending_since = None if self.number_of_requests == number_of_requests else start_monotonic
+            self.generation += 1
+            self.lsn = lsn
+            self._number_of_writes = number_of_writes
+            self.number_of_refreshes += 1
+            self.last_refreshed = datetime.now(tz=timezone.utc)
+            self.last_duration_ms = (time.perf_counter() - start) * 1000
+            self.last_error = None
+
+            try:
+                async with asyncio.timeout(self.catch_up_timeout_seconds):
+                    while not await self.analytics_caught_up():
+                        await asyncio.sleep(0.1)
+            except TimeoutError:
+                logger.warning(f"The analytics database did not replay the refresh {self.lsn} in time")
+            except Exception:
+                logger.exception("Checking the replay of the refresh by the analytics database failed")
+
+            for listener in self._listeners:
+                try:
+                    await listener(self.generation)
+                except Exception:
+                    logger.exception(f"Analytics refresh listener {listener.__qualname__} failed")
+
+    async def analytics_caught_up(self) -> bool:
+        """
+        Whether the analytics database replayed the WAL of the last refresh, always true on the primary,
+        on which pg_last_wal_replay_lsn() is null. Checked until it is true once per generation.
+        """
+        generation, lsn = self.generation, self.lsn
+        if lsn is None or self._caught_up_generation == generation:
+            return True
+
+        async with AnalyticsSessionLocal() as db:
+            caught_up = await db.scalar(
+                text("select coalesce(pg_last_wal_replay_lsn() >= cast(:lsn as pg_lsn), true)"), {"lsn": lsn}
+            )
+        if caught_up:
+            self._caught_up_generation = generation
+        return caught_up
+
+    def start(self):
+        if self.interval_seconds > 0 and not self._periodic_task:
+            self._periodic_task = asyncio.get_running_loop().create_task(self._periodic_refresh())
+
+    async def stop(self):
+        for task in (self._periodic_task, self._pending_task):
+            if task:
+                task.cancel()
+        self._periodic_task = None
+        self._pending_task = None
+
+    def status(self) -> dict:
+        return {
+            "generation": self.generation,
+            "lsn": self.lsn,
+            "last_refreshed": self.last_refreshed,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+            "refresh_pending": self._pending_since is not None,
+            "staleness_seconds": time.monotonic() - self._pending_since if self._pending_since is not None else 0,
+            "number_of_requests": self.number_of_requests,
+            "number_of_refreshes": self.number_of_refreshes,
+            "number_of_skipped": self.number_of_skipped,
+            "materialized_views": self.materialized_views,
+        }
+
+
+analytics_refresher = AnalyticsRefreshScheduler(
+    materialized_views=settings.ANALYTICS_MATERIALIZED_VIEWS,
+    debounce_seconds=settings.ANALYTICS_REFRESH_DEBOUNCE_SECONDS,
+    interval_seconds=settings.ANALYTICS_REFRESH_INTERVAL_SECONDS,
+    catch_up_timeout_seconds=settings.ANALYTICS_REFRESH_CATCH_UP_TIMEOUT_SECONDS,
+)
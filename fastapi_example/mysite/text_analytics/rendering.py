@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+from typing import Callable
+
+import numpy as np
+from matplotlib.figure import Figure
+from PIL import Image
+from wordcloud import WordCloud
+
+from mysite import settings
+
+logger = logging.getLogger(__name__)
+
+WORDCLOUD_MASK_PATH = Path(__file__).parent.parent.parent / "medium_data" / "100_1.png"
+WORDCLOUD_DPI = 100
+WORDCLOUD_DEFAULT_WIDTH = 2000
+WORDCLOUD_DEFAULT_HEIGHT = 500
+
+# loaded once per worker process by the pool initializer
+_wordcloud_mask: np.ndarray | None = None
+
+
+def load_wordcloud_mask():
+    global _wordcloud_mask
+    try:
+        _wordcloud_mask = np.asarray(Image.open(WORDCLOUD_MASK_PATH), dtype="int32")
+    except FileNotFoundError:
+        logger.warning(f"{WORDCLOUD_MASK_PATH} not found, the wordcloud is rendered without a mask")
+
+
+def warm_up_worker() -> int:
+    return os.getpid()
+
+
+def timed_call(function: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def render_wordcloud(
+    words_with_frequencies: dict[str, int],
+    width: int = WORDCLOUD_DEFAULT_WIDTH,
+    height: int = WORDCLOUD_DEFAULT_HEIGHT,
+    image_format: str = "png",
+) -> bytes:
+    """
+    Renders the wordcloud in the given size in pixels and image format, using the object oriented matplotlib API,
+    as the global pyplot state is not safe to share between renders.
+    """
+    wc = WordCloud(
+        background_color="white",
+        mask=_wordcloud_mask,
+        contour_width=3,
+        contour_color="gold",
+        colormap="autumn",
+        collocations=False,
+        stopwords=["ve"],
+    )
+    wc.generate_from_frequencies(words_with_frequencies)
+
+    fig = Figure(figsize=(width / WORDCLOUD_DPI, height / WORDCLOUD_DPI), dpi=WORDCLOUD_DPI)
+    ax = fig.add_subplot()
+    ax.imshow(wc, interpolation="bilinear")
+    ax.axis("off")
+
+    with BytesIO() as buf:
+        fig.savefig(buf, format=image_format)
+        return buf.getvalue()
+
+
+class RenderPoolSaturated(Exception):
+    pass
+
+
+class RenderPool:
+    """
+    Bounded pool of warm worker processes, rendering outside of the event loop.
+
+    At most max_workers renders run at the same time and at most max_queue renders wait for a worker,
+    any render above that is rejected with RenderPoolSaturated. A worker dying abruptly breaks the whole executor,
+    the renders in flight fail and the executor is replaced by a new warm one for the next renders.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self.in_flight = 0
+        self.number_of_renders = 0
+        self.number_of_rejections = 0
+        self.number_of_failures = 0
+        self.number_of_restarts = 0
+        self.total_render_ms = 0.0
+        self.total_wait_ms = 0.0
+        self.max_render_ms = 0.0
+        self.last_render_ms: float | None = None
+
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self):
+        if self._executor:
+            return
+
+        # spawn instead of fork, the workers do not inherit the event loop and its threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_wordcloud_mask,
+        )
+        for _ in range(self.max_workers):
+            self._executor.submit(warm_up_worker)
+
+    def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def restart(self, broken_executor: ProcessPoolExecutor):
+        # the renders failing on the same broken executor restart it once
+        if self._executor is not broken_executor:
+            return
+
+        logger.error("A render worker died, restarting the render pool")
+        self.number_of_restarts += 1
+        self.stop()
+        self.start()
+
+    async def render(self, render_function: Callable[..., bytes], *args: Any) -> bytes:
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.number_of_rejections += 1
+            raise RenderPoolSaturated()
+
+        self.start()
+        executor = self._executor
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            content, render_ms = await asyncio.get_running_loop().run_in_executor(
+                executor, timed_call, render_function, *args
+            )
+        except BrokenProcessPool:
+            self.number_of_failures += 1
+            self.restart(executor)
+            raise
+        except Exception:
+            self.number_of_failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.number_of_renders += 1
+        self.total_render_ms += render_ms
+        self.total_wait_ms += (time.perf_counter() - start) * 1000 - render_ms
+        self.max_render_ms = max(self.max_render_ms, render_ms)
+        self.last_render_ms = render_ms
+
+        return content
+
+    def status(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.max_workers, 0),
+            "number_of_renders": self.number_of_renders,
+            "number_of_rejections": self.number_of_rejections,
+            "number_of_failures": self.number_of_failures,
+            "number_of_restarts": self.number_of_restarts,
+            "average_render_ms": self.total_render_ms / self.number_of_renders if self.number_of_renders else None,
+            "average_wait_ms": self.total_wait_ms / self.number_of_renders if self.number_of_renders else None,
+            "max_render_ms": self.max_render_ms if self.number_of_renders else None,
+            "last_render_ms": self.last_render_ms,
+        }
+
+
+wordcloud_render_pool = RenderPool(
+    max_workers=settings.WORDCLOUD_RENDER_WORKERS, max_queue=settings.WORDCLOUD_RENDER_QUEUE_SIZE
+)
@@ -0,0 +1,50 @@
+from datetime import date
+from typing import Any
+
+from pydantic import UUID4
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class ColumnarOutSchema(BaseModel):
+    number_of_rows: int = Field(..., description="the number of rows")
+    columns: dict[str, list[Any]] = Field(..., description="the values of each column, in row order")
+
+
+class TermScoreSchema(BaseModel):
+    word: str = Field(..., description="the word")
+    score: float = Field(..., description="the TF-IDF score of the word in the article")
+
+
+class ArticleTopTermsOutSchema(BaseModel):
+    article_id: UUID4 = Field(..., description="the article id")
+    article_name: str = Field(..., description="the article name")
+    terms: list[TermScoreSchema] = Field(..., description="the words with the highest TF-IDF scores, best first")
+
+
+class SimilarArticleOutSchema(BaseModel):
+    article_id: UUID4 = Field(..., description="the article id")
+    article_name: str = Field(..., description="the article name")
+    score: float = Field(..., description="the cosine similarity of the TF-IDF vectors, between 0 and 1")
+
+
+class TrendTermSchema(BaseModel):
+    word: str = Field(..., description="the word")
+    number_of_articles: int = Field(..., description="the number of articles of the month using the word")
+    number_of_occurrences: int = Field(..., description="the number of occurrences of the word in the month")
+    share: float = Field(..., description="the part of the occurrences of the month, between 0 and 1")
+
+
+class RisingTermSchema(TrendTermSchema):
+    previous_share: float = Field(..., description="the part of the occurrences of the previous month")
+    share_change: float = Field(..., description="the share minus the previous share")
+
+
+class MonthTrendsOutSchema(BaseModel):
+    month: date = Field(..., description="the first day of the month of first publication, in UTC")
+    number_of_articles: int = Field(..., description="the number of articles published in the month")
+    number_of_occurrences: int = Field(..., description="the number of occurrences of all the words in the month")
+    top_terms: list[TrendTermSchema] = Field(..., description="the most used words of the month, most used first")
+    rising_terms: list[RisingTermSchema] = Field(
+        ..., description="the words whose share rose the most since the previous month, fastest first"
+    )
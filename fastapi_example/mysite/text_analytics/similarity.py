@@ -0,0 +1,250 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from mysite.text_analytics.tfidf import TfidfMatrix
+from mysite.text_analytics.tfidf import segment_offsets
+from mysite.text_analytics.tfidf import top_positions
+
+# the number of scores accumulated at once when computing the neighbours, 32MB of float64
+ACCUMULATOR_SIZE = 4 * 1024 * 1024
+
+
+class NeighbourTable(NamedTuple):
+    """
+    The nearest neighbours of each article by cosine similarity of the TF-IDF vectors,
+    row i holds the rows of the neighbours of article_ids[i], best first and padded with -1.
+    """
+
+    article_ids: pd.Index
+    article_names: np.ndarray
+    fingerprints: np.ndarray
+    neighbour_rows: np.ndarray
+    neighbour_scores: np.ndarray
+    number_of_changes: int
+    full_build: bool
+
+
+class InvertedIndex(NamedTuple):
+    """
+    The unit TF-IDF vectors in CSC layout, the articles containing the word in column j are
+    rows[column_ptr[j]:column_ptr[j + 1]] with the weights weights[column_ptr[j]:column_ptr[j + 1]].
+    """
+
+    column_ptr: np.ndarray
+    rows: np.ndarray
+    weights: np.ndarray
+
+
+def unit_weights(matrix: TfidfMatrix) -> np.ndarray:
+    """
+    The scores of the matrix divided by the norm of their row, the dot product of two rows is their cosine.
+    """
+    lengths = np.diff(matrix.indptr)
+    row_of_entries = np.repeat(np.arange(len(lengths)), lengths)
+    norms = np.sqrt(np.bincount(row_of_entries, weights=matrix.scores.astype(np.float64) ** 2, minlength=len(lengths)))
+    return (matrix.scores / np.maximum(norms, np.finfo(np.float32).tiny)[row_of_entries]).astype(np.float32)
+
+
+def build_inverted_index(matrix: TfidfMatrix, weights: np.ndarray) -> InvertedIndex:
+    lengths = np.diff(matrix.indptr)
+    row_of_entries = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+    order = np.argsort(matrix.indices, kind="stable")
+
+    column_ptr = np.zeros(len(matrix.vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(matrix.indices, minlength=len(matrix.vocabulary)), out=column_ptr[1:])
+
+    return InvertedIndex(column_ptr=column_ptr, rows=row_of_entries[order], weights=weights[order])
+
+
+def nearest_candidates(
+    matrix: TfidfMatrix,
+    weights: np.ndarray,
+    inverted_index: InvertedIndex,
+    rows: np.ndarray,
+    number_of_neighbours: int,
+    max_query_terms: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The number_of_neighbours articles with the highest cosine similarity to each of the rows,
+    as (index in rows, candidate row, score) sorted by index in rows then by descending score.
+
+    Only the max_query_terms words of highest weight of each row are followed in the inverted index,
+    which bounds the work per row, the score of a candidate is the part of the cosine over these words.
+    The scores are accumulated in a dense rows x articles array, the batches of rows are sized to bound it.
+    """
+    number_of_rows = len(matrix.article_ids)
+    positions, query_of_positions = top_positions(matrix.indptr, weights, rows, max_query_terms)
+    columns = matrix.indices[positions]
+
+    posting_starts = inverted_index.column_ptr[columns]
+    posting_lengths = inverted_index.column_ptr[columns + 1] - posting_starts
+    posting_positions = np.repeat(posting_starts, posting_lengths) + segment_offsets(posting_lengths)
+
+    accumulator = np.bincount(
+        np.repeat(query_of_positions * number_of_rows, posting_lengths) + inverted_index.rows[posting_positions],
+        weights=np.repeat(weights[positions], posting_lengths) * inverted_index.weights[posting_positions],
+        minlength=len(rows) * number_of_rows,
+    ).reshape(len(rows), number_of_rows)
+    # an article is not its own neighbour
+    accumulator[np.arange(len(rows)), rows] = 0
+
+    k = min(number_of_neighbours, number_of_rows)
+    candidates = np.argpartition(-accumulator, k - 1, axis=1)[:, :k] if k else np.empty((len(rows), 0), dtype=np.int64)
+    scores = np.take_along_axis(accumulator, candidates, axis=1)
+    queries = np.repeat(np.arange(len(rows)), k)
+    candidates, scores = candidates.ravel(), scores.ravel()
+
+    shared_words = scores > 0
+    queries, candidates, scores = queries[shared_words], candidates[shared_words], scores[shared_words]
+
+    order = np.lexsort((-scores, queries))
+    return queries[order], candidates[order], scores[order].astype(np.float32)
+
+
+def select_neighbours(
+    number_of_rows: int, targets: np.ndarray, candidates: np.ndarray, scores: np.ndarray, number_of_neighbours: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The number_of_neighbours best candidates of each target, from candidates sorted by target then descending score.
+    """
+    neighbour_rows = np.full((number_of_rows, number_of_neighbours), -1, dtype=np.int32)
+    neighbour_scores = np.zeros((number_of_rows, number_of_neighbours), dtype=np.float32)
+
+    ranks = segment_offsets(np.bincount(targets, minlength=number_of_rows))
+    selected = ranks < number_of_neighbours
+    neighbour_rows[targets[selected], ranks[selected]] = candidates[selected]
+    neighbour_scores[targets[selected], ranks[selected]] = scores[selected]
+    return neighbour_rows, neighbour_scores
+
+
+def compute_neighbours(
+    matrix: TfidfMatrix,
+    rows: np.ndarray,
+    number_of_neighbours: int,
+    max_query_terms: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The number_of_neighbours nearest articles of each of the rows as (row, candidate row, score),
+    sorted by row then by descending score, computed by batches of rows to bound the memory.
+    """
+    weights = unit_weights(matrix)
+    inverted_index = build_inverted_index(matrix, weights)
+    batch_size = max(1, ACCUMULATOR_SIZE // max(len(matrix.article_ids), 1))
+
+    batches = []
+    for start in range(0, len(rows), batch_size):
+        batch_rows = rows[start : start + batch_size]
+        queries, candidates, scores = nearest_candidates(
+            matrix, weights, inverted_index, batch_rows, number_of_neighbours, max_query_terms
+        )
+        batches.append((batch_rows[queries], candidates, scores))
+
+    if not batches:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    return tuple(np.concatenate(arrays) for arrays in zip(*batches))
+
+
+def build_neighbour_table(matrix: TfidfMatrix, number_of_neighbours: int, max_query_terms: int) -> NeighbourTable:
+    number_of_rows = len(matrix.article_ids)
+    targets, candidates, scores = compute_neighbours(
+        matrix, np.arange(number_of_rows), number_of_neighbours, max_query_terms
+    )
+    neighbour_rows, neighbour_scores = select_neighbours(
+        number_of_rows, targets, candidates, scores, number_of_neighbours
+    )
+    return NeighbourTable(
+        article_ids=matrix.article_ids,
+        article_names=matrix.article_names,
+        fingerprints=matrix.fingerprints,
+        neighbour_rows=neighbour_rows,
+        neighbour_scores=neighbour_scores,
+        number_of_changes=0,
+        full_build=True,
+    )
+
+
+def update_neighbour_table(
+    previous: NeighbourTable | None,
+    matrix: TfidfMatrix,
+    number_of_neighbours: int,
+    max_query_terms: int,
+    rebuild_ratio: float,
+) -> NeighbourTable:
+    """
+    Updates the neighbours of the previous table with the articles created, changed or deleted since,
+    only the neighbours of these articles, and of the articles which listed a changed or deleted one,
+    are computed again and they are merged into the neighbours of the others.
+
+    The scores of the other articles keep the IDF of the build they were computed with,
+    the table is built from scratch once the changes since the last full build exceed rebuild_ratio.
+    """
+    number_of_rows = len(matrix.article_ids)
+    if previous is None or previous.neighbour_rows.shape[1] != number_of_neighbours:
+        return build_neighbour_table(matrix, number_of_neighbours, max_query_terms)
+
+    previous_rows = previous.article_ids.get_indexer(matrix.article_ids)
+    changed = previous_rows < 0
+    changed[~changed] = previous.fingerprints[previous_rows[~changed]] != matrix.fingerprints[~changed]
+    number_of_deleted = len(previous.article_ids) - int((previous_rows >= 0).sum())
+    number_of_changes = previous.number_of_changes + int(changed.sum()) + number_of_deleted
+
+    if number_of_changes > rebuild_ratio * max(number_of_rows, 1):
+        return build_neighbour_table(matrix, number_of_neighbours, max_query_terms)
+    if number_of_changes == previous.number_of_changes and previous.article_ids.equals(matrix.article_ids):
+        return previous._replace(article_names=matrix.article_names, full_build=False)
+
+    # new row of each previous row, -1 for the deleted and the changed articles, whose neighbours are computed again
+    new_rows = matrix.article_ids.get_indexer(previous.article_ids)
+    new_rows[new_rows >= 0] = np.where(changed[new_rows[new_rows >= 0]], -1, new_rows[new_rows >= 0])
+
+    kept_previous_rows = np.flatnonzero(new_rows >= 0)
+    previous_neighbours = previous.neighbour_rows[kept_previous_rows]
+    kept_neighbours = np.where(previous_neighbours >= 0, new_rows[previous_neighbours], -1)
+
+    # the articles which listed a deleted or changed article are computed again, rather than listing fewer neighbours
+    lost_neighbours = ((previous_neighbours >= 0) & (kept_neighbours < 0)).any(axis=1)
+    recomputed = changed.copy()
+    recomputed[new_rows[kept_previous_rows[lost_neighbours]]] = True
+    kept_previous_rows = kept_previous_rows[~lost_neighbours]
+    kept_neighbours = kept_neighbours[~lost_neighbours]
+    kept_valid = kept_neighbours >= 0
+
+    changed_targets, changed_candidates, changed_scores = compute_neighbours(
+        matrix, np.flatnonzero(recomputed), number_of_neighbours, max_query_terms
+    )
+    # a recomputed article is also a candidate neighbour of the articles it is similar to
+    unchanged_candidates = ~recomputed[changed_candidates]
+
+    targets = np.concatenate(
+        [
+            np.repeat(new_rows[kept_previous_rows], number_of_neighbours)[kept_valid.ravel()],
+            changed_targets,
+            changed_candidates[unchanged_candidates],
+        ]
+    )
+    candidates = np.concatenate(
+        [kept_neighbours[kept_valid], changed_candidates, changed_targets[unchanged_candidates]]
+    )
+    scores = np.concatenate(
+        [
+            previous.neighbour_scores[kept_previous_rows][kept_valid],
+            changed_scores,
+            changed_scores[unchanged_candidates],
+        ]
+    )
+
+    order = np.lexsort((-scores, targets))
+    neighbour_rows, neighbour_scores = select_neighbours(
+        number_of_rows, targets[order], candidates[order], scores[order], number_of_neighbours
+    )
+    return NeighbourTable(
+        article_ids=matrix.article_ids,
+        article_names=matrix.article_names,
+        fingerprints=matrix.fingerprints,
+        neighbour_rows=neighbour_rows,
+        neighbour_scores=neighbour_scores,
+        number_of_changes=number_of_changes,
+        full_build=False,
+    )
@@ -1,14 +1,56 @@
+import asyncio
+import csv
+import io
+import os
 import random
 import string
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from datetime import timezone
 
+import numpy as np
+import pandas as pd
 import pytest
+from fastapi import APIRouter
+from fastapi import FastAPI
 from httpx import ASGITransport
 from httpx import AsyncClient
 from pydantic import UUID4
+from sqlalchemy import delete
+from sqlalchemy import func
 from sqlalchemy import select
+from starlette.responses import StreamingResponse
 
+from mysite.articles.constants import ArticleStatus
+from mysite.articles.models import Article
+from mysite.database import PREPARED_STATEMENTS_INFO_KEY
 from mysite.database import SessionLocal
+from mysite.database import _compiled_statements
+from mysite.database import query_metrics
+from mysite.database import query_to_df
 from mysite.main import app
+from mysite.text_analytics import api
+from mysite.text_analytics.constants import AnalyticsQueryEnum
+from mysite.text_analytics.duckdb_engine import POSTGRES_QUERIES
+from mysite.text_analytics.duckdb_engine import DuckdbEngine
+from mysite.text_analytics.duckdb_engine import Snapshot
+from mysite.text_analytics.models import ArticleTermOccurrence
+from mysite.text_analytics.models import CorpusTermOccurrence
+from mysite.text_analytics.models import MonthTermOccurrence
+from mysite.text_analytics.models import WriterTermOccurrence
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.rendering import RenderPool
+from mysite.text_analytics.rendering import RenderPoolSaturated
+from mysite.text_analytics.similarity import update_neighbour_table
+from mysite.text_analytics.tfidf import build_tfidf_matrix
+from mysite.text_analytics.tfidf import changed_article_ids
+from mysite.text_analytics.tfidf_engine import tfidf_engine
+from mysite.utils.admission import AdmissionLimiter
+from mysite.utils.response_cache import ResponseCache
+from mysite.utils.response_cache import cached_route_class
+from mysite.utils.single_flight import SingleFlight
 from mysite.writers.models import Writer
 
 
@@ -49,6 +91,21 @@ class TestTextAnalytics:
 
         return writer_obj.writer_id
 
+    async def create_article_id(
+        self, writer_id: UUID4, article_content: str, article_status: ArticleStatus = ArticleStatus.published
+    ) -> str:
+        async with SessionLocal() as db:
+            article_obj = Article(
+                article_name="Similar article",
+                article_content=article_content,
+                writer_id=writer_id,
+                article_status=article_status.value,
+            )
+            db.add(article_obj)
+            await db.commit()
+            await db.refresh(article_obj)
+            return str(article_obj.article_id)
+
     async def test_get_writer_content_length(self):
         writer_id = await self.writer_1_id()
         async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
@@ -74,3 +131,587 @@ class TestTextAnalytics:
             )
 
         assert response.status_code == 404
+
+    async def test_get_wordcloud_unknown_format(self):
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(
+                "/api/v1/fastapi/text-analytics/wordcloud", params={"image_format": "gif", "width": 400}
+            )
+
+        assert response.status_code == 422
+
+    async def test_render_pool_saturated(self):
+        render_pool = RenderPool(max_workers=1, max_queue=0)
+        try:
+            render = asyncio.create_task(render_pool.render(time.sleep, 0.5))
+            await asyncio.sleep(0)
+            with pytest.raises(RenderPoolSaturated):
+                await render_pool.render(str, 1)
+            await render
+        finally:
+            render_pool.stop()
+
+        assert render_pool.status()["number_of_rejections"] == 1
+        assert render_pool.status()["in_flight"] == 0
+
+    async def test_render_pool_restarted_after_worker_died(self):
+        render_pool = RenderPool(max_workers=1, max_queue=0)
+        try:
+            with pytest.raises(BrokenProcessPool):
+                await render_pool.render(os._exit, 1)
+            content = await render_pool.render(str, 1)
+        finally:
+            render_pool.stop()
+
+        assert content == "1"
+        assert render_pool.status()["number_of_restarts"] == 1
+        assert render_pool.status()["number_of_failures"] == 1
+
+    async def test_term_occurrence_maintained_on_article_write(self):
+        writer_id = await self.writer_1_id()
+        word = "".join(random.choice(string.ascii_lowercase) for i in range(20))
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.post(
+                "/api/v1/fastapi/articles",
+                json={"article_name": "Term article", "article_content": f"{word} analytics {word}"},
+                headers={"Authorization": f"Bearer {str(writer_id)}"},
+            )
+        assert response.status_code == 200
+        article_id = response.json()["article_id"]
+
+        async with SessionLocal() as db:
+            article_terms = dict(
+                (
+                    await db.execute(
+                        select(ArticleTermOccurrence.word, ArticleTermOccurrence.number_of_occurrences).where(
+                            ArticleTermOccurrence.article_id == article_id
+                        )
+                    )
+                ).all()
+            )
+            assert article_terms == {word: 2, "analytics": 1}
+
+            term_ranks = dict(
+                (
+                    await db.execute(
+                        select(ArticleTermOccurrence.word, ArticleTermOccurrence.term_rank).where(
+                            ArticleTermOccurrence.article_id == article_id
+                        )
+                    )
+                ).all()
+            )
+            assert term_ranks == {word: 1, "analytics": 2}
+
+            corpus_term = await db.scalar(select(CorpusTermOccurrence).where(CorpusTermOccurrence.word == word))
+            assert corpus_term.number_of_articles == 1
+            assert corpus_term.number_of_occurrences == 2
+
+            writer_term = await db.scalar(
+                select(WriterTermOccurrence).where(
+                    WriterTermOccurrence.writer_id == writer_id, WriterTermOccurrence.word == word
+                )
+            )
+            assert writer_term.number_of_articles == 1
+            assert writer_term.number_of_occurrences == 2
+
+            article_obj = await db.scalar(select(Article).where(Article.article_id == article_id))
+            article_obj.article_content = word
+            await db.commit()
+
+            corpus_term = await db.scalar(select(CorpusTermOccurrence).where(CorpusTermOccurrence.word == word))
+            assert corpus_term.number_of_occurrences == 1
+
+            await db.execute(delete(Article).where(Article.article_id == article_id))
+            await db.commit()
+
+            assert not await db.scalar(
+                select(ArticleTermOccurrence.word).where(ArticleTermOccurrence.article_id == article_id)
+            )
+            assert not await db.scalar(select(CorpusTermOccurrence.word).where(CorpusTermOccurrence.word == word))
+            assert not await db.scalar(select(WriterTermOccurrence.word).where(WriterTermOccurrence.word == word))
+
+    async def test_term_occurrence_maintained_on_article_without_writer(self):
+        word = "".join(random.choice(string.ascii_lowercase) for i in range(20))
+
+        async with SessionLocal() as db:
+            article_obj = Article(article_name="No writer article", article_content=f"{word} {word}")
+            db.add(article_obj)
+            await db.commit()
+            await db.refresh(article_obj)
+
+            corpus_term = await db.scalar(select(CorpusTermOccurrence).where(CorpusTermOccurrence.word == word))
+            assert corpus_term.number_of_occurrences == 2
+            assert not await db.scalar(select(WriterTermOccurrence.word).where(WriterTermOccurrence.word == word))
+
+            article_obj.article_content = word
+            await db.commit()
+
+            await db.execute(select(func.rebuild_term_occurrence()))
+            await db.commit()
+
+            corpus_term = await db.scalar(select(CorpusTermOccurrence).where(CorpusTermOccurrence.word == word))
+            assert corpus_term.number_of_occurrences == 1
+            assert not await db.scalar(select(WriterTermOccurrence.word).where(WriterTermOccurrence.word == word))
+
+            await db.execute(delete(Article).where(Article.article_id == article_obj.article_id))
+            await db.commit()
+
+            assert not await db.scalar(select(CorpusTermOccurrence.word).where(CorpusTermOccurrence.word == word))
+
+    async def test_get_writer_content_length_not_modified(self):
+        writer_id = await self.writer_1_id()
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(f"/api/v1/fastapi/text-analytics/writer-content-length/{writer_id}")
+            assert response.status_code == 200
+            etag = response.headers["etag"]
+
+            response = await client.get(
+                f"/api/v1/fastapi/text-analytics/writer-content-length/{writer_id}", headers={"If-None-Match": etag}
+            )
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    async def test_concurrent_requests_coalesced(self):
+        writer_id = await self.writer_1_id()
+        url = f"/api/v1/fastapi/text-analytics/data/writer-content-length/{writer_id}"
+        api.analytics_response_cache.clear()
+        number_of_executions = api.analytics_single_flight.number_of_executions
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            responses = await asyncio.gather(*[client.get(url) for _ in range(5)])
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert len({response.content for response in responses}) == 1
+        assert api.analytics_single_flight.number_of_executions == number_of_executions + 1
+
+    async def test_responses_read_from_lagging_replica_not_cached(self, monkeypatch):
+        writer_id = await self.writer_1_id()
+        url = f"/api/v1/fastapi/text-analytics/data/writer-content-length/{writer_id}"
+        await analytics_refresher.refresh()
+        assert analytics_refresher.lsn
+        assert await analytics_refresher.analytics_caught_up()
+
+        async def analytics_caught_up():
+            return False
+
+        monkeypatch.setattr(analytics_refresher, "analytics_caught_up", analytics_caught_up)
+        bypasses = api.analytics_response_cache.bypasses
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            for _ in range(2):
+                response = await client.get(url)
+                assert response.status_code == 200
+                assert "etag" not in response.headers
+
+        assert api.analytics_response_cache.bypasses == bypasses + 2
+        assert api.analytics_response_cache.status()["number_of_entries"] == 0
+
+    async def test_concurrent_wordcloud_requests_coalesced(self):
+        await self.writer_1_id()
+        await analytics_refresher.refresh()
+        api.analytics_response_cache.clear()
+        number_of_executions = api.analytics_single_flight.number_of_executions
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            responses = await asyncio.gather(
+                *[client.get("/api/v1/fastapi/text-analytics/wordcloud", params={"width": 320}) for _ in range(5)]
+            )
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert len({response.content for response in responses}) == 1
+        assert responses[0].headers["content-type"] == "image/png"
+        assert api.analytics_single_flight.number_of_executions == number_of_executions + 1
+
+    async def test_single_flight_leader_cancelled(self):
+        single_flight = SingleFlight()
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def function():
+            started.set()
+            await finish.wait()
+            return "result"
+
+        leader = asyncio.create_task(single_flight.run("key", function))
+        await started.wait()
+        waiter = asyncio.create_task(single_flight.run("key", function))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        finish.set()
+
+        assert await waiter == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        status = single_flight.status()
+        assert status["number_of_executions"] == 1
+        assert status["number_of_coalesced"] == 1
+        assert status["number_of_cancelled"] == 0
+
+    async def test_single_flight_all_waiters_disconnected(self):
+        single_flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def function():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "result"
+
+        waiters = [asyncio.create_task(single_flight.run("key", function)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+
+        async with asyncio.timeout(1):
+            await cancelled.wait()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert single_flight.status()["number_of_cancelled"] == 1
+        assert single_flight.status()["number_of_in_flight"] == 0
+
+        # the next call executes again rather than waiting on the cancelled execution
+        assert await asyncio.wait_for(single_flight.run("key", lambda: asyncio.sleep(0, "again")), 1) == "again"
+        assert single_flight.status()["number_of_executions"] == 2
+
+    async def test_streamed_response_sent_once_counts_executions(self):
+        single_flight = SingleFlight()
+        router = APIRouter(
+            route_class=cached_route_class(ResponseCache(max_bytes=1024), lambda: 0, single_flight=single_flight)
+        )
+
+        @router.get("/stream")
+        async def get_stream():
+            await asyncio.sleep(0.1)
+            return StreamingResponse(iter([b"chunk"]))
+
+        stream_app = FastAPI()
+        stream_app.include_router(router)
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=stream_app)) as client:
+            responses = await asyncio.gather(*[client.get("/stream") for _ in range(3)])
+
+        assert [response.content for response in responses] == [b"chunk"] * 3
+        status = single_flight.status()
+        assert status["number_of_executions"] == 3
+        assert status["number_of_fallbacks"] == 2
+        assert status["number_of_coalesced"] == 0
+
+    async def test_get_writer_content_length_data(self):
+        writer_id = await self.writer_1_id()
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(f"/api/v1/fastapi/text-analytics/data/writer-content-length/{writer_id}")
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data["number_of_rows"] >= 2
+        assert list(response_data["columns"].keys()) == [
+            "article_name",
+            "word_count",
+            "character_count",
+            "reading_time_minutes",
+        ]
+        assert len(response_data["columns"]["article_name"]) == response_data["number_of_rows"]
+
+    async def test_get_plotly_js(self):
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(app.url_path_for("get_plotly_js"))
+
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+
+    async def test_analytics_admission_saturated(self, monkeypatch):
+        limiter = AdmissionLimiter(max_running=1, max_queued=0, queue_timeout_seconds=0.1, retry_after_seconds=3)
+        monkeypatch.setattr(api, "analytics_admission_limiter", limiter)
+        url = "/api/v1/fastapi/text-analytics/data/order-by-postgres"
+        api.analytics_response_cache.clear()
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            async with limiter.admit():
+                response = await client.get(url)
+                assert response.status_code == 429
+                assert response.headers["retry-after"] == "3"
+
+                limiter.max_queued = 1
+                response = await client.get(url)
+                assert response.status_code == 503
+
+                # served whatever the load
+                response = await client.get(app.url_path_for("get_plotly_js"))
+                assert response.status_code == 200
+
+            response = await client.get(url)
+
+        assert response.status_code == 200
+        assert limiter.status()["running"] == 0
+
+    async def test_export_holds_admission_permit_while_streaming(self, monkeypatch):
+        limiter = AdmissionLimiter(max_running=1, max_queued=0, queue_timeout_seconds=0.1, retry_after_seconds=3)
+        monkeypatch.setattr(api, "analytics_admission_limiter", limiter)
+        running_while_streaming = []
+
+        async def export_chunks(*args):
+            for _ in range(2):
+                running_while_streaming.append(limiter.running)
+                yield b"chunk"
+
+        monkeypatch.setattr(api, "export_chunks", export_chunks)
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get("/api/v1/fastapi/text-analytics/export/articles")
+            assert response.status_code == 200
+            assert response.content == b"chunkchunk"
+
+            async with limiter.admit():
+                response = await client.get("/api/v1/fastapi/text-analytics/export/articles")
+                assert response.status_code == 429
+
+        assert running_while_streaming == [1, 1]
+        assert limiter.status()["running"] == 0
+
+    async def test_get_writer_top_terms(self):
+        writer_id = await self.writer_1_id()
+        await self.create_article_id(writer_id, "top terms analytics")
+        await tfidf_engine.refresh(generation=0)
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(
+                f"/api/v1/fastapi/text-analytics/writers/{writer_id}/top-terms", params={"k": 3}
+            )
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data
+        for article_top_terms in response_data:
+            scores = [term["score"] for term in article_top_terms["terms"]]
+            assert len(scores) <= 3
+            assert scores == sorted(scores, reverse=True)
+
+    async def test_get_article_top_terms_not_found(self):
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(
+                "/api/v1/fastapi/text-analytics/articles/00000000-0000-4000-8000-000000000000/top-terms"
+            )
+
+        assert response.status_code == 404
+
+    async def test_get_similar_articles(self):
+        writer_id = await self.writer_1_id()
+        word = "".join(random.choice(string.ascii_lowercase) for i in range(20))
+        article_ids = [
+            await self.create_article_id(writer_id, article_content)
+            for article_content in [f"{word} similar analytics", f"{word} similar analytics {word}"]
+        ]
+        await tfidf_engine.refresh(generation=0)
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(f"/api/v1/fastapi/text-analytics/articles/{article_ids[0]}/similar")
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data[0]["article_id"] == article_ids[1]
+        assert 0 < response_data[0]["score"] <= 1
+
+    async def test_draft_articles_not_in_tfidf(self):
+        writer_id = await self.writer_1_id()
+        word = "".join(random.choice(string.ascii_lowercase) for i in range(20))
+        article_id = await self.create_article_id(writer_id, f"{word} draft analytics")
+        draft_article_id = await self.create_article_id(
+            writer_id, f"{word} draft analytics {word}", article_status=ArticleStatus.draft
+        )
+        await tfidf_engine.refresh(generation=0)
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            similar_response = await client.get(f"/api/v1/fastapi/text-analytics/articles/{article_id}/similar")
+            draft_similar_response = await client.get(
+                f"/api/v1/fastapi/text-analytics/articles/{draft_article_id}/similar"
+            )
+            draft_top_terms_response = await client.get(
+                f"/api/v1/fastapi/text-analytics/articles/{draft_article_id}/top-terms"
+            )
+
+        assert similar_response.status_code == 200
+        assert draft_article_id not in [article["article_id"] for article in similar_response.json()]
+        assert draft_similar_response.status_code == 404
+        assert draft_top_terms_response.status_code == 404
+
+    async def test_tfidf_matrix_updated_with_changed_articles(self):
+        article_ids = [uuid.uuid4() for _ in range(40)]
+        articles_df = pd.DataFrame(
+            {
+                "article_id": article_ids,
+                "article_name": "Similar article",
+                "writer_id": article_ids[0],
+                "version": np.arange(len(article_ids)),
+            }
+        )
+        occurrences_df = pd.DataFrame(
+            [
+                (article_id, word, 1)
+                for i, article_id in enumerate(article_ids)
+                for word in ("shared", f"group{i % 4}", f"unique{i}")
+            ],
+            columns=["article_id", "word", "number_of_occurrences"],
+        )
+        matrix = build_tfidf_matrix(articles_df, occurrences_df)
+        neighbour_table = update_neighbour_table(None, matrix, 3, 10, 0.5)
+
+        # the first article is deleted and the second one changed
+        articles_df = articles_df.iloc[1:].reset_index(drop=True).copy()
+        articles_df.loc[0, "version"] = 100
+        changed_occurrences_df = pd.DataFrame(
+            [(article_ids[1], "changed", 2)], columns=["article_id", "word", "number_of_occurrences"]
+        )
+        assert changed_article_ids(matrix, articles_df).tolist() == [article_ids[1]]
+
+        updated_matrix = build_tfidf_matrix(articles_df, changed_occurrences_df, matrix)
+        full_matrix = build_tfidf_matrix(
+            articles_df,
+            pd.concat([occurrences_df[~occurrences_df["article_id"].isin(article_ids[:2])], changed_occurrences_df]),
+        )
+        assert updated_matrix.vocabulary.equals(full_matrix.vocabulary)
+        assert np.array_equal(updated_matrix.indices, full_matrix.indices)
+        assert np.allclose(updated_matrix.scores, full_matrix.scores)
+
+        # the articles which listed the deleted or changed article are refilled
+        updated_neighbour_table = update_neighbour_table(neighbour_table, updated_matrix, 3, 10, 0.5)
+        assert not updated_neighbour_table.full_build
+        assert (updated_neighbour_table.neighbour_rows[1:] >= 0).all()
+
+    async def test_get_term_trends(self):
+        writer_id = await self.writer_1_id()
+        word = "".join(random.choice(string.ascii_lowercase) for i in range(20))
+
+        async with SessionLocal() as db:
+            article_objs = [
+                Article(
+                    article_name="Trend article",
+                    article_content=article_content,
+                    writer_id=writer_id,
+                    article_status=ArticleStatus.published.value,
+                    date_first_published=date_first_published,
+                )
+                for article_content, date_first_published in [
+                    ("analytics trends", datetime(2001, 1, 10, tzinfo=timezone.utc)),
+                    (f"{word} analytics {word}", datetime(2001, 2, 10, tzinfo=timezone.utc)),
+                ]
+            ]
+            db.add_all(article_objs)
+            await db.commit()
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(
+                "/api/v1/fastapi/text-analytics/trends",
+                params={"end_month": "2001-02-15", "months": 2, "k": 5, "min_articles": 1},
+            )
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert [month["month"] for month in response_data] == ["2001-02-01", "2001-01-01"]
+        assert response_data[0]["top_terms"][0]["word"] == word
+        assert word in [term["word"] for term in response_data[0]["rising_terms"]]
+
+        async with SessionLocal() as db:
+            await db.execute(delete(Article).where(Article.article_id.in_([obj.article_id for obj in article_objs])))
+            await db.commit()
+
+            assert not await db.scalar(select(MonthTermOccurrence.word).where(MonthTermOccurrence.word == word))
+
+    async def test_query_to_df_reuses_compiled_and_prepared_statements(self):
+        writer_id = await self.writer_1_id()
+        other_writer_id = uuid.uuid4()
+
+        async with SessionLocal() as db:
+            connection = await db.connection()
+            df = await query_to_df(db, select(Article.article_id).where(Article.writer_id == writer_id))
+            number_of_prepared_statements = len(connection.info[PREPARED_STATEMENTS_INFO_KEY])
+            number_of_compiled_statements = len(_compiled_statements)
+            cache_counts = dict(query_metrics.cache_counts)
+
+            other_df = await query_to_df(db, select(Article.article_id).where(Article.writer_id == other_writer_id))
+            assert len(connection.info[PREPARED_STATEMENTS_INFO_KEY]) == number_of_prepared_statements
+            assert len(_compiled_statements) == number_of_compiled_statements
+            assert query_metrics.cache_counts["compiled_cache_hits"] == cache_counts["compiled_cache_hits"] + 1
+            assert (
+                query_metrics.cache_counts["prepared_statement_cache_hits"]
+                == cache_counts["prepared_statement_cache_hits"] + 1
+            )
+
+        assert len(df) >= 1
+        assert other_df.empty
+
+    async def test_duckdb_engine_matches_postgres(self, tmp_path):
+        pytest.importorskip("duckdb")
+        writer_id = await self.writer_1_id()
+
+        duckdb_engine = DuckdbEngine(
+            directory=tmp_path, queries=[query.value for query in AnalyticsQueryEnum], threads=1, chunk_size=1000
+        )
+        async with SessionLocal() as db:
+            duckdb_engine.snapshot = await duckdb_engine.export(db, generation=0)
+
+            postgres_df = await POSTGRES_QUERIES[AnalyticsQueryEnum.writer_content_length](db, writer_id)
+            duckdb_df = await duckdb_engine.run(AnalyticsQueryEnum.writer_content_length, writer_id)
+            assert sorted(duckdb_df["word_count"].tolist()) == sorted(postgres_df["word_count"].tolist())
+
+            postgres_words = await POSTGRES_QUERIES[AnalyticsQueryEnum.wordcloud](db)
+            assert await duckdb_engine.run(AnalyticsQueryEnum.wordcloud) == postgres_words
+
+        duckdb_engine.stop()
+        assert not list(tmp_path.iterdir())
+
+    async def test_duckdb_snapshot_closed_after_its_last_query(self, tmp_path):
+        duckdb = pytest.importorskip("duckdb")
+        duckdb_engine = DuckdbEngine(directory=tmp_path, queries=[], threads=1, chunk_size=1000)
+        snapshot = Snapshot(
+            generation=0,
+            directory=tmp_path / "0",
+            connection=duckdb.connect(config={"threads": 1}),
+            number_of_rows={},
+            size_bytes=0,
+            export_ms=0.0,
+        )
+        snapshot.directory.mkdir()
+        duckdb_engine.snapshot = snapshot
+
+        query = asyncio.create_task(duckdb_engine.query_df(snapshot, "select count(*) as n from range(1000000000)"))
+        await asyncio.sleep(0)
+        duckdb_engine.stop()
+        assert snapshot.directory.exists()
+
+        assert (await query)["n"].tolist() == [1000000000]
+        assert not snapshot.directory.exists()
+
+    async def test_export_articles_csv(self):
+        writer_id = await self.writer_1_id()
+        async with SessionLocal() as db:
+            article_obj = Article(
+                article_name="Export article",
+                article_content="export analytics export",
+                writer_id=writer_id,
+                article_status=ArticleStatus.published.value,
+                date_first_published=datetime(2002, 3, 4, tzinfo=timezone.utc),
+            )
+            db.add(article_obj)
+            await db.commit()
+
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get(
+                "/api/v1/fastapi/text-analytics/export/articles",
+                params={"writer_id": str(writer_id), "published_from": "2002-03-01", "published_to": "2002-04-01"},
+            )
+            invalid_filter_response = await client.get(
+                "/api/v1/fastapi/text-analytics/export/corpus-term-occurrences", params={"writer_id": str(writer_id)}
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["article_id"] for row in rows] == [str(article_obj.article_id)]
+        assert rows[0]["word_count"] == "3"
+        assert invalid_filter_response.status_code == 422
+
+        async with SessionLocal() as db:
+            await db.execute(delete(Article).where(Article.article_id == article_obj.article_id))
+            await db.commit()
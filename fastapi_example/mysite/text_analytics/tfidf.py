@@ -0,0 +1,166 @@
+from typing import NamedTuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+class TfidfMatrix(NamedTuple):
+    """
+    Sparse document-term matrix of the TF-IDF scores in CSR layout, the terms of the article in row i are
+    vocabulary[indices[indptr[i]:indptr[i + 1]]] with the scores scores[indptr[i]:indptr[i + 1]].
+
+    The fingerprint of an article only depends on its words and their number of occurrences,
+    it tells the articles which changed between two builds. The version of an article is the transaction id of its
+    last write, the terms of the articles whose version did not change are kept from one build to the next.
+    """
+
+    article_ids: pd.Index
+    article_names: np.ndarray
+    versions: np.ndarray
+    writer_rows: dict[UUID, np.ndarray]
+    vocabulary: pd.Index
+    idf: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    counts: np.ndarray
+    scores: np.ndarray
+    fingerprints: np.ndarray
+
+
+def segment_offsets(lengths: np.ndarray) -> np.ndarray:
+    """
+    The offset of each element within its segment, for consecutive segments of the given lengths.
+    """
+    return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def top_positions(indptr: np.ndarray, values: np.ndarray, rows: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The positions of the k highest values of each of the rows of a CSR matrix, best first,
+    with the index in rows of the row of each position, selected for all the rows at once.
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+
+    row_of_entries = np.repeat(np.arange(len(rows)), lengths)
+    offsets = segment_offsets(lengths)
+    positions = np.repeat(starts, lengths) + offsets
+
+    # sorted by row then by descending value, the rows keep their segment, the offset is the rank in the row
+    order = np.lexsort((-values[positions], row_of_entries))
+    selected = offsets < k
+    return positions[order][selected], row_of_entries[order][selected]
+
+
+def kept_article_rows(previous: TfidfMatrix | None, articles_df: DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The rows of the articles whose version did not change since the previous matrix, with their previous rows.
+    """
+    if previous is None:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    previous_rows = previous.article_ids.get_indexer(articles_df["article_id"])
+    known = np.flatnonzero(previous_rows >= 0)
+    kept = known[previous.versions[previous_rows[known]] == articles_df["version"].to_numpy()[known]]
+    return kept, previous_rows[kept]
+
+
+def changed_article_ids(previous: TfidfMatrix | None, articles_df: DataFrame) -> pd.Index:
+    """
+    The articles created or changed since the previous matrix, whose term occurrences are read again.
+    """
+    kept, _ = kept_article_rows(previous, articles_df)
+    changed = np.ones(len(articles_df), dtype=bool)
+    changed[kept] = False
+    return pd.Index(articles_df["article_id"].to_numpy()[changed])
+
+
+def build_tfidf_matrix(
+    articles_df: DataFrame, occurrences_df: DataFrame, previous: TfidfMatrix | None = None
+) -> TfidfMatrix:
+    """
+    TF is the number of occurrences of the word divided by the number of distinct words of the article,
+    IDF is log(number of articles / number of articles containing the word).
+
+    With a previous matrix, the occurrences of the articles whose version did not change are taken from it,
+    occurrences_df only needs the occurrences of the other articles. The scores are all computed again,
+    as the IDF of every word depends on all the articles.
+    """
+    article_ids = pd.Index(articles_df["article_id"])
+    number_of_articles = len(article_ids)
+    kept_rows, previous_kept_rows = kept_article_rows(previous, articles_df)
+    kept = np.zeros(number_of_articles, dtype=bool)
+    kept[kept_rows] = True
+
+    words = pd.Categorical(occurrences_df["word"])
+    vocabulary = pd.Index(words.categories) if previous is None else previous.vocabulary.union(words.categories)
+    rows = article_ids.get_indexer(occurrences_df["article_id"])
+    # occurrences of articles created after the articles were read, or kept from the previous matrix
+    known = rows >= 0
+    known[known] = ~kept[rows[known]]
+    rows = rows[known]
+    columns = vocabulary.get_indexer(words.categories).astype(np.int32)[words.codes[known]]
+    counts = occurrences_df["number_of_occurrences"].to_numpy()[known].astype(np.int32)
+
+    if len(kept_rows):
+        starts = previous.indptr[previous_kept_rows]
+        lengths = previous.indptr[previous_kept_rows + 1] - starts
+        positions = np.repeat(starts, lengths) + segment_offsets(lengths)
+        previous_columns = vocabulary.get_indexer(previous.vocabulary).astype(np.int32)
+        rows = np.concatenate([rows, np.repeat(kept_rows, lengths)])
+        columns = np.concatenate([columns, previous_columns[previous.indices[positions]]])
+        counts = np.concatenate([counts, previous.counts[positions]])
+
+    order = np.lexsort((columns, rows))
+    rows, columns, counts = rows[order], columns[order], counts[order]
+
+    # the words no longer in any article are dropped from the vocabulary
+    document_frequencies = np.bincount(columns, minlength=len(vocabulary))
+    used = document_frequencies > 0
+    columns = (np.cumsum(used, dtype=np.int32) - 1)[columns]
+    vocabulary = vocabulary[used]
+    document_frequencies = document_frequencies[used]
+
+    article_lengths = np.bincount(rows, minlength=number_of_articles)
+    indptr = np.zeros(number_of_articles + 1, dtype=np.int64)
+    np.cumsum(article_lengths, out=indptr[1:])
+
+    idf = np.log(number_of_articles / np.maximum(document_frequencies, 1))
+    scores = (counts / article_lengths[rows] * idf[columns]).astype(np.float32)
+
+    # hashes of the words, unlike their codes, do not depend on the vocabulary of the build
+    entry_hashes = pd.util.hash_array(vocabulary.to_numpy())[columns] ^ (
+        counts.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    )
+    cumulative_hashes = np.zeros(len(entry_hashes) + 1, dtype=np.uint64)
+    np.cumsum(entry_hashes, out=cumulative_hashes[1:])
+
+    return TfidfMatrix(
+        article_ids=article_ids,
+        article_names=articles_df["article_name"].to_numpy(),
+        versions=articles_df["version"].to_numpy(),
+        writer_rows=pd.Series(np.arange(number_of_articles)).groupby(articles_df["writer_id"].to_numpy()).indices,
+        vocabulary=vocabulary,
+        idf=idf,
+        indptr=indptr,
+        indices=columns,
+        counts=counts,
+        scores=scores,
+        fingerprints=cumulative_hashes[indptr[1:]] - cumulative_hashes[indptr[:-1]],
+    )
+
+
+def top_terms(matrix: TfidfMatrix, rows: np.ndarray, k: int) -> list[list[tuple[str, float]]]:
+    """
+    The k terms with the highest scores of each of the rows.
+    """
+    selected, _ = top_positions(matrix.indptr, matrix.scores, rows, k)
+
+    words = matrix.vocabulary[matrix.indices[selected]].tolist()
+    scores = matrix.scores[selected].tolist()
+    lengths = matrix.indptr[rows + 1] - matrix.indptr[rows]
+    boundaries = np.cumsum(np.minimum(lengths, k)).tolist()
+
+    return [list(zip(words[start:end], scores[start:end])) for start, end in zip([0] + boundaries[:-1], boundaries)]
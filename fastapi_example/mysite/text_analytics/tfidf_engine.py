@@ -0,0 +1,181 @@
+import asyncio
+import time
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import any_
+from sqlalchemy import bindparam
+from sqlalchemy import literal_column
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as UUID_TYPE
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mysite import settings
+from mysite.articles.constants import ArticleStatus
+from mysite.articles.models import Article
+from mysite.database import AnalyticsSessionLocal
+from mysite.database import query_to_df
+from mysite.text_analytics.models import ArticleTermOccurrence
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.similarity import NeighbourTable
+from mysite.text_analytics.similarity import update_neighbour_table
+from mysite.text_analytics.tfidf import TfidfMatrix
+from mysite.text_analytics.tfidf import build_tfidf_matrix
+from mysite.text_analytics.tfidf import changed_article_ids
+from mysite.text_analytics.tfidf import top_terms
+
+# only the published articles are scored, the routes of the scores are public as the export
+PUBLISHED = Article.article_status == ArticleStatus.published.value
+# the transaction id of the last write of the article row, its term occurrences are written by the same transaction
+ARTICLE_VERSION = literal_column("fastapi_article.xmin::text::bigint").label("version")
+
+
+class TfidfEngine:
+    """
+    TF-IDF scores of all the published articles held in memory, built from the term occurrences after each analytics
+    refresh, such that the top terms of an article or of the articles of a writer do not query the database.
+
+    Each refresh reads the versions of the articles and only the term occurrences of the articles created or
+    changed since the previous build, unless they exceed rebuild_ratio of the articles.
+    """
+
+    def __init__(self, number_of_neighbours: int, max_query_terms: int, rebuild_ratio: float):
+        self.number_of_neighbours = number_of_neighbours
+        self.max_query_terms = max_query_terms
+        self.rebuild_ratio = rebuild_ratio
+
+        self.matrix: TfidfMatrix | None = None
+        self.neighbour_table: NeighbourTable | None = None
+        self.last_build_ms: float | None = None
+        self.last_number_of_changed_articles: int | None = None
+        self.last_neighbours_ms: float | None = None
+        self._load_lock = asyncio.Lock()
+
+    async def load(self, db: AsyncSession):
+        async with self._load_lock:
+            start = time.perf_counter()
+            articles_df = await query_to_df(
+                db,
+                select(Article.article_id, Article.article_name, Article.writer_id, ARTICLE_VERSION).where(PUBLISHED),
+                categorical_columns=(),
+            )
+            previous = self.matrix
+            article_ids = changed_article_ids(previous, articles_df)
+            occurrences_query = select(
+                ArticleTermOccurrence.article_id,
+                ArticleTermOccurrence.word,
+                ArticleTermOccurrence.number_of_occurrences,
+            )
+            if len(article_ids) > self.rebuild_ratio * max(len(articles_df), 1):
+                # past rebuild_ratio, all the term occurrences are read at once rather than looked up by article
+                previous = None
+                occurrences_query = occurrences_query.join(
+                    Article, Article.article_id == ArticleTermOccurrence.article_id
+                ).where(PUBLISHED)
+            else:
+                occurrences_query = occurrences_query.where(
+                    ArticleTermOccurrence.article_id
+                    == any_(bindparam("article_ids", article_ids.tolist(), type_=ARRAY(UUID_TYPE(as_uuid=True))))
+                )
+            occurrences_df = await query_to_df(db, occurrences_query)
+            self.matrix = await asyncio.to_thread(build_tfidf_matrix, articles_df, occurrences_df, previous)
+            self.last_build_ms = (time.perf_counter() - start) * 1000
+            self.last_number_of_changed_articles = len(article_ids)
+
+            # the top terms are served from the new matrix while the neighbours are updated
+            start = time.perf_counter()
+            self.neighbour_table = await asyncio.to_thread(
+                update_neighbour_table,
+                self.neighbour_table,
+                self.matrix,
+                self.number_of_neighbours,
+                self.max_query_terms,
+                self.rebuild_ratio,
+            )
+            self.last_neighbours_ms = (time.perf_counter() - start) * 1000
+
+    async def refresh(self, generation: int):
+        async with AnalyticsSessionLocal() as db:
+            await self.load(db)
+
+    async def get_matrix(self, db: AsyncSession) -> TfidfMatrix:
+        if self.matrix is None:
+            await self.load(db)
+        return self.matrix
+
+    async def get_article_top_terms(self, db: AsyncSession, article_id: UUID, k: int) -> dict | None:
+        matrix = await self.get_matrix(db)
+        row = matrix.article_ids.get_indexer([article_id])
+        if row[0] < 0:
+            return None
+
+        return {
+            "article_id": article_id,
+            "article_name": matrix.article_names[row[0]],
+            "terms": [{"word": word, "score": score} for word, score in top_terms(matrix, row, k)[0]],
+        }
+
+    async def get_writer_top_terms(self, db: AsyncSession, writer_id: UUID, k: int) -> list[dict]:
+        matrix = await self.get_matrix(db)
+        rows = matrix.writer_rows.get(writer_id, np.array([], dtype=np.int64))
+
+        return [
+            {
+                "article_id": matrix.article_ids[row],
+                "article_name": matrix.article_names[row],
+                "terms": [{"word": word, "score": score} for word, score in terms],
+            }
+            for row, terms in zip(rows, top_terms(matrix, rows, k))
+        ]
+
+    async def get_similar_articles(self, db: AsyncSession, article_id: UUID, k: int) -> list[dict] | None:
+        if self.neighbour_table is None:
+            await self.load(db)
+        neighbour_table = self.neighbour_table
+
+        row = neighbour_table.article_ids.get_indexer([article_id])[0]
+        if row < 0:
+            return None
+
+        neighbour_rows = neighbour_table.neighbour_rows[row, :k]
+        neighbour_scores = neighbour_table.neighbour_scores[row, :k]
+        return [
+            {
+                "article_id": neighbour_table.article_ids[neighbour_row],
+                "article_name": neighbour_table.article_names[neighbour_row],
+                "score": float(neighbour_score),
+            }
+            for neighbour_row, neighbour_score in zip(neighbour_rows, neighbour_scores)
+            if neighbour_row >= 0
+        ]
+
+    def status(self) -> dict:
+        matrix = self.matrix
+        neighbour_table = self.neighbour_table
+        return {
+            "loaded": matrix is not None,
+            "number_of_articles": len(matrix.article_ids) if matrix else 0,
+            "vocabulary_size": len(matrix.vocabulary) if matrix else 0,
+            "number_of_entries": len(matrix.scores) if matrix else 0,
+            "size_bytes": (
+                sum(array.nbytes for array in (matrix.idf, matrix.indptr, matrix.indices, matrix.counts, matrix.scores))
+                if matrix
+                else 0
+            ),
+            "last_build_ms": self.last_build_ms,
+            "last_number_of_changed_articles": self.last_number_of_changed_articles,
+            "number_of_neighbours": self.number_of_neighbours,
+            "neighbours_full_build": neighbour_table.full_build if neighbour_table else None,
+            "neighbours_changes_since_full_build": neighbour_table.number_of_changes if neighbour_table else 0,
+            "last_neighbours_ms": self.last_neighbours_ms,
+        }
+
+
+tfidf_engine = TfidfEngine(
+    number_of_neighbours=settings.SIMILAR_ARTICLES_NUMBER_OF_NEIGHBOURS,
+    max_query_terms=settings.SIMILAR_ARTICLES_MAX_QUERY_TERMS,
+    rebuild_ratio=settings.SIMILAR_ARTICLES_REBUILD_RATIO,
+)
+
+analytics_refresher.add_listener(tfidf_engine.refresh)
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mysite import settings
+from mysite.database import AnalyticsSessionLocal
+from mysite.text_analytics.constants import IMAGE_FORMAT_MEDIA_TYPES
+from mysite.text_analytics.constants import AnalyticsQueryEnum
+from mysite.text_analytics.constants import ImageFormatEnum
+from mysite.text_analytics.duckdb_engine import run_analytics_query
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.text_analytics.rendering import WORDCLOUD_DEFAULT_HEIGHT
+from mysite.text_analytics.rendering import WORDCLOUD_DEFAULT_WIDTH
+from mysite.text_analytics.rendering import RenderPool
+from mysite.text_analytics.rendering import render_wordcloud
+from mysite.text_analytics.rendering import wordcloud_render_pool
+
+
+class WordcloudFile(NamedTuple):
+    path: Path
+    etag: str
+    media_type: str
+
+
+def write_file(path: Path, content: bytes):
+    temporary_path = path.with_suffix(f"{path.suffix}.tmp")
+    temporary_path.write_bytes(content)
+    os.replace(temporary_path, path)
+
+
+class WordcloudStore:
+    """
+    Wordcloud images rendered once per change of the term data and stored on disk.
+
+    The default size is rendered after each analytics refresh, other sizes and formats are rendered
+    on their first request and kept until the words and frequencies change.
+    """
+
+    def __init__(self, directory: Path, render_pool: RenderPool):
+        self.directory = directory
+        self.render_pool = render_pool
+
+        self.words_with_frequencies: dict[str, int] | None = None
+        self.frequencies_digest: str | None = None
+
+        self._files: dict[tuple, WordcloudFile] = {}
+        self._stale_files: list[WordcloudFile] = []
+        self._render_locks: dict[tuple, asyncio.Lock] = {}
+        self._load_lock = asyncio.Lock()
+
+    def _set_words_with_frequencies(self, words_with_frequencies: dict[str, int]):
+        frequencies_digest = hashlib.blake2b(
+            json.dumps(words_with_frequencies, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+
+        if frequencies_digest != self.frequencies_digest:
+            # the files of the previous words are removed one change later, they might still be sent
+            for wordcloud_file in self._stale_files:
+                wordcloud_file.path.unlink(missing_ok=True)
+            self._stale_files = list(self._files.values())
+            self._files = {}
+
+        self.words_with_frequencies = words_with_frequencies
+        self.frequencies_digest = frequencies_digest
+
+    async def load(self, db: AsyncSession):
+        async with self._load_lock:
+            self._set_words_with_frequencies(await run_analytics_query(AnalyticsQueryEnum.wordcloud, db))
+
+    async def refresh(self, generation: int):
+        async with AnalyticsSessionLocal() as db:
+            await self.load(db)
+
+        if self.words_with_frequencies:
+            await self.render_file(WORDCLOUD_DEFAULT_WIDTH, WORDCLOUD_DEFAULT_HEIGHT, ImageFormatEnum.png)
+
+    async def get_file(
+        self, db: AsyncSession, width: int, height: int, image_format: ImageFormatEnum
+    ) -> WordcloudFile | None:
+        if self.words_with_frequencies is None:
+            await self.load(db)
+            # the rendering does not need the database connection
+            await db.close()
+
+        if not self.words_with_frequencies:
+            return None
+
+        return await self.render_file(width, height, image_format)
+
+    async def render_file(self, width: int, height: int, image_format: ImageFormatEnum) -> WordcloudFile:
+        words_with_frequencies = self.words_with_frequencies
+        key = (self.frequencies_digest, width, height, image_format)
+        wordcloud_file = self._files.get(key)
+        if wordcloud_file and wordcloud_file.path.exists():
+            return wordcloud_file
+
+        # concurrent requests for the same image wait for one render
+        async with self._render_locks.setdefault(key, asyncio.Lock()):
+            wordcloud_file = self._files.get(key)
+            if wordcloud_file and wordcloud_file.path.exists():
+                return wordcloud_file
+
+            content = await self.render_pool.render(
+                render_wordcloud, words_with_frequencies, width, height, image_format.value
+            )
+            content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+            path = self.directory / f"wordcloud-{content_hash}.{image_format.value}"
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(write_file, path, content)
+
+            wordcloud_file = WordcloudFile(
+                path=path, etag=f'"{content_hash}"', media_type=IMAGE_FORMAT_MEDIA_TYPES[image_format]
+            )
+            if key[0] == self.frequencies_digest:
+                self._files[key] = wordcloud_file
+            else:
+                # the words changed while rendering
+                self._stale_files.append(wordcloud_file)
+
+        self._render_locks.pop(key, None)
+        return wordcloud_file
+
+
+wordcloud_store = WordcloudStore(directory=Path(settings.WORDCLOUD_DIRECTORY), render_pool=wordcloud_render_pool)
+
+analytics_refresher.add_listener(wordcloud_store.refresh)
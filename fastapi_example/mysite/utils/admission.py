@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+
+
+class AdmissionLimiter:
+    """
+    Bounds the number of requests running at once, the requests above it wait in a bounded queue.
+
+    A request arriving with the queue full is rejected at once with a 429, a request still queued after the queue
+    timeout is rejected with a 503, both with a Retry-After, such that the load above the capacity is shed rather
+    than waiting on the connection pool shared with the other routes.
+    """
+
+    def __init__(self, max_running: int, max_queued: int, queue_timeout_seconds: float, retry_after_seconds: int):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+
+        self.running = 0
+        self.queued = 0
+        self.number_of_admitted = 0
+        self.number_of_rejected_queue_full = 0
+        self.number_of_rejected_queue_timeout = 0
+
+        self._semaphore = asyncio.Semaphore(max_running)
+
+    def _rejected(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after_seconds)}
+        )
+
+    async def acquire(self):
+        """
+        Waits for a permit, released by release(), eg: once a streamed response was sent.
+        """
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self.number_of_rejected_queue_full += 1
+            raise self._rejected(429, "Too many analytics requests")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_seconds)
+        except TimeoutError:
+            self.number_of_rejected_queue_timeout += 1
+            raise self._rejected(503, "The analytics requests are saturated")
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        self.number_of_admitted += 1
+
+    def release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self) -> dict:
+        return {
+            "max_running": self.max_running,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "queued": self.queued,
+            "number_of_admitted": self.number_of_admitted,
+            "number_of_rejected_queue_full": self.number_of_rejected_queue_full,
+            "number_of_rejected_queue_timeout": self.number_of_rejected_queue_timeout,
+        }
@@ -1,14 +1,19 @@
 import logging
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
 
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi.security import APIKeyHeader
 from fastapi.security import HTTPBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from mysite import settings
 from mysite.database import get_db
-from mysite.writers.models import Writer
+from mysite.writers.queries import select_writer_principal
 
 api_bearer_token = HTTPBearer(auto_error=False)
 api_key = APIKeyHeader(name="key", auto_error=False)
@@ -16,12 +21,113 @@ api_key = APIKeyHeader(name="key", auto_error=False)
 logger = logging.getLogger(__file__)
 
 
-async def authenticate_writer(token=Depends(api_bearer_token), db: AsyncSession = Depends(get_db)) -> Writer:
-    writer_obj = await db.scalar(select(Writer).where(Writer.writer_id == token.credentials))
-    if not writer_obj:
+class WriterPrincipal(NamedTuple):
+    writer_id: uuid.UUID
+    first_name: str | None
+    last_name: str | None
+    partner_program_status: bool | None
+
+
+class WriterPrincipalCache:
+    """
+    LRU cache of the authenticated writers, each entry expires after the ttl.
+
+    The writes of a writer invalidate its entry in this process, the ttl bounds how long the other processes
+    keep serving the former one.
+
+    A lookup takes the sequence number of the invalidations before querying the primary, its result is not cached
+    if the writer was invalidated since, as it may have read the writer before the write. The sequence numbers
+    of the latest invalidations are kept per writer, the writers forgotten count as invalidated at the latest
+    sequence number forgotten.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_lookups = 0
+        self._entries: OrderedDict[uuid.UUID, tuple[float, WriterPrincipal]] = OrderedDict()
+        self._invalidation_sequence = 0
+        self._forgotten_invalidation_sequence = 0
+        self._invalidated_at: OrderedDict[uuid.UUID, int] = OrderedDict()
+
+    def get(self, writer_id: uuid.UUID) -> WriterPrincipal | None:
+        entry = self._entries.get(writer_id)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[writer_id]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(writer_id)
+        return entry[1]
+
+    def lookup_sequence(self) -> int:
+        """
+        The sequence number to pass to set() with the result of a lookup started now.
+        """
+        return self._invalidation_sequence
+
+    def set(self, principal: WriterPrincipal, lookup_sequence: int):
+        invalidated_at = self._invalidated_at.get(principal.writer_id, self._forgotten_invalidation_sequence)
+        if invalidated_at > lookup_sequence:
+            self.stale_lookups += 1
+            return
+
+        self._entries[principal.writer_id] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(principal.writer_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, writer_id: uuid.UUID):
+        self._invalidation_sequence += 1
+        self._invalidated_at[writer_id] = self._invalidation_sequence
+        self._invalidated_at.move_to_end(writer_id)
+        while len(self._invalidated_at) > self.max_entries:
+            _, self._forgotten_invalidation_sequence = self._invalidated_at.popitem(last=False)
+        if self._entries.pop(writer_id, None):
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def status(self) -> dict:
+        return {
+            "number_of_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "stale_lookups": self.stale_lookups,
+        }
+
+
+writer_principal_cache = WriterPrincipalCache(
+    max_entries=settings.WRITER_PRINCIPAL_CACHE_MAX_ENTRIES, ttl_seconds=settings.WRITER_PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+async def authenticate_writer(token=Depends(api_bearer_token), db: AsyncSession = Depends(get_db)) -> WriterPrincipal:
+    try:
+        writer_id = uuid.UUID(token.credentials)
+    except (AttributeError, ValueError):
         raise HTTPException(status_code=401, detail="You are not know to us")
 
-    return writer_obj
+    principal = writer_principal_cache.get(writer_id)
+    if principal is None:
+        lookup_sequence = writer_principal_cache.lookup_sequence()
+        row = (await db.execute(select_writer_principal(writer_id))).first()
+        if not row:
+            raise HTTPException(status_code=401, detail="You are not know to us")
+        principal = WriterPrincipal(*row)
+        writer_principal_cache.set(principal, lookup_sequence)
+
+    return principal
 
 
 async def authenticate_public_user(key: str = Depends(api_key)) -> dict:
@@ -34,13 +140,21 @@ async def authenticate_public_user(key: str = Depends(api_key)) -> dict:
             raise HTTPException(status_code=401, detail="unknown")
 
 
+async def authenticate_admin(key: str = Depends(api_key)):
+    if not settings.ADMIN_API_KEY or not key or not secrets.compare_digest(key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="unknown")
+
+
 async def authenticate_user(
-    public_api_key: str = Depends(api_key), writer_token=Depends(api_bearer_token), db: AsyncSession = Depends(get_db)
+    public_api_key: str = Depends(api_key),
+    writer_token=Depends(api_bearer_token),
+    db: AsyncSession = Depends(get_db),
 ):
     if public_api_key:
         return await authenticate_public_user(key=public_api_key)
 
     if writer_token:
+        # looked up on the primary, a replica may still return a writer just updated or deleted
         return await authenticate_writer(token=writer_token, db=db)
 
     raise HTTPException(status_code=401, detail="unknown")
@@ -0,0 +1,86 @@
+"""
+Exports the published articles, their term occurrences or the corpus term occurrences as CSV or Parquet,
+streamed from a server side cursor by chunks, such that the memory does not depend on the number of rows.
+
+    python mysite/utils/export_analytics.py articles --output articles.csv
+    python mysite/utils/export_analytics.py article-term-occurrences --export-format parquet \
+        --writer-id 4e7c2b1e-... --published-from 2024-01-01 --output terms.parquet
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+from datetime import datetime
+
+from mysite import settings
+from mysite.database import AnalyticsSessionLocal
+from mysite.text_analytics.constants import ExportDatasetEnum
+from mysite.text_analytics.constants import ExportFormatEnum
+from mysite.text_analytics.export import export_chunks
+from mysite.text_analytics.export import export_query
+from mysite.text_analytics.export import pyarrow
+
+
+async def export_analytics(
+    dataset: ExportDatasetEnum,
+    export_format: ExportFormatEnum,
+    writer_id: uuid.UUID | None,
+    published_from: datetime | None,
+    published_to: datetime | None,
+    output: str | None,
+    chunk_size: int,
+):
+    start_datetime = datetime.now()
+
+    query = export_query(dataset, writer_id, published_from, published_to)
+    output_file = open(output, "wb") if output else sys.stdout.buffer
+    number_of_bytes = 0
+    try:
+        async for chunk in export_chunks(query, export_format, chunk_size, AnalyticsSessionLocal):
+            output_file.write(chunk)
+            number_of_bytes += len(chunk)
+    finally:
+        if output:
+            output_file.close()
+
+    end_datetime = datetime.now()
+
+    print(
+        f"Exporting {dataset.value} took {(end_datetime - start_datetime).total_seconds() * 1000} ms, "
+        f"{number_of_bytes} bytes",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", type=ExportDatasetEnum, choices=list(ExportDatasetEnum))
+    parser.add_argument(
+        "--export-format", type=ExportFormatEnum, choices=list(ExportFormatEnum), default=ExportFormatEnum.csv
+    )
+    parser.add_argument("--writer-id", type=uuid.UUID, help="only the articles of the writer")
+    parser.add_argument(
+        "--published-from", type=datetime.fromisoformat, help="only the articles first published from this date"
+    )
+    parser.add_argument(
+        "--published-to", type=datetime.fromisoformat, help="only the articles first published before this date"
+    )
+    parser.add_argument("--output", help="the file to write, the standard output if none")
+    parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE, help="number of rows per chunk")
+    arguments = parser.parse_args()
+
+    if arguments.export_format == ExportFormatEnum.parquet and not pyarrow:
+        parser.error("The parquet format requires pyarrow to be installed")
+
+    asyncio.run(
+        export_analytics(
+            dataset=arguments.dataset,
+            export_format=arguments.export_format,
+            writer_id=arguments.writer_id,
+            published_from=arguments.published_from,
+            published_to=arguments.published_to,
+            output=arguments.output,
+            chunk_size=arguments.chunk_size,
+        )
+    )
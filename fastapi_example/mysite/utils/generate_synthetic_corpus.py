@@ -0,0 +1,223 @@
+"""
+Generates a reproducible synthetic corpus of published articles, whose words follow a Zipf distribution,
+written by synthetic writers (user+synthetic_<n>@example.com), the articles of the synthetic writers are replaced.
+
+The words are pseudo words of 3 syllables, the word of rank k has the probability 1 / k^s normalized over the
+vocabulary, the lengths of the articles are uniform between half and one and a half times the article length,
+the dates of first publication are uniform over the months before the anchor date, fixed such that the same
+arguments generate the same corpus whatever the day it is generated.
+
+    python mysite/utils/generate_synthetic_corpus.py --number-of-articles 10000 --number-of-writers 100
+    python mysite/utils/generate_synthetic_corpus.py --number-of-articles 1000000 --bulk
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import select
+from sqlalchemy import text
+
+from mysite.articles.constants import ArticleStatus
+from mysite.articles.models import Article
+from mysite.database import SessionLocal
+from mysite.utils.load_medium_articles import validate_term_occurrence
+from mysite.writers.models import Writer
+
+SYLLABLES = [consonant + vowel for consonant in "bcdfghjklmnprstvz" for vowel in "aeiou"]
+SYNTHETIC_WRITER_EMAIL = "user+synthetic_{writer_number}@example.com"
+ANCHOR_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_vocabulary(vocabulary_size: int) -> np.ndarray:
+    """
+    The words by rank, the digits of the rank in base len(SYLLABLES) are the syllables of the word.
+    """
+    if vocabulary_size > len(SYLLABLES) ** 3:
+        raise ValueError(f"The vocabulary size is at most {len(SYLLABLES) ** 3}")
+
+    ranks = np.arange(vocabulary_size)
+    syllables = np.array(SYLLABLES)
+    return np.char.add(
+        np.char.add(syllables[ranks // len(SYLLABLES) ** 2], syllables[ranks // len(SYLLABLES) % len(SYLLABLES)]),
+        syllables[ranks % len(SYLLABLES)],
+    )
+
+
+def zipf_probabilities(vocabulary_size: int, zipf_exponent: float) -> np.ndarray:
+    weights = 1 / np.arange(1, vocabulary_size + 1) ** zipf_exponent
+    return weights / weights.sum()
+
+
+def synthetic_articles(
+    rng: np.random.Generator,
+    vocabulary: np.ndarray,
+    probabilities: np.ndarray,
+    writer_ids: list[UUID],
+    number_of_articles: int,
+    article_length: int,
+    months: int,
+    anchor_date: datetime,
+    first_number: int,
+) -> list[dict]:
+    lengths = rng.integers(max(article_length // 2, 1), article_length * 3 // 2 + 1, size=number_of_articles)
+    words = vocabulary[rng.choice(len(vocabulary), size=int(lengths.sum()), p=probabilities)]
+    contents = [" ".join(article_words) for article_words in np.split(words, np.cumsum(lengths)[:-1])]
+
+    published_seconds_ago = rng.integers(0, months * 30 * 24 * 3600, size=number_of_articles)
+    writer_numbers = rng.integers(0, len(writer_ids), size=number_of_articles)
+    members_only_flags = rng.random(size=number_of_articles) < 0.5
+
+    return [
+        {
+            "article_name": f"Synthetic article {first_number + number}",
+            "article_content": contents[number],
+            "writer_id": writer_ids[writer_numbers[number]],
+            "article_status": ArticleStatus.published.value,
+            "members_only_flag": bool(members_only_flags[number]),
+            "date_first_published": anchor_date - timedelta(seconds=int(published_seconds_ago[number])),
+        }
+        for number in range(number_of_articles)
+    ]
+
+
+async def get_synthetic_writers(number_of_writers: int) -> list[UUID]:
+    emails = [SYNTHETIC_WRITER_EMAIL.format(writer_number=writer_number) for writer_number in range(number_of_writers)]
+    async with SessionLocal() as db:
+        writer_ids = dict(
+            (await db.execute(select(Writer.email, Writer.writer_id).where(Writer.email.in_(emails)))).all()
+        )
+        missing_emails = [email for email in emails if email not in writer_ids]
+        if missing_emails:
+            await db.execute(
+                insert(Writer),
+                [
+                    {"first_name": "Synthetic", "last_name": "Writer", "email": email, "about": "me"}
+                    for email in missing_emails
+                ],
+            )
+            await db.commit()
+            writer_ids = dict(
+                (await db.execute(select(Writer.email, Writer.writer_id).where(Writer.email.in_(emails)))).all()
+            )
+
+    return [writer_ids[email] for email in emails]
+
+
+async def generate_synthetic_corpus(
+    number_of_articles: int,
+    number_of_writers: int,
+    article_length: int,
+    vocabulary_size: int,
+    zipf_exponent: float,
+    months: int,
+    seed: int,
+    batch_size: int,
+    bulk: bool,
+    anchor_date: datetime = ANCHOR_DATE,
+) -> list[UUID]:
+    """
+    Replaces the articles of the synthetic writers with number_of_articles generated ones, the same arguments
+    generate the same contents. Returns the ids of the synthetic writers.
+
+    The term occurrence tables are maintained by the fastapi_article triggers, unless bulk,
+    in which case the triggers are disabled while loading and the tables are rebuilt at the end.
+    """
+    start_datetime = datetime.now()
+    rng = np.random.default_rng(seed)
+    vocabulary = synthetic_vocabulary(vocabulary_size)
+    probabilities = zipf_probabilities(vocabulary_size, zipf_exponent)
+    writer_ids = await get_synthetic_writers(number_of_writers)
+
+    async with SessionLocal() as db:
+        synthetic_writer_ids = select(Writer.writer_id).where(
+            Writer.email.like(SYNTHETIC_WRITER_EMAIL.format(writer_number="%"))
+        )
+        if bulk:
+            await db.execute(text("alter table fastapi_article disable trigger user"))
+            await db.commit()
+        try:
+            await db.execute(delete(Article).where(Article.writer_id.in_(synthetic_writer_ids)))
+
+            for first_number in range(0, number_of_articles, batch_size):
+                articles = synthetic_articles(
+                    rng,
+                    vocabulary,
+                    probabilities,
+                    writer_ids,
+                    min(batch_size, number_of_articles - first_number),
+                    article_length,
+                    months,
+                    anchor_date,
+                    first_number,
+                )
+                await db.execute(insert(Article), articles)
+                # committed by batch, such that the triggers do not hold the locks of the whole load
+                await db.commit()
+        finally:
+            if bulk:
+                await db.rollback()
+                await db.execute(text("alter table fastapi_article enable trigger user"))
+                await db.execute(select(func.rebuild_term_occurrence()))
+                await db.commit()
+
+    end_datetime = datetime.now()
+
+    print(
+        f"Generating {number_of_articles} articles of {number_of_writers} writers took "
+        f"{(end_datetime - start_datetime).total_seconds() * 1000} ms"
+    )
+
+    return writer_ids
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--number-of-writers", type=int, default=100)
+    parser.add_argument("--article-length", type=int, default=1000, help="average number of words per article")
+    parser.add_argument("--vocabulary-size", type=int, default=50_000)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--months", type=int, default=24, help="number of months of publication")
+    parser.add_argument(
+        "--anchor-date",
+        type=lambda value: datetime.fromisoformat(value).replace(tzinfo=timezone.utc),
+        default=ANCHOR_DATE,
+        help="the articles are published over the months before this date, eg: 2024-01-01",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1000, help="number of articles inserted per transaction")
+    parser.add_argument(
+        "--bulk", action="store_true", help="disable the triggers while loading and rebuild the term occurrences"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number-of-articles", type=int, default=10_000)
+    add_corpus_arguments(parser)
+    parser.add_argument("--validate", action="store_true", help="validate the term occurrence tables at the end")
+    arguments = parser.parse_args()
+
+    async def main():
+        await generate_synthetic_corpus(
+            number_of_articles=arguments.number_of_articles,
+            number_of_writers=arguments.number_of_writers,
+            article_length=arguments.article_length,
+            vocabulary_size=arguments.vocabulary_size,
+            zipf_exponent=arguments.zipf_exponent,
+            months=arguments.months,
+            anchor_date=arguments.anchor_date,
+            seed=arguments.seed,
+            batch_size=arguments.batch_size,
+            bulk=arguments.bulk,
+        )
+        if arguments.validate:
+            await validate_term_occurrence()
+
+    asyncio.run(main())
@@ -9,6 +9,7 @@ from pathlib import Path
 import bs4
 from pydantic import UUID4
 from sqlalchemy import delete
+from sqlalchemy import desc
 from sqlalchemy import func
 from sqlalchemy import select
 from sqlalchemy import text
@@ -16,8 +17,10 @@ from sqlalchemy import text
 from mysite.articles.constants import ArticleStatus
 from mysite.articles.models import Article
 from mysite.database import SessionLocal
-from mysite.text_analytics.models import ArticleTermOccurrenceMV
-from mysite.text_analytics.models import CorpusTermOccurrenceMV
+from mysite.text_analytics.models import ArticleTermOccurrence
+from mysite.text_analytics.models import CorpusTermOccurrence
+from mysite.text_analytics.models import MonthTermOccurrence
+from mysite.text_analytics.models import WriterTermOccurrence
 from mysite.writers.models import Writer
 
 
@@ -83,33 +86,33 @@ async def get_writer() -> UUID4:
     return writer_id
 
 
-async def validate_term_occurrence_mv():
+async def validate_term_occurrence():
     async with SessionLocal() as db:
         print(
-            f"""Number of records in {CorpusTermOccurrenceMV.__tablename__}: {
-                await db.scalar(select(func.count(CorpusTermOccurrenceMV.word)))
+            f"""Number of records in {CorpusTermOccurrence.__tablename__}: {
+                await db.scalar(select(func.count(CorpusTermOccurrence.word)))
             }"""
         )
         print(
-            f"""Number of records in {ArticleTermOccurrenceMV.__tablename__}: {
-                await db.scalar(select(func.count(ArticleTermOccurrenceMV.article_id)))
+            f"""Number of records in {ArticleTermOccurrence.__tablename__}: {
+                await db.scalar(select(func.count(ArticleTermOccurrence.article_id)))
             }"""
         )
 
         corpus_query = select(
-            CorpusTermOccurrenceMV.word,
-            CorpusTermOccurrenceMV.number_of_occurrences,
-            CorpusTermOccurrenceMV.number_of_articles,
+            CorpusTermOccurrence.word,
+            CorpusTermOccurrence.number_of_occurrences,
+            CorpusTermOccurrence.number_of_articles,
         )
         article_query = select(
-            ArticleTermOccurrenceMV.word,
-            func.sum(ArticleTermOccurrenceMV.number_of_occurrences),
-            func.count(ArticleTermOccurrenceMV.article_id),
-        ).group_by(ArticleTermOccurrenceMV.word)
+            ArticleTermOccurrence.word,
+            func.sum(ArticleTermOccurrence.number_of_occurrences),
+            func.count(ArticleTermOccurrence.article_id),
+        ).group_by(ArticleTermOccurrence.word)
 
         corpus_vs_article_subquery = corpus_query.except_(article_query).subquery()
         print(
-            f"""Number of records {CorpusTermOccurrenceMV.__tablename__} vs {ArticleTermOccurrenceMV.__tablename__}: {
+            f"""Number of records {CorpusTermOccurrence.__tablename__} vs {ArticleTermOccurrence.__tablename__}: {
                 await db.scalar(select(func.count(corpus_vs_article_subquery.c.word)))
             }"""
         )
@@ -117,11 +120,125 @@ async def validate_term_occurrence_mv():
         article_vs_corpus_subquery = article_query.except_(corpus_query).subquery()
 
         print(
-            f"""Number of records {ArticleTermOccurrenceMV.__tablename__} vs {CorpusTermOccurrenceMV.__tablename__}: {
+            f"""Number of records {ArticleTermOccurrence.__tablename__} vs {CorpusTermOccurrence.__tablename__}: {
                 await db.scalar(select(func.count(article_vs_corpus_subquery.c.word)))
             }"""
         )
 
+        # the definitions of the former materialized views, with one ts_stat query per article
+        ts_stat_article_query = """
+            select article_id, word, nentry
+            from fastapi_article,
+                ts_stat('select article_content_simple_with_no_stop_words from fastapi_article where article_id = '
+                        || quote_literal(article_id) || '::uuid')
+        """
+        ts_stat_corpus_query = """
+            select word, nentry, ndoc
+            from ts_stat('select article_content_simple_with_no_stop_words from fastapi_article')
+        """
+        table_article_query = f"""
+            select article_id, word, number_of_occurrences from {ArticleTermOccurrence.__tablename__}
+        """
+        table_corpus_query = f"""
+            select word, number_of_occurrences, number_of_articles from {CorpusTermOccurrence.__tablename__}
+        """
+        # the former definition of the writer stats, one ts_stat query per writer
+        ts_stat_writer_query = """
+            select writer_id, word, nentry, ndoc
+            from (select distinct writer_id from fastapi_article) as writer,
+                ts_stat('select article_content_simple_with_no_stop_words from fastapi_article where writer_id = '
+                        || quote_literal(writer_id) || '::uuid')
+        """
+        table_writer_query = f"""
+            select writer_id, word, number_of_occurrences, number_of_articles
+            from {WriterTermOccurrence.__tablename__}
+        """
+        # the month of an article is the month of its first publication in UTC
+        ts_stat_month_query = """
+            select month, word, nentry, ndoc
+            from (
+                select distinct date_trunc('month', date_first_published at time zone 'UTC')::date as month
+                from fastapi_article
+                where date_first_published is not null
+            ) as article_month,
+                ts_stat('select article_content_simple_with_no_stop_words from fastapi_article '
+                        || 'where date_trunc(''month'', date_first_published at time zone ''UTC'')::date = '
+                        || quote_literal(month) || '::date')
+        """
+        table_month_query = f"""
+            select month, word, number_of_occurrences, number_of_articles
+            from {MonthTermOccurrence.__tablename__}
+        """
+
+        article_difference_query = text(
+            f"""select count(*) from (
+                (({table_article_query}) except ({ts_stat_article_query}))
+                union all
+                (({ts_stat_article_query}) except ({table_article_query}))
+            ) as difference"""
+        )
+        corpus_difference_query = text(
+            f"""select count(*) from (
+                (({table_corpus_query}) except ({ts_stat_corpus_query}))
+                union all
+                (({ts_stat_corpus_query}) except ({table_corpus_query}))
+            ) as difference"""
+        )
+        writer_difference_query = text(
+            f"""select count(*) from (
+                (({table_writer_query}) except ({ts_stat_writer_query}))
+                union all
+                (({ts_stat_writer_query}) except ({table_writer_query}))
+            ) as difference"""
+        )
+        month_difference_query = text(
+            f"""select count(*) from (
+                (({table_month_query}) except ({ts_stat_month_query}))
+                union all
+                (({ts_stat_month_query}) except ({table_month_query}))
+            ) as difference"""
+        )
+
+        print(
+            f"""Number of records {ArticleTermOccurrence.__tablename__} vs ts_stat per article: {
+                await db.scalar(article_difference_query)
+            }"""
+        )
+        print(
+            f"""Number of records {CorpusTermOccurrence.__tablename__} vs ts_stat: {
+                await db.scalar(corpus_difference_query)
+            }"""
+        )
+        print(
+            f"""Number of records {WriterTermOccurrence.__tablename__} vs ts_stat per writer: {
+                await db.scalar(writer_difference_query)
+            }"""
+        )
+        print(
+            f"""Number of records {MonthTermOccurrence.__tablename__} vs ts_stat per month: {
+                await db.scalar(month_difference_query)
+            }"""
+        )
+
+        term_rank_subquery = select(
+            ArticleTermOccurrence.term_rank,
+            func.row_number()
+            .over(
+                partition_by=ArticleTermOccurrence.article_id,
+                order_by=(desc(ArticleTermOccurrence.number_of_occurrences), ArticleTermOccurrence.word),
+            )
+            .label("expected_term_rank"),
+        ).subquery("term_rank_subquery")
+        print(
+            f"""Number of records {ArticleTermOccurrence.__tablename__} with a wrong term rank: {
+                await db.scalar(
+                    select(func.count()).where(
+                        term_rank_subquery.c.term_rank != term_rank_subquery.c.expected_term_rank
+                    )
+                )
+            }"""
+        )
+
 
 async def load_articles(writer_id: UUID4, article_objects: list[Article]):
     start_datetime = datetime.now()
@@ -136,11 +253,8 @@ async def load_articles(writer_id: UUID4, article_objects: list[Article]):
 
         print(f"Loading articles took {(end_datetime - start_datetime).total_seconds() * 1000} ms")
 
-        await db.execute(text(f"refresh materialized view {CorpusTermOccurrenceMV.__tablename__}"))
-        await db.commit()
-        await db.execute(text(f"refresh materialized view {ArticleTermOccurrenceMV.__tablename__}"))
-        await db.commit()
-        await validate_term_occurrence_mv()
+    # the term occurrence tables are maintained by the fastapi_article trigger while loading
+    await validate_term_occurrence()
 
 
 async def load_medium_data():
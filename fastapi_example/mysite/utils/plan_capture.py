@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from mysite.utils.query_metrics import Fingerprint
+
+logger = logging.getLogger(__name__)
+
+# EXPLAIN ANALYZE executes the statement, only the read only statements are explained, in a read only transaction
+READ_ONLY_STATEMENT_PATTERN = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+WRITE_KEYWORD_PATTERN = re.compile(r"\b(insert|update|delete|merge|nextval|setval|pg_advisory_lock)\b", re.IGNORECASE)
+# the fingerprints captured within the interval are tracked, the older ones are dropped past this number
+MAX_TRACKED_FINGERPRINTS = 10000
+
+
+class _Rollback(Exception):
+    pass
+
+
+def plan_shape(node: dict) -> str:
+    """
+    The node types and relations of a plan, eg: Limit -> Sort -> Hash Join(Seq Scan on fastapi_article, Hash ->
+    Index Scan on fastapi_writer), without the costs and row counts, such that two plans of the same shape compare
+    equal.
+    """
+    label = node["Node Type"]
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    elif "Index Name" in node:
+        label += f" using {node['Index Name']}"
+
+    children = [plan_shape(child) for child in node.get("Plans", [])]
+    if not children:
+        return label
+    if len(children) == 1:
+        return f"{label} -> {children[0]}"
+    return f"{label}({', '.join(children)})"
+
+
+class PlanCapture:
+    """
+    Captures EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) of a sample of the read only statements slower than the threshold,
+    such that the plan of a slow query can be looked at without reproducing the load.
+
+    The statement is explained again with its parameters in a background task, on a connection of its own of the engine
+    which executed it, such that the slow analytics queries are not moved back to the primary, in a read only
+    transaction rolled back at the end, with the statement timeout of the capture. A statement writing through a
+    function, eg: select rebuild_term_occurrence(), then fails rather than being executed. A single capture runs at a
+    time and a fingerprint is explained at most once per interval, the slow statements meanwhile are skipped, such
+    that the captures add at most one query at a time to the database.
+    """
+
+    def __init__(
+        self,
+        engines: list[AsyncEngine],
+        enabled: bool,
+        threshold_ms: float,
+        sample_rate: float,
+        interval_seconds: float,
+        statement_timeout_ms: int,
+        max_plans: int,
+    ):
+        self.engines = {engine.sync_engine: engine for engine in engines}
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.interval_seconds = interval_seconds
+        self.statement_timeout_ms = statement_timeout_ms
+
+        self.number_of_captures = 0
+        self.number_of_skipped = 0
+        self.number_of_errors = 0
+        self.last_error: str | None = None
+
+        self._plans: deque[dict] = deque(maxlen=max_plans)
+        self._last_captured: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def observe(
+        self, fingerprint: Fingerprint, statement: str, parameters: Any, duration_ms: float, engine: Engine | None
+    ):
+        if not self.enabled or duration_ms < self.threshold_ms or engine not in self.engines:
+            return
+        if not READ_ONLY_STATEMENT_PATTERN.match(statement) or WRITE_KEYWORD_PATTERN.search(statement):
+            return
+
+        now = time.monotonic()
+        last_captured = self._last_captured.get(fingerprint.fingerprint)
+        if (
+            (self._task and not self._task.done())
+            or (last_captured is not None and now - last_captured < self.interval_seconds)
+            or random.random() >= self.sample_rate
+        ):
+            self.number_of_skipped += 1
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if len(self._last_captured) >= MAX_TRACKED_FINGERPRINTS:
+            self._last_captured = {
+                captured_fingerprint: captured
+                for captured_fingerprint, captured in self._last_captured.items()
+                if now - captured < self.interval_seconds
+            }
+        self._last_captured[fingerprint.fingerprint] = now
+        self._task = loop.create_task(
+            self.capture(self.engines[engine], fingerprint, statement, parameters, duration_ms)
+        )
+
+    async def capture(
+        self, engine: AsyncEngine, fingerprint: Fingerprint, statement: str, parameters: Any, duration_ms: float
+    ):
+        try:
+            async with engine.connect() as connection:
+                asyncpg_connection = (await connection.get_raw_connection()).driver_connection
+                async with asyncpg_connection.transaction(readonly=True):
+                    await asyncpg_connection.execute(f"set local statement_timeout = {int(self.statement_timeout_ms)}")
+                    explain = await asyncpg_connection.fetchval(
+                        f"explain (analyze, buffers, format json) {statement}", *(parameters or ())
+                    )
+                    # the statement is only explained, whatever it did is not kept
+                    raise _Rollback
+        except _Rollback:
+            pass
+        except Exception as error:
+            self.number_of_errors += 1
+            self.last_error = repr(error)
+            logger.exception("Failed capturing the plan of %s", fingerprint.fingerprint)
+            return
+
+        plan = (json.loads(explain) if isinstance(explain, str) else explain)[0]
+        self.number_of_captures += 1
+        self._plans.append(
+            {
+                "fingerprint": fingerprint.fingerprint,
+                "statement": fingerprint.normalized_statement,
+                "database": engine.url.render_as_string(hide_password=True),
+                "duration_ms": duration_ms,
+                "planning_ms": plan.get("Planning Time"),
+                "execution_ms": plan.get("Execution Time"),
+                "plan_shape": plan_shape(plan["Plan"]),
+                "plan": plan,
+                "captured": datetime.now(tz=timezone.utc),
+            }
+        )
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def plans(self, fingerprint: str | None, limit: int) -> list[dict]:
+        plans = [plan for plan in reversed(self._plans) if fingerprint is None or plan["fingerprint"] == fingerprint]
+        return plans[:limit]
+
+    def status(self, fingerprint: str | None, limit: int) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "number_of_captures": self.number_of_captures,
+            "number_of_skipped": self.number_of_skipped,
+            "number_of_errors": self.number_of_errors,
+            "last_error": self.last_error,
+            "plans": self.plans(fingerprint, limit),
+        }
@@ -0,0 +1,289 @@
+import bisect
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+
+# upper bounds of the latency buckets in milliseconds, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# the expanded lists of bind parameters, eg: in ($1, $2, $3), are one fingerprint whatever their length
+PARAMETER_LIST_PATTERN = re.compile(r"\$\d+(?:\s*,\s*\$\d+)+")
+PARAMETER_PATTERN = re.compile(r"\$\d+")
+# the literals rendered in the statement, eg: by literal_binds
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_PATTERN = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class Fingerprint(NamedTuple):
+    fingerprint: str
+    normalized_statement: str
+
+
+# called with the fingerprint, the statement, its parameters, its duration in ms and the sync engine which executed it,
+# if known, after each successful execution
+StatementListener = Callable[[Fingerprint, str, Any, float, Any], None]
+
+
+def normalize_statement(statement: str) -> str:
+    normalized_statement = STRING_LITERAL_PATTERN.sub("?", statement)
+    normalized_statement = PARAMETER_LIST_PATTERN.sub("?, ...", normalized_statement)
+    normalized_statement = PARAMETER_PATTERN.sub("?", normalized_statement)
+    normalized_statement = NUMBER_LITERAL_PATTERN.sub("?", normalized_statement)
+    return WHITESPACE_PATTERN.sub(" ", normalized_statement).strip()
+
+
+def parameter_types(parameters: Any) -> str:
+    """
+    The types of the bind parameters, eg: (UUID, str, int), their values are not kept.
+    """
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+def hit_ratio(hits: int, misses: int) -> float | None:
+    return hits / (hits + misses) if hits + misses else None
+
+
+class StatementMetrics:
+    __slots__ = (
+        "fingerprint",
+        "normalized_statement",
+        "sample_statement",
+        "count",
+        "errors",
+        "total_ms",
+        "max_ms",
+        "rows",
+        "compiled_cache_hits",
+        "prepared_statement_cache_hits",
+        "bucket_counts",
+    )
+
+    def __init__(self, fingerprint: Fingerprint):
+        self.fingerprint = fingerprint.fingerprint
+        self.normalized_statement = fingerprint.normalized_statement
+        self.sample_statement: str | None = None
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.compiled_cache_hits = 0
+        self.prepared_statement_cache_hits = 0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def status(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "statement": self.normalized_statement,
+            "sample_statement": self.sample_statement,
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "max_ms": self.max_ms,
+            "rows": self.rows,
+            "compiled_cache_hits": self.compiled_cache_hits,
+            "prepared_statement_cache_hits": self.prepared_statement_cache_hits,
+            "latency_histogram": {
+                str(upper_bound_ms): bucket_count
+                for upper_bound_ms, bucket_count in zip((*LATENCY_BUCKETS_MS, "inf"), self.bucket_counts)
+            },
+        }
+
+
+class QueryMetrics:
+    """
+    Latency histograms, row counts and error counts per statement fingerprint, the statement with its bind
+    parameters and literals replaced, such that the same query with other values is counted once.
+
+    The fingerprints of the statements seen last are cached by statement text, the cost of a record is then a dict
+    lookup and a bisect. The full text of a statement is kept for a sample of the executions and the types of the bind
+    parameters are only kept for the executions slower than the threshold, the values are only passed to the listeners.
+
+    The hits and misses of the compiled cache of SQLAlchemy and of the prepared statement cache of the connection are
+    counted for the executions for which they are known, eg: not for the statements run straight on asyncpg.
+    """
+
+    def __init__(
+        self,
+        slow_query_ms: float,
+        sample_rate: float,
+        max_slow_queries: int,
+        max_fingerprints: int,
+        max_parameters_length: int,
+    ):
+        self.slow_query_ms = slow_query_ms
+        self.sample_rate = sample_rate
+        self.max_fingerprints = max_fingerprints
+        self.max_parameters_length = max_parameters_length
+
+        self.started = datetime.now(tz=timezone.utc)
+        self.number_of_statements = 0
+        self.number_of_evictions = 0
+        self.cache_counts = self._new_cache_counts()
+
+        self._fingerprints: OrderedDict[str, Fingerprint] = OrderedDict()
+        self._metrics: dict[str, StatementMetrics] = {}
+        self._slow_queries: deque[dict] = deque(maxlen=max_slow_queries)
+        self._listeners: list[StatementListener] = []
+
+    def add_listener(self, listener: StatementListener):
+        self._listeners.append(listener)
+
+    def fingerprint(self, statement: str) -> Fingerprint:
+        fingerprint = self._fingerprints.get(statement)
+        if fingerprint is None:
+            normalized_statement = normalize_statement(statement)
+            fingerprint = Fingerprint(
+                fingerprint=hashlib.blake2b(normalized_statement.encode(), digest_size=8).hexdigest(),
+                normalized_statement=normalized_statement,
+            )
+            self._fingerprints[statement] = fingerprint
+            if len(self._fingerprints) > self.max_fingerprints:
+                self._fingerprints.popitem(last=False)
+        return fingerprint
+
+    @staticmethod
+    def _new_cache_counts() -> dict[str, int]:
+        return {
+            "compiled_cache_hits": 0,
+            "compiled_cache_misses": 0,
+            "prepared_statement_cache_hits": 0,
+            "prepared_statement_cache_misses": 0,
+        }
+
+    def record(
+        self,
+        statement: str,
+        duration_ms: float,
+        rows: int,
+        parameters: Any = None,
+        error: bool = False,
+        compiled_cache_hit: bool | None = None,
+        prepared_statement_cache_hit: bool | None = None,
+        engine: Any = None,
+    ):
+        fingerprint = self.fingerprint(statement)
+        metrics = self._metrics.get(fingerprint.fingerprint)
+        if metrics is None:
+            if len(self._metrics) >= self.max_fingerprints:
+                # the statements executed the least are dropped, the fingerprints of the dynamic queries are unbounded
+                del self._metrics[min(self._metrics.values(), key=lambda metrics: metrics.count).fingerprint]
+                self.number_of_evictions += 1
+            metrics = self._metrics[fingerprint.fingerprint] = StatementMetrics(fingerprint)
+
+        self.number_of_statements += 1
+        metrics.count += 1
+        metrics.errors += error
+        metrics.total_ms += duration_ms
+        metrics.max_ms = max(metrics.max_ms, duration_ms)
+        metrics.rows += max(rows, 0)
+        metrics.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+
+        if compiled_cache_hit is not None:
+            metrics.compiled_cache_hits += compiled_cache_hit
+            self.cache_counts["compiled_cache_hits" if compiled_cache_hit else "compiled_cache_misses"] += 1
+        if prepared_statement_cache_hit is not None:
+            metrics.prepared_statement_cache_hits += prepared_statement_cache_hit
+            self.cache_counts[
+                "prepared_statement_cache_hits" if prepared_statement_cache_hit else "prepared_statement_cache_misses"
+            ] += 1
+
+        if metrics.sample_statement is None or random.random() < self.sample_rate:
+            metrics.sample_statement = statement
+
+        if duration_ms >= self.slow_query_ms:
+            self._slow_queries.append(
+                {
+                    "fingerprint": fingerprint.fingerprint,
+                    "duration_ms": duration_ms,
+                    "rows": rows,
+                    "parameter_types": parameter_types(parameters)[: self.max_parameters_length],
+                    "executed": datetime.now(tz=timezone.utc),
+                }
+            )
+
+        if not error:
+            for listener in self._listeners:
+                listener(fingerprint, statement, parameters, duration_ms, engine)
+
+    def reset(self):
+        self.started = datetime.now(tz=timezone.utc)
+        self.number_of_statements = 0
+        self.number_of_evictions = 0
+        self.cache_counts = self._new_cache_counts()
+        self._metrics.clear()
+        self._slow_queries.clear()
+
+    def status(self, limit: int) -> dict:
+        statements = sorted(self._metrics.values(), key=lambda metrics: metrics.total_ms, reverse=True)[:limit]
+        return {
+            "started": self.started,
+            "number_of_statements": self.number_of_statements,
+            "number_of_fingerprints": len(self._metrics),
+            "number_of_evictions": self.number_of_evictions,
+            "slow_query_ms": self.slow_query_ms,
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+            **self.cache_counts,
+            "compiled_cache_hit_ratio": hit_ratio(
+                self.cache_counts["compiled_cache_hits"], self.cache_counts["compiled_cache_misses"]
+            ),
+            "prepared_statement_cache_hit_ratio": hit_ratio(
+                self.cache_counts["prepared_statement_cache_hits"], self.cache_counts["prepared_statement_cache_misses"]
+            ),
+            "statements": [metrics.status() for metrics in statements],
+            "slow_queries": list(reversed(self._slow_queries)),
+        }
+
+
+class QueryTimer:
+    """
+    Times a statement executed outside of the cursor events, eg: straight on the asyncpg connection,
+    and records it at exit with the outcome of its caches, unknown if left None.
+    """
+
+    def __init__(
+        self,
+        query_metrics: QueryMetrics,
+        statement: str,
+        parameters: Any,
+        engine: Any = None,
+        compiled_cache_hit: bool | None = None,
+    ):
+        self.query_metrics = query_metrics
+        self.statement = statement
+        self.parameters = parameters
+        self.engine = engine
+        self.compiled_cache_hit = compiled_cache_hit
+        self.prepared_statement_cache_hit: bool | None = None
+        self.rows = 0
+        self.start = 0.0
+
+    def __enter__(self) -> "QueryTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.query_metrics.record(
+            self.statement,
+            (time.perf_counter() - self.start) * 1000,
+            self.rows,
+            self.parameters,
+            error=exc_type is not None,
+            compiled_cache_hit=self.compiled_cache_hit,
+            prepared_statement_cache_hit=self.prepared_statement_cache_hit,
+            engine=self.engine,
+        )
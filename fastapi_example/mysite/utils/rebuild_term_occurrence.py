@@ -0,0 +1,26 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy import select
+
+from mysite.database import SessionLocal
+from mysite.utils.load_medium_articles import validate_term_occurrence
+
+
+async def rebuild_term_occurrence():
+    start_datetime = datetime.now()
+
+    async with SessionLocal() as db:
+        await db.execute(select(func.rebuild_term_occurrence()))
+        await db.commit()
+
+    end_datetime = datetime.now()
+
+    print(f"Rebuilding the term occurrence tables took {(end_datetime - start_datetime).total_seconds() * 1000} ms")
+
+    await validate_term_occurrence()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_term_occurrence())
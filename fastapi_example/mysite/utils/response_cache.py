@@ -0,0 +1,173 @@
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable
+from typing import Callable
+from typing import Hashable
+from typing import NamedTuple
+
+from fastapi import Request
+from fastapi import Response
+from fastapi.routing import APIRoute
+
+from mysite.utils.single_flight import SingleFlight
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: dict[str, str]
+    etag: str
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered responses, bounded by the total size of the cached bodies.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, response: Response) -> CachedResponse:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+        # the ETag of the route if any, eg: the wordcloud, such that the clients revalidate the same ETag
+        entry = CachedResponse(
+            body=response.body,
+            headers=headers,
+            etag=headers.get("etag") or f'"{hashlib.blake2b(response.body, digest_size=16).hexdigest()}"',
+        )
+
+        if len(entry.body) > self.max_bytes:
+            return entry
+
+        if key in self._entries:
+            self.size_bytes -= len(self._entries.pop(key).body)
+
+        self._entries[key] = entry
+        self.size_bytes += len(entry.body)
+
+        while self.size_bytes > self.max_bytes:
+            _, evicted_entry = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted_entry.body)
+            self.evictions += 1
+
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def status(self) -> dict:
+        return {
+            "number_of_entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "evictions": self.evictions,
+        }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+class StreamedResponse:
+    """
+    A response without a body, eg: a StreamingResponse, can be sent once, to the first of the coalesced requests,
+    the others run the route themselves, the routes of a single flight return their body rather than a stream.
+    """
+
+    def __init__(self, response: Response):
+        self.response: Response | None = response
+
+    def claim(self) -> Response | None:
+        response, self.response = self.response, None
+        return response
+
+
+def cached_route_class(
+    cache: ResponseCache,
+    get_version: Callable[[], Hashable],
+    single_flight: SingleFlight | None = None,
+    is_cacheable: Callable[[], Awaitable[bool]] | None = None,
+) -> type[APIRoute]:
+    """
+    Route class caching the successful GET responses of a router, keyed on the path, the query parameters and
+    the version of the data, such that a new version of the data is never served from the cache.
+    Cached responses are served with an ETag and a 304 is returned when If-None-Match matches it.
+
+    With is_cacheable, the misses are only cached while it is true, eg: while the database read has the data of
+    the version, the others run the route without caching its response.
+
+    With a single flight, the concurrent GET requests missing the cache with the same key and If-None-Match
+    share one execution of the route and its response.
+    """
+
+    class CachedRoute(APIRoute):
+        def get_route_handler(self) -> Callable:
+            route_handler = super().get_route_handler()
+
+            async def render(request: Request, key: Hashable) -> CachedResponse | Response | StreamedResponse:
+                response = await route_handler(request)
+                if not hasattr(response, "body"):
+                    return StreamedResponse(response)
+                if response.status_code != 200:
+                    return response
+                return cache.set(key, response)
+
+            async def cached_route_handler(request: Request) -> Response:
+                if request.method != "GET":
+                    return await route_handler(request)
+
+                key = (request.url.path, tuple(sorted(request.query_params.multi_items())), get_version())
+
+                entry = cache.get(key)
+                if entry is None:
+                    if is_cacheable is not None and not await is_cacheable():
+                        cache.bypasses += 1
+                        return await route_handler(request)
+
+                    if single_flight is None:
+                        entry = await render(request, key)
+                    else:
+                        # the route may answer a 304 itself, eg: the wordcloud, the response depends on If-None-Match
+                        flight_key = (key, request.headers.get("if-none-match"))
+                        entry = await single_flight.run(flight_key, lambda: render(request, key))
+
+                    if isinstance(entry, StreamedResponse):
+                        response = entry.claim()
+                        if response is None:
+                            single_flight.count_fallback()
+                            response = await route_handler(request)
+                        return response
+                    if isinstance(entry, Response):
+                        return entry
+
+                headers = {"etag": entry.etag, "cache-control": entry.headers.get("cache-control", "no-cache")}
+                if etag_matches(request, entry.etag):
+                    return Response(status_code=304, headers=headers)
+
+                return Response(content=entry.body, headers=entry.headers | headers)
+
+            return cached_route_handler
+
+    return CachedRoute
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Hashable
+
+
+class Flight:
+    __slots__ = ("task", "number_of_waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.number_of_waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces the concurrent calls of the same key into one execution, whose result or exception is shared by all
+    the callers waiting on it.
+
+    The execution runs in a task of its own, each caller waits on it shielded, such that a caller going away does not
+    cancel it for the others. Once the last caller went away, the execution is cancelled, as nobody is waiting on it.
+
+    A caller which could not use the shared result, eg: a response sent once, and executed again on its own, is
+    counted as an execution rather than as coalesced.
+    """
+
+    def __init__(self):
+        self.number_of_calls = 0
+        self.number_of_executions = 0
+        self.number_of_cancelled = 0
+        self.number_of_fallbacks = 0
+
+        self._flights: dict[Hashable, Flight] = {}
+
+    async def run(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        self.number_of_calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = Flight(asyncio.get_running_loop().create_task(function()))
+            flight.task.add_done_callback(lambda task: self._end_flight(key, flight))
+            self.number_of_executions += 1
+
+        flight.number_of_waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.number_of_waiters -= 1
+            if not flight.number_of_waiters and not flight.task.done():
+                flight.task.cancel()
+                self.number_of_cancelled += 1
+
+    def count_fallback(self):
+        self.number_of_executions += 1
+        self.number_of_fallbacks += 1
+
+    def _end_flight(self, key: Hashable, flight: Flight):
+        # the calls from now on start a new execution
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def status(self) -> dict:
+        return {
+            "number_of_calls": self.number_of_calls,
+            "number_of_executions": self.number_of_executions,
+            "number_of_coalesced": self.number_of_calls - self.number_of_executions,
+            "number_of_cancelled": self.number_of_cancelled,
+            "number_of_fallbacks": self.number_of_fallbacks,
+            "number_of_in_flight": len(self._flights),
+            "coalescing_ratio": (
+                (self.number_of_calls - self.number_of_executions) / self.number_of_calls
+                if self.number_of_calls
+                else None
+            ),
+        }
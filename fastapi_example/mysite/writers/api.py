@@ -5,17 +5,16 @@ from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
 from pydantic import UUID4
-from sqlalchemy import desc
-from sqlalchemy import func
 from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mysite.articles.constants import ArticleStatus
-from mysite.articles.models import Article
 from mysite.database import get_db
+from mysite.database import get_read_db
+from mysite.text_analytics.refresh import analytics_refresher
+from mysite.utils.auth import writer_principal_cache
 from mysite.writers.models import Writer
 from mysite.writers.models import WriterPartnerProgram
+from mysite.writers.queries import WRITER_EXTENDED_QUERY
 from mysite.writers.schemas import WriterExtendedOutSchema
 from mysite.writers.schemas import WriterInSchema
 from mysite.writers.schemas import WriterOutSchema
@@ -46,55 +45,13 @@ async def create_writer(input_data: WriterInSchema, db: AsyncSession = Depends(g
 
 
 @writers_router.get("", response_model=List[WriterOutSchema])
-async def list_writers(db: AsyncSession = Depends(get_db)):
+async def list_writers(db: AsyncSession = Depends(get_read_db)):
     return await db.scalars(select(Writer).order_by(Writer.joined_timestamp))
 
 
 @writers_router.get("/{writer_id}", response_model=WriterExtendedOutSchema)
-async def get_writer(writer_id: UUID4, db: AsyncSession = Depends(get_db)):
-    article_subquery = (
-        select(
-            Article.article_id,
-            Article.writer_id,
-            Article.article_name,
-            Article.members_only_flag,
-            Article.date_first_published,
-        )
-        .where(Article.writer_id == writer_id, Article.article_status == ArticleStatus.published.value)
-        .order_by(Article.date_first_published.desc())
-        .limit(2)
-    ).subquery("article_subquery")
-
-    writer_obj = (
-        await db.execute(
-            select(
-                Writer.writer_id,
-                Writer.first_name,
-                Writer.last_name,
-                Writer.email,
-                Writer.about,
-                Writer.joined_timestamp,
-                WriterPartnerProgram.active.label("partner_program_status"),
-                func.array_agg(
-                    aggregate_order_by(
-                        func.jsonb_build_object(
-                            "article_id",
-                            article_subquery.c.article_id,
-                            "article_name",
-                            article_subquery.c.article_name,
-                            "members_only_flag",
-                            article_subquery.c.members_only_flag,
-                        ),
-                        desc(article_subquery.c.date_first_published),
-                    )
-                ).label("articles"),
-            )
-            .join(WriterPartnerProgram, WriterPartnerProgram.writer_id == Writer.writer_id, isouter=True)
-            .join(article_subquery, article_subquery.c.writer_id == Writer.writer_id, isouter=True)
-            .where(Writer.writer_id == writer_id)
-            .group_by(Writer, WriterPartnerProgram.writer_id, WriterPartnerProgram.active)
-        )
-    ).first()
+async def get_writer(writer_id: UUID4, db: AsyncSession = Depends(get_read_db)):
+    writer_obj = (await db.execute(WRITER_EXTENDED_QUERY, {"writer_id": writer_id})).first()
     if not writer_obj:
         raise HTTPException(status_code=404, detail="Writer not found")
 
@@ -119,6 +76,9 @@ async def update_writer(writer_id: UUID4, input_data: WriterInSchema, db: AsyncS
     db.add(writer_obj)
     await db.commit()
     await db.refresh(writer_obj)
+    writer_principal_cache.invalidate(writer_id)
+
+    analytics_refresher.request_refresh()
 
     return writer_obj
 
@@ -130,6 +90,10 @@ async def delete_writer(writer_id: UUID4, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Writer not found")
     await db.delete(writer_obj)
     await db.commit()
+    writer_principal_cache.invalidate(writer_id)
+
+    analytics_refresher.request_refresh()
+
     return {"success": True}
 
 
@@ -154,4 +118,5 @@ async def update_partner_program(
         writer_program_partner_obj.active = input_data.active
     db.add(writer_program_partner_obj)
     await db.commit()
+    writer_principal_cache.invalidate(writer_id)
     return {"success": True}
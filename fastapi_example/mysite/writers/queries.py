@@ -0,0 +1,84 @@
+import uuid
+
+from sqlalchemy import Select
+from sqlalchemy import StatementLambdaElement
+from sqlalchemy import bindparam
+from sqlalchemy import desc
+from sqlalchemy import func
+from sqlalchemy import lambda_stmt
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from mysite.articles.constants import ArticleStatus
+from mysite.articles.models import Article
+from mysite.writers.models import Writer
+from mysite.writers.models import WriterPartnerProgram
+
+
+def select_writer_principal(writer_id: uuid.UUID) -> StatementLambdaElement:
+    """
+    The columns of the writer principal, without hydrating a Writer and its joined partner program.
+    """
+    return lambda_stmt(
+        lambda: select(
+            Writer.writer_id,
+            Writer.first_name,
+            Writer.last_name,
+            WriterPartnerProgram.active.label("partner_program_status"),
+        )
+        .join(WriterPartnerProgram, WriterPartnerProgram.writer_id == Writer.writer_id, isouter=True)
+        .where(Writer.writer_id == writer_id)
+    )
+
+
+def writer_extended_query() -> Select:
+    """
+    The writer with its partner program status and its 2 latest published articles, the id of the writer is the
+    writer_id parameter.
+    """
+    writer_id = bindparam("writer_id", type_=Writer.writer_id.type)
+    article_subquery = (
+        select(
+            Article.article_id,
+            Article.writer_id,
+            Article.article_name,
+            Article.members_only_flag,
+            Article.date_first_published,
+        )
+        .where(Article.writer_id == writer_id, Article.article_status == ArticleStatus.published.value)
+        .order_by(Article.date_first_published.desc())
+        .limit(2)
+    ).subquery("article_subquery")
+
+    return (
+        select(
+            Writer.writer_id,
+            Writer.first_name,
+            Writer.last_name,
+            Writer.email,
+            Writer.about,
+            Writer.joined_timestamp,
+            WriterPartnerProgram.active.label("partner_program_status"),
+            func.array_agg(
+                aggregate_order_by(
+                    func.jsonb_build_object(
+                        "article_id",
+                        article_subquery.c.article_id,
+                        "article_name",
+                        article_subquery.c.article_name,
+                        "members_only_flag",
+                        article_subquery.c.members_only_flag,
+                    ),
+                    desc(article_subquery.c.date_first_published),
+                )
+            ).label("articles"),
+        )
+        .join(WriterPartnerProgram, WriterPartnerProgram.writer_id == Writer.writer_id, isouter=True)
+        .join(article_subquery, article_subquery.c.writer_id == Writer.writer_id, isouter=True)
+        .where(Writer.writer_id == writer_id)
+        .group_by(Writer, WriterPartnerProgram.writer_id, WriterPartnerProgram.active)
+    )
+
+
+# built once, the subquery does not fit in a lambda statement, executed with {"writer_id": ...}
+WRITER_EXTENDED_QUERY = writer_extended_query()
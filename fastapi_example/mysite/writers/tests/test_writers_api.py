@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime
 from datetime import timezone
 
@@ -7,10 +8,15 @@ from httpx import AsyncClient
 from pydantic import UUID4
 from sqlalchemy import select
 
+from mysite import database
 from mysite.articles.constants import ArticleStatus
 from mysite.articles.models import Article
+from mysite.database import READ_YOUR_WRITES_COOKIE
 from mysite.database import SessionLocal
 from mysite.main import app
+from mysite.utils.auth import WriterPrincipal
+from mysite.utils.auth import WriterPrincipalCache
+from mysite.utils.auth import writer_principal_cache
 from mysite.writers.models import Writer
 from mysite.writers.models import WriterPartnerProgram
 
@@ -163,3 +169,68 @@ class TestWriter:
         async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
             response = await client.get(f"/api/v1/fastapi/writers/{writer_id}")
         assert not response.json()["partner_program_status"]
+
+    async def test_read_your_writes(self, monkeypatch):
+        # the primary stands in for a replica
+        monkeypatch.setattr(database, "replica_session_makers", [SessionLocal])
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.get("/api/v1/fastapi/writers")
+            assert response.status_code == 200
+            assert READ_YOUR_WRITES_COOKIE not in response.cookies
+
+            response = await client.post(
+                "/api/v1/fastapi/writers",
+                json={"first_name": "string", "last_name": "string", "email": "user3@example.com", "about": "string"},
+            )
+            assert response.status_code == 200
+            assert READ_YOUR_WRITES_COOKIE in response.cookies
+
+            response = await client.get(f"/api/v1/fastapi/writers/{response.json()['writer_id']}")
+
+        assert response.status_code == 200
+        assert response.json()["email"] == "user3@example.com"
+
+    async def test_update_invalidates_writer_principal(self):
+        writer_id = await self.writer_id()
+        async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+            response = await client.post(
+                "/api/v1/fastapi/articles",
+                json={"article_name": "string", "article_content": "string", "members_only_flag": False},
+                headers={"Authorization": f"Bearer {writer_id}"},
+            )
+            assert response.status_code == 200
+            assert writer_principal_cache.get(writer_id).writer_id == writer_id
+
+            response = await client.put(
+                f"/api/v1/fastapi/writers/{writer_id}",
+                json={"first_name": "renamed", "last_name": "string", "email": "user@example.com", "about": "me"},
+            )
+            assert response.status_code == 200
+            assert writer_principal_cache.get(writer_id) is None
+
+            response = await client.post(
+                "/api/v1/fastapi/articles",
+                json={"article_name": "string", "article_content": "string", "members_only_flag": False},
+                headers={"Authorization": f"Bearer {writer_id}"},
+            )
+
+        assert response.status_code == 200
+        assert writer_principal_cache.get(writer_id).first_name == "renamed"
+
+    async def test_writer_principal_not_cached_when_invalidated_during_lookup(self):
+        cache = WriterPrincipalCache(max_entries=1, ttl_seconds=60)
+        principal = WriterPrincipal(uuid.uuid4(), "string", "string", None)
+
+        lookup_sequence = cache.lookup_sequence()
+        cache.invalidate(principal.writer_id)
+        cache.set(principal, lookup_sequence)
+        assert cache.get(principal.writer_id) is None
+
+        # the invalidation of another writer evicts the one of the writer, still counted as invalidated
+        cache.invalidate(uuid.uuid4())
+        cache.set(principal, lookup_sequence)
+        assert cache.get(principal.writer_id) is None
+        assert cache.status()["stale_lookups"] == 2
+
+        cache.set(principal, cache.lookup_sequence())
+        assert cache.get(principal.writer_id) == principal